@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import database
+from database import (
+    WEEK_DAYS, count_users, get_user_schedule_intervals, iter_schedule_intervals,
+    get_task_workload
+)
+from schedule_index import minutes_to_time
+
+# Resolução do mapa de ocupação: 96 faixas de 15 minutos por dia
+SLOT_MINUTES = 15
+MINUTES_PER_DAY = 24 * 60
+SLOTS_PER_DAY = MINUTES_PER_DAY // SLOT_MINUTES
+# Cronogramas lidos por lote na agregação de todos os usuários
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "5000"))
+
+def _interval_deltas(intervals: List[tuple]) -> np.ndarray:
+    """Array de diferenças (7 x 1441) com +1 no início e -1 no término de cada cronograma em cada dia."""
+    deltas = np.zeros((7, MINUTES_PER_DAY + 1), dtype=np.int64)
+    if not intervals:
+        return deltas
+    data = np.asarray(intervals, dtype=np.int64)
+    starts, ends, masks = data[:, 0], data[:, 1], data[:, 2]
+    # Uma linha (cronograma, dia) para cada bit ligado da máscara
+    rows, days = np.nonzero((masks[:, None] >> np.arange(7)) & 1)
+    np.add.at(deltas, (days, starts[rows]), 1)
+    np.add.at(deltas, (days, ends[rows]), -1)
+    return deltas
+
+def _minute_counts(deltas: np.ndarray) -> np.ndarray:
+    """Número de cronogramas em andamento em cada minuto da semana (7 x 1440)."""
+    return np.cumsum(deltas, axis=1)[:, :MINUTES_PER_DAY]
+
+def _to_slots(per_minute: np.ndarray) -> np.ndarray:
+    return per_minute.reshape(7, SLOTS_PER_DAY, SLOT_MINUTES).sum(axis=2)
+
+def occupancy_grid(intervals: List[tuple]) -> np.ndarray:
+    """Minutos ocupados (0 a 15) em cada faixa de 15 minutos da semana, em uma matriz 7 x 96.
+
+    Cronogramas sobrepostos contam uma vez: o minuto está ocupado ou não."""
+    return _to_slots(_minute_counts(_interval_deltas(intervals)) > 0)
+
+def user_heatmap(token: str) -> np.ndarray:
+    """Mapa de ocupação semanal (7 x 96) dos cronogramas do usuário."""
+    return occupancy_grid(get_user_schedule_intervals(token))
+
+def hourly(grid: np.ndarray) -> np.ndarray:
+    """Agrupa um mapa 7 x 96 em horas (7 x 24)."""
+    return grid.reshape(7, 24, SLOTS_PER_DAY // 24).sum(axis=2)
+
+def aggregate_heatmap(batches: Iterable[List[tuple]]) -> np.ndarray:
+    """Soma, faixa a faixa, os minutos de cronograma de todos os lotes (7 x 96).
+
+    Só o array de diferenças é mantido entre lotes, então a memória não cresce com o banco."""
+    deltas = np.zeros((7, MINUTES_PER_DAY + 1), dtype=np.int64)
+    for batch in batches:
+        deltas += _interval_deltas(batch)
+    return _to_slots(_minute_counts(deltas))
+
+def admin_workload(batch_size: int = ANALYTICS_BATCH_SIZE) -> Dict:
+    """Agregado de todos os usuários: minutos de cronograma por faixa da semana e tarefas por semana e prioridade.
+
+    O mapa dividido por 15 é o número médio de cronogramas em andamento em cada faixa."""
+    heatmap = aggregate_heatmap(iter_schedule_intervals(batch_size))
+    return {
+        "users": count_users(),
+        "heatmap": heatmap,
+        "tasks": get_task_workload()
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Agregado de ocupação e tarefas de todos os usuários")
+    parser.add_argument("--db", help="Arquivo SQLite (padrão: banco da aplicação)")
+    parser.add_argument("--batch-size", type=int, default=ANALYTICS_BATCH_SIZE,
+                        help="Cronogramas lidos por consulta")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_PATH = args.db
+    database.init_db()
+    result = admin_workload(args.batch_size)
+    database.close_pool()
+    busiest = np.unravel_index(int(np.argmax(result["heatmap"])), result["heatmap"].shape)
+    print(json.dumps({
+        "users": result["users"],
+        "busiest_slot": {"day": WEEK_DAYS[busiest[0]], "start_time": minutes_to_time(int(busiest[1]) * SLOT_MINUTES)},
+        "hourly_minutes": dict(zip(WEEK_DAYS, hourly(result["heatmap"]).tolist())),
+        "tasks": result["tasks"]
+    }, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,33 @@
 import streamlit as st
 from typing import Dict, Optional
-from database import register_user, login_user, get_user_by_token
+from database import DataError, register_user, login_user, get_user_by_token, revoke_token
 
 def register(username: str, email: Optional[str], password: str) -> Optional[Dict]:
     """Realiza o registro de um novo usuário e retorna os dados do usuário criado."""
-    return register_user(username, email, password)
+    try:
+        return register_user(username, email, password)
+    except DataError as e:
+        st.error(str(e))
+        return None
 
 def login(username: str, password: str) -> Optional[str]:
     """Realiza o login do usuário e retorna o token."""
-    return login_user(username, password)
+    try:
+        return login_user(username, password)
+    except DataError as e:
+        st.error(str(e))
+        return None
 
 def get_current_user() -> Optional[Dict]:
     """Obtém informações do usuário atual usando o token."""
     if not st.session_state.get('token'):
         return None
-        
-    return get_user_by_token(st.session_state.get('token', ''))
+    
+    try:
+        return get_user_by_token(st.session_state.get('token', ''))
+    except DataError as e:
+        st.error(str(e))
+        return None
 
 def check_authentication():
     """Verifica se o usuário está autenticado e exibe o formulário de login se necessário."""
@@ -61,6 +73,9 @@ def check_authentication():
 def logout():
     """Realiza o logout do usuário."""
     if "token" in st.session_state:
-        del st.session_state["token"]
+        try:
+            revoke_token(st.session_state.pop("token"))
+        except DataError as e:
+            st.error(str(e))
         st.success("Logout realizado com sucesso!")
         st.experimental_rerun()
\ No newline at end of file
@@ -0,0 +1,980 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+import database
+import calendar_io
+import schedule_index
+import analytics
+
+def _concurrency_worker(db_path: str, operations: int, write_ratio: float) -> Dict:
+    """Executa uma sequência de leituras e escritas como uma sessão independente."""
+    database.DB_PATH = db_path
+    username = f"bench_{uuid.uuid4().hex}"
+    reads = writes = errors = 0
+
+    start = time.perf_counter()
+    try:
+        database.register_user(username, None, "senha")
+        token = database.login_user(username, "senha")
+    except database.DataError:
+        return {"reads": 0, "writes": 0, "errors": 1, "elapsed": time.perf_counter() - start}
+
+    task_ids: List[int] = []
+    for i in range(operations):
+        try:
+            # Distribui as escritas uniformemente ao longo da sequência
+            if int((i + 1) * write_ratio) > int(i * write_ratio):
+                writes += 1
+                task_data = {
+                    "title": f"Tarefa {i}",
+                    "description": "Gerada pelo benchmark",
+                    "due_date": "2024-01-01",
+                    "priority": "Média"
+                }
+                if task_ids and i % 2:
+                    task = database.update_user_task(token, task_ids[-1], task_data)
+                else:
+                    task = database.create_user_task(token, task_data)
+                task_ids.append(task["id"])
+            else:
+                reads += 1
+                database.get_user_tasks(token)
+        except database.DataError:
+            errors += 1
+
+    return {"reads": reads, "writes": writes, "errors": errors, "elapsed": time.perf_counter() - start}
+
+def run_concurrency_benchmark(db_path: str, threads: int = 4, processes: int = 2,
+                              operations: int = 200, write_ratio: float = 0.5) -> Dict:
+    """Executa leitores e escritores concorrentes em threads e processos sobre o mesmo banco."""
+    database.DB_PATH = db_path
+    database.init_db()
+
+    start = time.perf_counter()
+    futures = []
+    # Processos usam "spawn" para não herdar as conexões abertas do pool do processo pai
+    with ProcessPoolExecutor(max_workers=max(processes, 1), mp_context=multiprocessing.get_context("spawn")) as process_pool, \
+            ThreadPoolExecutor(max_workers=max(threads, 1)) as thread_pool:
+        for _ in range(processes):
+            futures.append(process_pool.submit(_concurrency_worker, db_path, operations, write_ratio))
+        for _ in range(threads):
+            futures.append(thread_pool.submit(_concurrency_worker, db_path, operations, write_ratio))
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    reads = sum(r["reads"] for r in results)
+    writes = sum(r["writes"] for r in results)
+    return {
+        "threads": threads,
+        "processes": processes,
+        "reads": reads,
+        "writes": writes,
+        "errors": sum(r["errors"] for r in results),
+        "elapsed": elapsed,
+        "ops_per_second": (reads + writes) / elapsed if elapsed else 0.0
+    }
+
+def _seed_schedules(user_id: int, count: int, days_per_schedule: int = 2):
+    """Insere `count` cronogramas para o usuário, com os dias também na tabela do formato anterior."""
+    days = list(database.WEEK_DAYS)
+
+    def _write(conn):
+        cursor = conn.cursor()
+        # Formato anterior à máscara de dias: uma linha por dia, para comparação
+        cursor.execute(
+            """CREATE TABLE IF NOT EXISTS legacy_schedule_days (
+                   id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   schedule_id INTEGER NOT NULL,
+                   day TEXT NOT NULL
+               )"""
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_legacy_schedule_days_schedule_day ON legacy_schedule_days (schedule_id, day)"
+        )
+        first_id = (cursor.execute("SELECT COALESCE(MAX(id), 0) FROM schedules").fetchone()[0]) + 1
+        schedule_days = [[days[(i + j) % 7] for j in range(days_per_schedule)] for i in range(count)]
+        cursor.executemany(
+            """INSERT INTO schedules (id, user_id, title, description, start_time, end_time, days_mask)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [(first_id + i, user_id, f"Cronograma {i}", "", f"{8 + i % 10:02d}:00", f"{9 + i % 10:02d}:00",
+              database.days_to_mask(schedule_days[i])) for i in range(count)]
+        )
+        cursor.executemany(
+            "INSERT INTO legacy_schedule_days (schedule_id, day) VALUES (?, ?)",
+            [(first_id + i, day) for i in range(count) for day in schedule_days[i]]
+        )
+
+    database.run_write(_write)
+
+def _legacy_get_user_schedules(conn, user_id: int) -> List[Dict]:
+    """Implementação original (N+1): uma consulta de dias por cronograma na tabela de dias."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT s.id, s.title, s.description, s.start_time, s.end_time, s.created_at
+           FROM schedules s WHERE s.user_id = ?""",
+        (user_id,)
+    )
+    result = []
+    for schedule in cursor.fetchall():
+        cursor.execute("SELECT day FROM legacy_schedule_days WHERE schedule_id = ?", (schedule[0],))
+        result.append({
+            "id": schedule[0],
+            "title": schedule[1],
+            "description": schedule[2],
+            "start_time": schedule[3],
+            "end_time": schedule[4],
+            "days": [row[0] for row in cursor.fetchall()],
+            "created_at": schedule[5]
+        })
+    return result
+
+def _legacy_join_get_user_schedules(conn, user_id: int, day: Optional[str] = None) -> List[Dict]:
+    """Implementação anterior à máscara de dias: JOIN com a tabela de dias, agrupado em Python."""
+    cursor = conn.cursor()
+    where = "s.user_id = ?"
+    params: tuple = (user_id,)
+    if day:
+        where += " AND s.id IN (SELECT schedule_id FROM legacy_schedule_days WHERE day = ?)"
+        params += (day,)
+    cursor.execute(
+        f"""SELECT s.id, s.title, s.description, s.start_time, s.end_time, s.created_at, d.day
+            FROM schedules s
+            LEFT JOIN legacy_schedule_days d ON d.schedule_id = s.id
+            WHERE {where}
+            ORDER BY s.id, d.id""",
+        params
+    )
+    result = []
+    for row in cursor.fetchall():
+        if not result or result[-1]["id"] != row[0]:
+            result.append({"id": row[0], "title": row[1], "description": row[2], "start_time": row[3],
+                           "end_time": row[4], "days": [], "created_at": row[5]})
+        if row[6] is not None:
+            result[-1]["days"].append(row[6])
+    return result
+
+def _time_statements(conn, func, repeat: int) -> Dict:
+    """Mede a latência média de `func` e quantas instruções SQL ela executa."""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    conn.set_trace_callback(None)
+    return {"queries": len(statements) // repeat, "latency_ms": elapsed / repeat * 1000}
+
+def run_schedules_benchmark(db_path: str, sizes: List[int] = (10, 1000, 10000), repeat: int = 5) -> List[Dict]:
+    """Compara a busca de cronogramas N+1 e por JOIN na tabela de dias com a leitura da máscara de dias."""
+    database.DB_PATH = db_path
+    database.init_db()
+    # Um único slot no pool garante que todas as consultas passem pela conexão rastreada
+    pool = database.configure_pool(size=1)
+    conn = pool.acquire()
+    pool.release(conn)
+
+    results = []
+    for size in sizes:
+        username = f"bench_{uuid.uuid4().hex}"
+        user = database.register_user(username, None, "senha")
+        token = database.login_user(username, "senha")
+        _seed_schedules(user["id"], size)
+
+        # O conn fica emprestado ao benchmark apenas durante as consultas do formato anterior
+        conn = pool.acquire()
+        try:
+            legacy = _time_statements(conn, lambda: _legacy_get_user_schedules(conn, user["id"]), repeat)
+            join = _time_statements(conn, lambda: _legacy_join_get_user_schedules(conn, user["id"]), repeat)
+            join_on_day = _time_statements(
+                conn, lambda: _legacy_join_get_user_schedules(conn, user["id"], "Quarta"), repeat
+            )
+            day_rows = conn.execute(
+                "SELECT COUNT(*) FROM legacy_schedule_days d JOIN schedules s ON s.id = d.schedule_id WHERE s.user_id = ?",
+                (user["id"],)
+            ).fetchone()[0]
+        finally:
+            pool.release(conn)
+
+        # As funções públicas também validam o token (em cache após o primeiro acesso)
+        current = _time_statements(conn, lambda: database.get_user_schedules(token), repeat)
+        on_day = _time_statements(conn, lambda: database.get_user_schedules_on_day(token, "Quarta"), repeat)
+
+        results.append({
+            "schedules": size,
+            "legacy_day_rows": day_rows,
+            "n_plus_one": legacy,
+            "join": join,
+            "bitmask": current,
+            "join_on_day": join_on_day,
+            "bitmask_on_day": on_day
+        })
+    return results
+
+def _legacy_update_task(token: str, task_id: int, task_data: Dict) -> Dict:
+    """Implementação anterior: verificação de posse, atualização e nova leitura da tarefa."""
+    user = database._require_user(token)
+
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM tasks WHERE id = ? AND user_id = ?", (task_id, user["id"]))
+        if not cursor.fetchone():
+            raise database.NotFoundError("Tarefa não encontrada ou não pertence ao usuário!")
+        cursor.execute(
+            "UPDATE tasks SET title = ?, description = ?, due_date = ?, priority = ? WHERE id = ?",
+            (task_data["title"], task_data["description"], task_data["due_date"], task_data["priority"], task_id)
+        )
+        database._bump_version(cursor, user["id"], "tasks")
+        cursor.execute(
+            "SELECT id, title, description, due_date, priority, created_at FROM tasks WHERE id = ?", (task_id,)
+        )
+        return cursor.fetchone()
+
+    return database.run_write(_write)
+
+def _legacy_delete_task(token: str, task_id: int) -> bool:
+    """Implementação anterior: verificação de posse seguida da exclusão."""
+    user = database._require_user(token)
+
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM tasks WHERE id = ? AND user_id = ?", (task_id, user["id"]))
+        if not cursor.fetchone():
+            raise database.NotFoundError("Tarefa não encontrada ou não pertence ao usuário!")
+        cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        database._bump_version(cursor, user["id"], "tasks")
+        return True
+
+    return database.run_write(_write)
+
+def _legacy_update_schedule(token: str, schedule_id: int, schedule_data: Dict) -> Dict:
+    """Implementação anterior: verificação de posse, atualização e nova leitura do cronograma."""
+    user = database._require_user(token)
+
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM schedules WHERE id = ? AND user_id = ?", (schedule_id, user["id"]))
+        if not cursor.fetchone():
+            raise database.NotFoundError("Cronograma não encontrado ou não pertence ao usuário!")
+        cursor.execute(
+            "UPDATE schedules SET title = ?, description = ?, start_time = ?, end_time = ?, days_mask = ? WHERE id = ?",
+            (schedule_data["title"], schedule_data["description"], schedule_data["start_time"],
+             schedule_data["end_time"], database.days_to_mask(schedule_data["days"]), schedule_id)
+        )
+        database._bump_version(cursor, user["id"], "schedules")
+        return database._fetch_schedules(cursor, "s.id = ?", (schedule_id,))[0]
+
+    return database.run_write(_write)
+
+def _legacy_delete_schedule(token: str, schedule_id: int) -> bool:
+    """Implementação anterior: verificação de posse seguida da exclusão."""
+    user = database._require_user(token)
+
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM schedules WHERE id = ? AND user_id = ?", (schedule_id, user["id"]))
+        if not cursor.fetchone():
+            raise database.NotFoundError("Cronograma não encontrado ou não pertence ao usuário!")
+        cursor.execute("DELETE FROM schedules WHERE id = ?", (schedule_id,))
+        database._bump_version(cursor, user["id"], "schedules")
+        return True
+
+    return database.run_write(_write)
+
+def _percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+def _time_operations(conn, calls: List) -> Dict:
+    """Mede instruções SQL por operação e as latências p50/p99 de cada chamada."""
+    statements = []
+    latencies = []
+    conn.set_trace_callback(statements.append)
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    conn.set_trace_callback(None)
+    # Instruções internas do FTS5 disparadas pelos triggers ('main'.'..._fts_*') não são da camada de dados;
+    # cada trigger disparado também repete no rastreamento a instrução que o acionou
+    statements = [sql for sql in statements if "'main'." not in sql]
+    statements = [sql for i, sql in enumerate(statements) if i == 0 or sql != statements[i - 1]]
+    return {
+        "statements": len(statements) / len(calls),
+        "p50_ms": _percentile(latencies, 50),
+        "p99_ms": _percentile(latencies, 99)
+    }
+
+def run_mutations_benchmark(db_path: str, operations: int = 500) -> Dict:
+    """Compara as mutações com verificação de posse separada e as de instrução única com RETURNING."""
+    database.DB_PATH = db_path
+    database.init_db()
+    # Um único slot no pool garante que todas as instruções passem pela conexão rastreada
+    pool = database.configure_pool(size=1)
+    conn = pool.acquire()
+    pool.release(conn)
+
+    username = f"bench_{uuid.uuid4().hex}"
+    database.register_user(username, None, "senha")
+    token = database.login_user(username, "senha")
+    task_data = {"title": "Tarefa", "description": "", "due_date": "2024-01-01", "priority": "Média"}
+
+    def _seed(create, data) -> List[int]:
+        return [create(token, data)["id"] for _ in range(operations)]
+
+    def _seed_slots() -> List[tuple]:
+        # Horários distintos: a verificação de conflitos não rejeita as edições
+        slots = [_schedule_slot(i) for i in range(operations)]
+        return [(database.create_user_schedule(token, slot)["id"], slot) for slot in slots]
+
+    variants = {
+        "before": (_legacy_update_task, _legacy_delete_task, _legacy_update_schedule, _legacy_delete_schedule),
+        "after": (database.update_user_task, database.delete_user_task,
+                  database.update_user_schedule, database.delete_user_schedule)
+    }
+    results: Dict[str, Dict] = {}
+    for variant, (update_task, delete_task, update_schedule, delete_schedule) in variants.items():
+        task_ids = _seed(database.create_user_task, task_data)
+        schedules = _seed_slots()
+        measurements = {
+            "update_task": [lambda i=i: update_task(token, i, task_data) for i in task_ids],
+            "delete_task": [lambda i=i: delete_task(token, i) for i in task_ids],
+            "update_schedule": [lambda i=i, slot=slot: update_schedule(token, i, slot) for i, slot in schedules],
+            "delete_schedule": [lambda i=i: delete_schedule(token, i) for i, _ in schedules]
+        }
+        for operation, calls in measurements.items():
+            results.setdefault(operation, {})[variant] = _time_operations(conn, calls)
+    return results
+
+def _schedule_slot(i: int) -> Dict:
+    """Cronograma de um minuto, sem sobreposição com os de outros índices (até 10.073 por usuário)."""
+    start = i // 7
+    return {"title": f"Bloco {i}", "description": "", "start_time": schedule_index.minutes_to_time(start),
+            "end_time": schedule_index.minutes_to_time(start + 1), "days": [database.WEEK_DAYS[i % 7]]}
+
+def run_conflicts_benchmark(db_path: str, sizes: List[int] = (100, 1000, 5000), checks: int = 200) -> List[Dict]:
+    """Mede a verificação de conflitos com o índice de intervalos para usuários com muitos cronogramas."""
+    database.DB_PATH = db_path
+    database.init_db()
+
+    results = []
+    for size in sizes:
+        username = f"bench_{uuid.uuid4().hex}"
+        database.register_user(username, None, "senha")
+        token = database.login_user(username, "senha")
+        database.bulk_create_user_schedules(token, [_schedule_slot(i) for i in range(size)])
+        user_id = database.get_user_by_token(token)["id"]
+        index = database._schedule_index_cache.get(user_id, database.get_user_versions(token)["schedules"])
+
+        # Verificação isolada no índice em memória: metade dos horários conflita
+        probes = [_schedule_slot((i * 7919) % size) for i in range(checks)]
+        start = time.perf_counter()
+        for i, probe in enumerate(probes):
+            index.find_conflicts(probe["start_time"], probe["end_time"] if i % 2 else probe["start_time"],
+                                 database.days_to_mask(probe["days"]))
+        check_us = (time.perf_counter() - start) / checks * 1_000_000
+
+        # Reconstrução do índice a partir do banco (primeira escrita após reiniciar o processo)
+        database._schedule_index_cache.clear()
+        start = time.perf_counter()
+        with database.get_connection() as conn:
+            database._load_schedule_index(conn.cursor(), user_id)
+        rebuild_ms = (time.perf_counter() - start) * 1000
+
+        # Criação com verificação, em horários livres (após o último bloco)
+        latencies = []
+        for i in range(checks):
+            slot = _schedule_slot(size + i)
+            begin = time.perf_counter()
+            database.create_user_schedule(token, slot)
+            latencies.append((time.perf_counter() - begin) * 1000)
+
+        start = time.perf_counter()
+        conflicts = database.find_schedule_conflicts(token)
+        report_ms = (time.perf_counter() - start) * 1000
+
+        results.append({
+            "schedules": size,
+            "check_us": check_us,
+            "index_rebuild_ms": rebuild_ms,
+            "create_p50_ms": _percentile(latencies, 50),
+            "create_p99_ms": _percentile(latencies, 99),
+            "report_ms": report_ms,
+            "conflicts": len(conflicts)
+        })
+    return results
+
+def _write_task_files(directory: str, rows: int) -> Dict[str, str]:
+    """Gera, linha a linha, um CSV e um .ics com `rows` tarefas."""
+    priorities = ["Baixa", "Média", "Alta"]
+    paths = {"csv": os.path.join(directory, f"tasks_{rows}.csv"), "ics": os.path.join(directory, f"tasks_{rows}.ics")}
+    with open(paths["csv"], "w", newline="", encoding="utf-8") as csv_file:
+        csv_file.write("title,description,due_date,priority\r\n")
+        for i in range(rows):
+            csv_file.write(f"Tarefa {i},Gerada pelo benchmark,2024-{i % 12 + 1:02d}-{i % 28 + 1:02d},{priorities[i % 3]}\r\n")
+    with open(paths["ics"], "w", newline="", encoding="utf-8") as ics_file:
+        ics_file.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n")
+        for i in range(rows):
+            ics_file.write(f"BEGIN:VTODO\r\nUID:bench-{i}\r\nSUMMARY:Tarefa {i}\r\n"
+                           f"DUE;VALUE=DATE:2024{i % 12 + 1:02d}{i % 28 + 1:02d}\r\nPRIORITY:{i % 9 + 1}\r\nEND:VTODO\r\n")
+        ics_file.write("END:VCALENDAR\r\n")
+    return paths
+
+def _measure(func) -> Dict:
+    """Mede o tempo e o pico de memória alocada (tracemalloc) durante `func`."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": elapsed, "peak_kb": peak / 1024, "result": result}
+
+def run_io_benchmark(db_path: str, sizes: List[int] = (1000, 100000)) -> List[Dict]:
+    """Importa e exporta arquivos CSV e .ics de tamanhos crescentes; o pico de memória deve ficar constante."""
+    database.DB_PATH = db_path
+    database.init_db()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for rows in sizes:
+            paths = _write_task_files(tmpdir, rows)
+            entry: Dict = {"rows": rows}
+            for fmt, importer, exporter in (("csv", calendar_io.import_tasks_csv, calendar_io.iter_tasks_csv),
+                                            ("ics", calendar_io.import_ics, calendar_io.iter_ics)):
+                username = f"bench_{uuid.uuid4().hex}"
+                database.register_user(username, None, "senha")
+                token = database.login_user(username, "senha")
+
+                with open(paths[fmt], newline="", encoding="utf-8") as source:
+                    imported = _measure(lambda: importer(token, source))
+                out_path = os.path.join(tmpdir, f"export.{fmt}")
+                with open(out_path, "w", newline="", encoding="utf-8") as target:
+                    exported = _measure(lambda: target.writelines(exporter(token)))
+
+                entry[fmt] = {
+                    "import_seconds": imported["seconds"],
+                    "import_rows_per_second": rows / imported["seconds"] if imported["seconds"] else 0.0,
+                    "import_peak_kb": imported["peak_kb"],
+                    "export_seconds": exported["seconds"],
+                    "export_peak_kb": exported["peak_kb"],
+                    "export_bytes": os.path.getsize(out_path)
+                }
+            results.append(entry)
+    return results
+
+def _seed_population(users: int, schedules_per_user: int, tasks_per_user: int, seed: int = 42):
+    """Insere diretamente `users` usuários com cronogramas e tarefas pseudoaleatórios (sem hash de senha)."""
+    rng = random.Random(seed)
+    batch = 10000
+
+    def _write(conn):
+        cursor = conn.cursor()
+        first_user = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0] + 1
+        for offset in range(0, users, batch):
+            user_ids = range(first_user + offset, first_user + min(offset + batch, users))
+            cursor.executemany(
+                "INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, NULL, '')",
+                [(user_id, f"bench_{user_id}") for user_id in user_ids]
+            )
+            schedules = []
+            for user_id in user_ids:
+                for i in range(schedules_per_user):
+                    start = rng.randrange(6 * 60, 20 * 60, 15)
+                    schedules.append((user_id, f"Cronograma {i}", "", schedule_index.minutes_to_time(start),
+                                      schedule_index.minutes_to_time(start + rng.choice((45, 60, 90, 120))),
+                                      rng.randrange(1, 128)))
+            cursor.executemany(
+                """INSERT INTO schedules (user_id, title, description, start_time, end_time, days_mask)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                schedules
+            )
+            cursor.executemany(
+                "INSERT INTO tasks (user_id, title, description, due_date, priority) VALUES (?, ?, '', ?, ?)",
+                [(user_id, f"Tarefa {i}", f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                  rng.choice(database.TASK_PRIORITIES))
+                 for user_id in user_ids for i in range(tasks_per_user)]
+            )
+
+    database.run_write(_write)
+
+def _loop_heatmap(schedules: List[Dict]) -> List[List[int]]:
+    """Mapa 7 x 96 de minutos de cronograma calculado com laços sobre os dicionários (para comparação)."""
+    grid = [[0] * analytics.SLOTS_PER_DAY for _ in range(7)]
+    for schedule in schedules:
+        start = schedule_index.time_to_minutes(schedule["start_time"])
+        end = schedule_index.time_to_minutes(schedule["end_time"])
+        for day in schedule["days"]:
+            row = grid[database.WEEK_DAYS.index(day)]
+            for slot in range(start // analytics.SLOT_MINUTES, (end - 1) // analytics.SLOT_MINUTES + 1):
+                slot_start = slot * analytics.SLOT_MINUTES
+                row[slot] += min(end, slot_start + analytics.SLOT_MINUTES) - max(start, slot_start)
+    return grid
+
+def run_analytics_benchmark(db_path: str, users: int = 100000, schedules_per_user: int = 3,
+                            tasks_per_user: int = 5, batch_size: int = analytics.ANALYTICS_BATCH_SIZE) -> Dict:
+    """Compara o agregado de ocupação vetorizado e em lotes com laços sobre todos os cronogramas em memória."""
+    database.DB_PATH = db_path
+    database.init_db()
+    start = time.perf_counter()
+    _seed_population(users, schedules_per_user, tasks_per_user)
+    seed_seconds = time.perf_counter() - start
+
+    vectorized = _measure(lambda: analytics.admin_workload(batch_size))
+
+    def _loop():
+        with database.get_connection() as conn:
+            rows = conn.execute("SELECT start_time, end_time, days_mask FROM schedules").fetchall()
+        schedules = [{"start_time": row[0], "end_time": row[1], "days": database.mask_to_days(row[2])} for row in rows]
+        return _loop_heatmap(schedules)
+
+    loop = _measure(_loop)
+    return {
+        "users": users,
+        "schedules": users * schedules_per_user,
+        "seed_seconds": seed_seconds,
+        "vectorized": {"seconds": vectorized["seconds"], "peak_kb": vectorized["peak_kb"], "batch_size": batch_size},
+        "loop": {"seconds": loop["seconds"], "peak_kb": loop["peak_kb"]},
+        "same_result": vectorized["result"]["heatmap"].tolist() == loop["result"],
+        "task_groups": len(vectorized["result"]["tasks"])
+    }
+
+# Sílabas do vocabulário sintético da busca; as palavras seguem uma distribuição de Zipf, como em texto real
+SEARCH_SYLLABLES = ("pro", "va", "cal", "cu", "lo", "fi", "si", "ca", "qui", "mi", "re", "vi", "são", "tra", "ba",
+                    "lho", "lei", "tu", "ra", "ex", "er", "cí", "cio", "his", "tó", "ria", "geo", "gra", "fia", "da",
+                    "ção", "me", "to", "do", "lab", "bio", "es", "ta", "ti", "al", "ge", "bra")
+
+def _search_vocabulary(size: int = 8000, seed: int = 3) -> tuple:
+    """Vocabulário sintético e a probabilidade de cada palavra (Zipf: a k-ésima palavra tem peso 1/k)."""
+    rng = random.Random(seed)
+    words = sorted({"".join(rng.choices(SEARCH_SYLLABLES, k=rng.randint(2, 4))) for _ in range(size)})
+    rng.shuffle(words)
+    weights = 1 / np.arange(1, len(words) + 1)
+    return np.array(words, dtype=object), weights / weights.sum()
+
+def _seed_search_rows(rows: int, users: int, seed: int = 7) -> int:
+    """Insere `rows` tarefas (título de 4 palavras, descrição de 12), distribuídas entre `users` usuários.
+
+    As tarefas passam pelos triggers, ou seja, são indexadas como em produção. Retorna o primeiro id de usuário."""
+    words, weights = _search_vocabulary()
+    generator = np.random.default_rng(seed)
+    batch = 20000
+
+    def _write(conn):
+        cursor = conn.cursor()
+        first_user = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0] + 1
+        cursor.executemany(
+            "INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, NULL, '')",
+            [(first_user + i, f"search_{first_user + i}") for i in range(users)]
+        )
+        for offset in range(0, rows, batch):
+            size = min(batch, rows - offset)
+            sampled = words[generator.choice(len(words), size=(size, 16), p=weights)]
+            cursor.executemany(
+                "INSERT INTO tasks (user_id, title, description, due_date, priority) VALUES (?, ?, ?, '2024-05-10', 'Média')",
+                [(first_user + (offset + i) % users, " ".join(sampled[i, :4]), " ".join(sampled[i, 4:]))
+                 for i in range(size)]
+            )
+        return first_user
+
+    return database.run_write(_write)
+
+def run_search_benchmark(db_path: str, rows: int = 1000000, users: int = 10000, queries: int = 500) -> Dict:
+    """Mede a latência da busca FTS5 por usuário, com prefixos, em uma tabela de `rows` tarefas."""
+    database.DB_PATH = db_path
+    database.init_db()
+    start = time.perf_counter()
+    first_user = _seed_search_rows(rows, users)
+    seed_seconds = time.perf_counter() - start
+    with database.get_connection() as conn:
+        for _, fts in database.SEARCH_TABLES:
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
+        conn.commit()
+
+    rng = random.Random(11)
+    tokens = []
+    for i in range(min(queries, users)):
+        user_id = first_user + rng.randrange(users)
+        with database.get_connection() as conn:
+            conn.execute("INSERT INTO tokens (user_id, token) VALUES (?, ?)", (user_id, f"search-token-{i}"))
+            conn.commit()
+        tokens.append(f"search-token-{i}")
+    # Palavras buscadas com a mesma frequência do texto, truncadas em prefixos de tamanho aleatório
+    words, weights = _search_vocabulary()
+    sampled = words[np.random.default_rng(13).choice(len(words), size=(queries, 2), p=weights)]
+    texts = [" ".join(word[:rng.randint(2, len(word))] for word in sampled[i, :rng.randint(1, 2)])
+             for i in range(queries)]
+    for token in tokens:
+        database.get_user_by_token(token)  # validação de token fora da medição
+
+    latencies = []
+    results = 0
+    for i, text in enumerate(texts):
+        begin = time.perf_counter()
+        results += len(database.search_user_tasks(tokens[i % len(tokens)], text))
+        latencies.append((time.perf_counter() - begin) * 1000)
+    return {
+        "rows": rows,
+        "users": users,
+        "seed_seconds": seed_seconds,
+        "queries": queries,
+        "p50_ms": _percentile(latencies, 50),
+        "p99_ms": _percentile(latencies, 99),
+        "max_ms": max(latencies),
+        "avg_results": results / queries
+    }
+
+# Maior número de cronogramas de um minuto sem sobreposição por usuário (ver _schedule_slot)
+MAX_SLOTS_PER_USER = 7 * 1439
+
+def _seed_dataset(users: int, tasks: int, schedules: int, seed: int = 21) -> List[str]:
+    """Gera usuários (senha "senha"), tarefas e cronogramas distribuídos igualmente entre eles.
+
+    Os totais de tarefas e cronogramas vão de 1 a milhões de linhas; as linhas passam pelos triggers
+    como em produção. Retorna os nomes dos usuários criados."""
+    if schedules > users * MAX_SLOTS_PER_USER:
+        raise ValueError(f"No máximo {MAX_SLOTS_PER_USER} cronogramas por usuário")
+    rng = random.Random(seed)
+    password_hash = database.hash_password("senha")
+    batch = 20000
+    words = ("Prova", "Lista", "Leitura", "Trabalho", "Revisão", "Projeto", "Seminário", "Exercícios")
+    subjects = ("Cálculo", "Física", "Química", "História", "Biologia", "Programação")
+
+    def _write(conn):
+        cursor = conn.cursor()
+        first_user = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0] + 1
+        cursor.executemany(
+            "INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, NULL, ?)",
+            [(first_user + u, f"load_{first_user + u}", password_hash) for u in range(users)]
+        )
+        for offset in range(0, tasks, batch):
+            cursor.executemany(
+                "INSERT INTO tasks (user_id, title, description, due_date, priority) VALUES (?, ?, ?, ?, ?)",
+                [(first_user + i % users, f"{rng.choice(words)} de {rng.choice(subjects)}", "Gerada pelo benchmark",
+                  f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", rng.choice(database.TASK_PRIORITIES))
+                 for i in range(offset, min(offset + batch, tasks))]
+            )
+        for offset in range(0, schedules, batch):
+            # O i-ésimo cronograma de um usuário ocupa o bloco i // users: nenhum se sobrepõe
+            rows = []
+            for i in range(offset, min(offset + batch, schedules)):
+                slot = _schedule_slot(i // users)
+                rows.append((first_user + i % users, f"Estudo de {rng.choice(subjects)}", "", slot["start_time"],
+                             slot["end_time"], database.days_to_mask(slot["days"])))
+            cursor.executemany(
+                """INSERT INTO schedules (user_id, title, description, start_time, end_time, days_mask)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+        return [f"load_{first_user + u}" for u in range(users)]
+
+    return database.run_write(_write)
+
+# Operações de uma sessão simulada e seus pesos no sorteio
+LOAD_OPERATIONS = {
+    "get_user_by_token": 10, "get_user_versions": 5, "get_if_changed": 8, "get_user_tasks": 10,
+    "query_user_tasks": 10, "search_user_tasks": 4, "create_user_task": 8, "update_user_task": 6,
+    "delete_user_task": 4, "get_user_schedules": 8, "get_user_schedules_on_day": 4, "search_user_schedules": 2,
+    "find_schedule_conflicts": 2, "find_free_slots": 3, "suggest_study_slots": 2, "create_user_schedule": 4,
+    "update_user_schedule": 3, "delete_user_schedule": 2, "login_user": 2
+}
+
+def _load_session(db_path: str, username: str, operations: int, first_slot: int, seed: int) -> Dict:
+    """Sessão simulada: login, `operations` chamadas sorteadas de LOAD_OPERATIONS e logout.
+
+    Retorna as latências (ms) e os erros por função da camada de dados."""
+    database.DB_PATH = db_path
+    rng = random.Random(seed)
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    state: Dict = {"slot": first_slot, "tasks": [], "schedules": []}
+
+    def _call(name: str, func):
+        start = time.perf_counter()
+        try:
+            result = func()
+        except database.DataError:
+            errors[name] = errors.get(name, 0) + 1
+            return None
+        finally:
+            latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        return result
+
+    state["token"] = _call("login_user", lambda: database.login_user(username, "senha"))
+    if not state["token"]:
+        return {"latencies": latencies, "errors": errors}
+    state["tasks"] = [task["id"] for task in _call("get_user_tasks", lambda: database.get_user_tasks(state["token"])) or []]
+    task_data = {"title": "Tarefa da sessão", "description": "", "due_date": "2024-06-01", "priority": "Média"}
+
+    def _new_schedule() -> Dict:
+        state["slot"] = (state["slot"] + 1) % MAX_SLOTS_PER_USER
+        return _schedule_slot(state["slot"])
+
+    def _created_task():
+        task = database.create_user_task(state["token"], task_data)
+        state["tasks"].append(task["id"])
+        return task
+
+    def _created_schedule():
+        schedule = database.create_user_schedule(state["token"], _new_schedule())
+        state["schedules"].append(schedule["id"])
+        return schedule
+
+    def _pop(kind: str) -> Optional[int]:
+        return state[kind].pop(rng.randrange(len(state[kind]))) if state[kind] else None
+
+    calls = {
+        "get_user_by_token": lambda: database.get_user_by_token(state["token"]),
+        "get_user_versions": lambda: database.get_user_versions(state["token"]),
+        "get_if_changed": lambda: database.get_if_changed(state["token"], rng.choice(("tasks", "schedules")), 0),
+        "get_user_tasks": lambda: database.get_user_tasks(state["token"]),
+        "query_user_tasks": lambda: database.query_user_tasks(
+            state["token"], order_by=rng.choice(("due_date", "priority")), priorities=[rng.choice(database.TASK_PRIORITIES)]
+        ),
+        "search_user_tasks": lambda: database.search_user_tasks(state["token"], rng.choice(("prov", "lista cálc", "fís"))),
+        "create_user_task": _created_task,
+        "update_user_task": lambda: state["tasks"] and database.update_user_task(
+            state["token"], rng.choice(state["tasks"]), task_data
+        ),
+        "delete_user_task": lambda: (lambda task_id: task_id and database.delete_user_task(state["token"], task_id))(
+            _pop("tasks")
+        ),
+        "get_user_schedules": lambda: database.get_user_schedules(state["token"]),
+        "get_user_schedules_on_day": lambda: database.get_user_schedules_on_day(
+            state["token"], rng.choice(database.WEEK_DAYS)
+        ),
+        "search_user_schedules": lambda: database.search_user_schedules(state["token"], "estudo"),
+        "find_schedule_conflicts": lambda: database.find_schedule_conflicts(state["token"]),
+        "find_free_slots": lambda: database.find_free_slots(state["token"]),
+        "suggest_study_slots": lambda: database.suggest_study_slots(state["token"], limit=5),
+        "create_user_schedule": _created_schedule,
+        "update_user_schedule": lambda: state["schedules"] and database.update_user_schedule(
+            state["token"], rng.choice(state["schedules"]), _new_schedule()
+        ),
+        "delete_user_schedule": lambda: (lambda schedule_id: schedule_id and database.delete_user_schedule(
+            state["token"], schedule_id
+        ))(_pop("schedules")),
+        "login_user": lambda: database.login_user(username, "senha")
+    }
+    names = list(LOAD_OPERATIONS)
+    for name in rng.choices(names, weights=[LOAD_OPERATIONS[n] for n in names], k=operations):
+        _call(name, calls[name])
+    _call("revoke_token", lambda: database.revoke_token(state["token"]))
+    return {"latencies": latencies, "errors": errors}
+
+def _git_commit() -> Optional[str]:
+    """Commit atual do repositório, para comparar resultados entre versões (None fora de um repositório git)."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _db_size(db_path: str) -> int:
+    """Tamanho do banco em bytes, incluindo o WAL."""
+    return sum(os.path.getsize(path) for path in (db_path, db_path + "-wal") if os.path.exists(path))
+
+def run_load_benchmark(db_path: str, users: int = 100, tasks: int = 10000, schedules: int = 1000,
+                       threads: int = 8, processes: int = 2, operations: int = 200, seed: int = 21) -> Dict:
+    """Teste de carga: gera os dados e executa sessões simuladas concorrentes em threads e processos.
+
+    Cada sessão usa um usuário gerado (em rodízio) e chama as funções da camada de dados; o resultado
+    traz vazão, latências p50/p95/p99 por função e o tamanho do banco."""
+    database.DB_PATH = db_path
+    database.init_db()
+    start = time.perf_counter()
+    usernames = _seed_dataset(users, tasks, schedules, seed)
+    seed_seconds = time.perf_counter() - start
+    size_after_seed = _db_size(db_path)
+
+    sessions = threads + processes
+    # Cronogramas novos de cada sessão começam depois dos gerados, em faixas separadas por sessão
+    first_slot = -(-schedules // users)
+    jobs = [(db_path, usernames[i % users], operations, first_slot + i * operations, seed + i) for i in range(sessions)]
+    start = time.perf_counter()
+    # Processos usam "spawn" para não herdar as conexões abertas do pool do processo pai
+    with ProcessPoolExecutor(max_workers=max(processes, 1), mp_context=multiprocessing.get_context("spawn")) as process_pool, \
+            ThreadPoolExecutor(max_workers=max(threads, 1)) as thread_pool:
+        futures = [process_pool.submit(_load_session, *job) for job in jobs[:processes]]
+        futures += [thread_pool.submit(_load_session, *job) for job in jobs[processes:]]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for result in results:
+        for name, samples in result["latencies"].items():
+            latencies.setdefault(name, []).extend(samples)
+        for name, count in result["errors"].items():
+            errors[name] = errors.get(name, 0) + count
+    total = sum(len(samples) for samples in latencies.values())
+    return {
+        "commit": _git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {"users": users, "tasks": tasks, "schedules": schedules, "threads": threads,
+                   "processes": processes, "operations": operations, "seed": seed},
+        "seed_seconds": seed_seconds,
+        "elapsed": elapsed,
+        "calls": total,
+        "errors": sum(errors.values()),
+        "ops_per_second": total / elapsed if elapsed else 0.0,
+        "db_size_bytes": {"after_seed": size_after_seed, "after_load": _db_size(db_path)},
+        "operations": {
+            name: {
+                "calls": len(samples),
+                "errors": errors.get(name, 0),
+                "ops_per_second": len(samples) / elapsed if elapsed else 0.0,
+                "p50_ms": _percentile(samples, 50),
+                "p95_ms": _percentile(samples, 95),
+                "p99_ms": _percentile(samples, 99)
+            }
+            for name, samples in sorted(latencies.items())
+        }
+    }
+
+def compare_load_results(baseline: Dict, current: Dict, tolerance: float = 0.2) -> List[Dict]:
+    """Compara o p95 de cada função com um resultado anterior; regressão é um aumento acima de `tolerance`."""
+    comparison = []
+    for name, stats in current["operations"].items():
+        before = baseline.get("operations", {}).get(name)
+        if not before:
+            continue
+        ratio = stats["p95_ms"] / before["p95_ms"] if before["p95_ms"] else 1.0
+        comparison.append({
+            "operation": name,
+            "baseline_p95_ms": before["p95_ms"],
+            "p95_ms": stats["p95_ms"],
+            "ratio": ratio,
+            "regression": ratio > 1 + tolerance
+        })
+    return comparison
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmarks da camada de dados do Calendário Estudantil")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    concurrency = subparsers.add_parser("concurrency", help="Leitores e escritores concorrentes")
+    concurrency.add_argument("--db", help="Arquivo SQLite (padrão: arquivo temporário)")
+    concurrency.add_argument("--threads", type=int, default=4)
+    concurrency.add_argument("--processes", type=int, default=2)
+    concurrency.add_argument("--operations", type=int, default=200)
+    concurrency.add_argument("--write-ratio", type=float, default=0.5)
+
+    schedules = subparsers.add_parser("schedules", help="Busca de cronogramas: tabela de dias vs. máscara de dias")
+    schedules.add_argument("--db", help="Arquivo SQLite (padrão: arquivo temporário)")
+    schedules.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    schedules.add_argument("--repeat", type=int, default=5)
+
+    mutations = subparsers.add_parser("mutations", help="Mutações: verificação de posse separada vs. RETURNING")
+    mutations.add_argument("--db", help="Arquivo SQLite (padrão: arquivo temporário)")
+    mutations.add_argument("--operations", type=int, default=500)
+
+    conflicts = subparsers.add_parser("conflicts", help="Detecção de conflitos de horário com o índice de intervalos")
+    conflicts.add_argument("--db", help="Arquivo SQLite (padrão: arquivo temporário)")
+    conflicts.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    conflicts.add_argument("--checks", type=int, default=200)
+
+    analytics_parser = subparsers.add_parser("analytics", help="Agregado de ocupação de todos os usuários: NumPy em lotes vs. laços")
+    analytics_parser.add_argument("--db", help="Arquivo SQLite (padrão: arquivo temporário)")
+    analytics_parser.add_argument("--users", type=int, default=100000)
+    analytics_parser.add_argument("--schedules-per-user", type=int, default=3)
+    analytics_parser.add_argument("--tasks-per-user", type=int, default=5)
+    analytics_parser.add_argument("--batch-size", type=int, default=analytics.ANALYTICS_BATCH_SIZE)
+
+    search = subparsers.add_parser("search", help="Latência da busca FTS5 em uma tabela grande de tarefas")
+    search.add_argument("--db", help="Arquivo SQLite (padrão: arquivo temporário)")
+    search.add_argument("--rows", type=int, default=1000000)
+    search.add_argument("--users", type=int, default=10000)
+    search.add_argument("--queries", type=int, default=500)
+
+    load = subparsers.add_parser("load", help="Teste de carga: sessões concorrentes sobre dados gerados")
+    load.add_argument("--db", help="Arquivo SQLite (padrão: arquivo temporário)")
+    load.add_argument("--users", type=int, default=100)
+    load.add_argument("--tasks", type=int, default=10000)
+    load.add_argument("--schedules", type=int, default=1000)
+    load.add_argument("--threads", type=int, default=8)
+    load.add_argument("--processes", type=int, default=2)
+    load.add_argument("--operations", type=int, default=200, help="Chamadas por sessão")
+    load.add_argument("--seed", type=int, default=21)
+    load.add_argument("--output", help="Grava o resultado em um arquivo JSON")
+    load.add_argument("--baseline", help="Resultado JSON anterior para comparação")
+    load.add_argument("--tolerance", type=float, default=0.2, help="Aumento de p95 tolerado na comparação")
+
+    io_parser = subparsers.add_parser("io", help="Importação e exportação em CSV e .ics")
+    io_parser.add_argument("--db", help="Arquivo SQLite (padrão: arquivo temporário)")
+    io_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+
+    args = parser.parse_args(argv)
+
+    if args.command == "concurrency":
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = args.db or os.path.join(tmpdir, "benchmark.db")
+            result = run_concurrency_benchmark(db_path, args.threads, args.processes,
+                                               args.operations, args.write_ratio)
+            database.close_pool()
+        print(json.dumps(result, indent=2))
+    elif args.command == "schedules":
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = args.db or os.path.join(tmpdir, "benchmark.db")
+            result = run_schedules_benchmark(db_path, args.sizes, args.repeat)
+            database.close_pool()
+        print(json.dumps(result, indent=2))
+    elif args.command == "mutations":
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = args.db or os.path.join(tmpdir, "benchmark.db")
+            result = run_mutations_benchmark(db_path, args.operations)
+            database.close_pool()
+        print(json.dumps(result, indent=2))
+    elif args.command == "conflicts":
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = args.db or os.path.join(tmpdir, "benchmark.db")
+            result = run_conflicts_benchmark(db_path, args.sizes, args.checks)
+            database.close_pool()
+        print(json.dumps(result, indent=2))
+    elif args.command == "analytics":
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = args.db or os.path.join(tmpdir, "benchmark.db")
+            result = run_analytics_benchmark(db_path, args.users, args.schedules_per_user,
+                                             args.tasks_per_user, args.batch_size)
+            database.close_pool()
+        print(json.dumps(result, indent=2))
+    elif args.command == "search":
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = args.db or os.path.join(tmpdir, "benchmark.db")
+            result = run_search_benchmark(db_path, args.rows, args.users, args.queries)
+            database.close_pool()
+        print(json.dumps(result, indent=2))
+    elif args.command == "load":
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = args.db or os.path.join(tmpdir, "benchmark.db")
+            result = run_load_benchmark(db_path, args.users, args.tasks, args.schedules, args.threads,
+                                        args.processes, args.operations, args.seed)
+            database.close_pool()
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as baseline_file:
+                result["comparison"] = compare_load_results(json.load(baseline_file), result, args.tolerance)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as output_file:
+                json.dump(result, output_file, indent=2)
+        print(json.dumps(result, indent=2))
+    elif args.command == "io":
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = args.db or os.path.join(tmpdir, "benchmark.db")
+            result = run_io_benchmark(db_path, args.sizes)
+            database.close_pool()
+        print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
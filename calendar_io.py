@@ -0,0 +1,307 @@
+import csv
+import io
+import glob
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from database import (
+    WEEK_DAYS, iter_user_tasks, iter_user_schedules,
+    bulk_create_user_tasks, bulk_create_user_schedules
+)
+
+# Configuração da importação e exportação
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+# Quantidade máxima de erros detalhados no resumo de uma importação
+IMPORT_ERROR_SAMPLES = 20
+# Arquivos temporários das exportações feitas pela interface e idade máxima (em segundos) antes da remoção
+EXPORT_FILE_PREFIX = "calendario-export-"
+EXPORT_FILE_MAX_AGE = float(os.getenv("EXPORT_FILE_MAX_AGE", "3600"))
+
+TASK_CSV_FIELDS = ["id", "title", "description", "due_date", "priority", "created_at"]
+SCHEDULE_CSV_FIELDS = ["id", "title", "description", "start_time", "end_time", "days", "created_at"]
+# Separador dos dias da semana na coluna "days" do CSV
+CSV_DAYS_SEPARATOR = ";"
+
+ICS_DAYS = dict(zip(WEEK_DAYS, ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]))
+ICS_PRIORITIES = {"Alta": 1, "Média": 5, "Baixa": 9}
+ICS_PRODID = "-//Calendario Estudantil//PT-BR"
+
+# Exportação
+def _csv_line(row: List) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue()
+
+def iter_tasks_csv(token: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Gera as linhas do CSV de tarefas do usuário, uma por vez."""
+    yield _csv_line(TASK_CSV_FIELDS)
+    for task in iter_user_tasks(token, batch_size):
+        yield _csv_line([task[field] for field in TASK_CSV_FIELDS])
+
+def iter_schedules_csv(token: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Gera as linhas do CSV de cronogramas do usuário, uma por vez."""
+    yield _csv_line(SCHEDULE_CSV_FIELDS)
+    for schedule in iter_user_schedules(token, batch_size):
+        row = dict(schedule, days=CSV_DAYS_SEPARATOR.join(schedule["days"]))
+        yield _csv_line([row[field] for field in SCHEDULE_CSV_FIELDS])
+
+def _ics_escape(text: Optional[str]) -> str:
+    text = (text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+    return text.replace("\r", "").replace("\n", "\\n")
+
+def _ics_line(line: str) -> str:
+    """Dobra a linha em partes de até 75 octetos, como exige a RFC 5545."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Não cortar no meio de um caractere UTF-8
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = 74  # linhas de continuação começam com um espaço
+    return "\r\n ".join(parts) + "\r\n"
+
+def _schedule_start(schedule: Dict) -> date:
+    """Primeira ocorrência do cronograma: o primeiro dia dele na semana em que foi criado."""
+    created = datetime.strptime(str(schedule["created_at"])[:10], "%Y-%m-%d").date()
+    monday = created - timedelta(days=created.weekday())
+    offsets = [WEEK_DAYS.index(day) for day in schedule["days"] if day in WEEK_DAYS]
+    return monday + timedelta(days=min(offsets) if offsets else 0)
+
+def iter_ics(token: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Gera um calendário iCalendar com as tarefas (VTODO) e os cronogramas (VEVENT semanais)."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield _ics_line("BEGIN:VCALENDAR")
+    yield _ics_line("VERSION:2.0")
+    yield _ics_line(f"PRODID:{ICS_PRODID}")
+
+    for task in iter_user_tasks(token, batch_size):
+        yield _ics_line("BEGIN:VTODO")
+        yield _ics_line(f"UID:task-{task['id']}@calendario-estudantil")
+        yield _ics_line(f"DTSTAMP:{stamp}")
+        yield _ics_line(f"SUMMARY:{_ics_escape(task['title'])}")
+        if task["description"]:
+            yield _ics_line(f"DESCRIPTION:{_ics_escape(task['description'])}")
+        yield _ics_line(f"DUE;VALUE=DATE:{task['due_date'].replace('-', '')}")
+        yield _ics_line(f"PRIORITY:{ICS_PRIORITIES.get(task['priority'], 0)}")
+        yield _ics_line("END:VTODO")
+
+    for schedule in iter_user_schedules(token, batch_size):
+        start = _schedule_start(schedule).strftime("%Y%m%d")
+        rule = "FREQ=WEEKLY"
+        if schedule["days"]:
+            rule += ";BYDAY=" + ",".join(ICS_DAYS[day] for day in schedule["days"] if day in ICS_DAYS)
+        yield _ics_line("BEGIN:VEVENT")
+        yield _ics_line(f"UID:schedule-{schedule['id']}@calendario-estudantil")
+        yield _ics_line(f"DTSTAMP:{stamp}")
+        yield _ics_line(f"SUMMARY:{_ics_escape(schedule['title'])}")
+        if schedule["description"]:
+            yield _ics_line(f"DESCRIPTION:{_ics_escape(schedule['description'])}")
+        yield _ics_line(f"DTSTART:{start}T{schedule['start_time'].replace(':', '')}00")
+        yield _ics_line(f"DTEND:{start}T{schedule['end_time'].replace(':', '')}00")
+        yield _ics_line(f"RRULE:{rule}")
+        yield _ics_line("END:VEVENT")
+
+    yield _ics_line("END:VCALENDAR")
+
+def write_export_file(lines: Iterable[str], filename: str, directory: Optional[str] = None) -> str:
+    """Grava as linhas de uma exportação, uma a uma, em um arquivo temporário e retorna o seu caminho."""
+    handle = tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="", prefix=EXPORT_FILE_PREFIX,
+                                         suffix=f"-{filename}", dir=directory, delete=False)
+    try:
+        with handle:
+            for line in lines:
+                handle.write(line)
+    except BaseException:
+        os.remove(handle.name)
+        raise
+    return handle.name
+
+def purge_stale_exports(max_age: float = EXPORT_FILE_MAX_AGE, directory: Optional[str] = None) -> int:
+    """Remove os arquivos de exportação mais antigos que `max_age` segundos e retorna quantos foram removidos.
+
+    Cobre exportações abandonadas por sessões encerradas ou processos interrompidos."""
+    limit = time.time() - max_age
+    removed = 0
+    for path in glob.glob(os.path.join(directory or tempfile.gettempdir(), f"{EXPORT_FILE_PREFIX}*")):
+        try:
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            # Removido por outro processo entre a listagem e a remoção
+            pass
+    return removed
+
+# Importação
+class _BatchImporter:
+    """Acumula itens e os grava em lote, uma transação por lote, guardando só o resumo."""
+
+    def __init__(self, token: str, create: Callable[[str, List[Dict]], List[Dict]], batch_size: int, summary: Dict):
+        self.token = token
+        self.create = create
+        self.batch_size = batch_size
+        self.summary = summary
+        self.items: List[Tuple[int, Dict]] = []
+
+    def add(self, item: int, data: Dict):
+        self.items.append((item, data))
+        if len(self.items) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.items:
+            return
+        results = self.create(self.token, [data for _, data in self.items])
+        for (item, _), result in zip(self.items, results):
+            if result["ok"]:
+                self.summary["created"] += 1
+            else:
+                _record_error(self.summary, item, result["error"])
+        self.items = []
+
+def _new_summary() -> Dict:
+    return {"created": 0, "errors": 0, "error_samples": []}
+
+def _record_error(summary: Dict, item: int, error: str):
+    summary["errors"] += 1
+    if len(summary["error_samples"]) < IMPORT_ERROR_SAMPLES:
+        summary["error_samples"].append({"item": item, "error": error})
+
+def import_tasks_csv(token: str, lines: Iterable[str], batch_size: int = IMPORT_BATCH_SIZE) -> Dict:
+    """Importa tarefas de um CSV (colunas title, description, due_date e priority), lendo-o por linhas.
+
+    Retorna {"created", "errors", "error_samples"}; o número do item é o da linha de dados."""
+    summary = _new_summary()
+    importer = _BatchImporter(token, bulk_create_user_tasks, batch_size, summary)
+    for item, row in enumerate(csv.DictReader(lines), start=1):
+        importer.add(item, {
+            "title": row.get("title") or "",
+            "description": row.get("description") or "",
+            "due_date": row.get("due_date") or "",
+            "priority": row.get("priority") or "Média"
+        })
+    importer.flush()
+    return summary
+
+def import_schedules_csv(token: str, lines: Iterable[str], batch_size: int = IMPORT_BATCH_SIZE) -> Dict:
+    """Importa cronogramas de um CSV (colunas title, description, start_time, end_time e days)."""
+    summary = _new_summary()
+    importer = _BatchImporter(token, bulk_create_user_schedules, batch_size, summary)
+    for item, row in enumerate(csv.DictReader(lines), start=1):
+        importer.add(item, {
+            "title": row.get("title") or "",
+            "description": row.get("description") or "",
+            "start_time": row.get("start_time") or "",
+            "end_time": row.get("end_time") or "",
+            "days": [day.strip() for day in (row.get("days") or "").split(CSV_DAYS_SEPARATOR) if day.strip()]
+        })
+    importer.flush()
+    return summary
+
+def _ics_unfold(lines: Iterable[str]) -> Iterator[str]:
+    """Junta as linhas de continuação (iniciadas por espaço ou tab) à linha anterior."""
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+def _ics_unescape(text: str) -> str:
+    result = []
+    chars = iter(text)
+    for char in chars:
+        if char == "\\":
+            char = next(chars, "")
+            result.append("\n" if char in ("n", "N") else char)
+        else:
+            result.append(char)
+    return "".join(result)
+
+def _ics_components(lines: Iterable[str]) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """Gera (tipo, propriedades) para cada VTODO e VEVENT, um componente por vez."""
+    kind = None
+    props: Dict[str, str] = {}
+    for line in _ics_unfold(lines):
+        name, _, value = line.partition(":")
+        name = name.split(";", 1)[0].upper()
+        if name == "BEGIN" and value.upper() in ("VTODO", "VEVENT"):
+            kind, props = value.upper(), {}
+        elif name == "END" and kind and value.upper() == kind:
+            yield kind, props
+            kind = None
+        elif kind and name not in props:
+            # Componentes aninhados (como VALARM) não sobrescrevem as propriedades do evento
+            props[name] = value
+
+def _ics_date(value: str) -> str:
+    return f"{value[0:4]}-{value[4:6]}-{value[6:8]}"
+
+def _ics_time(value: str) -> str:
+    return f"{value[9:11]}:{value[11:13]}" if "T" in value else ""
+
+def _ics_priority(value: Optional[str]) -> str:
+    level = int(value) if value and value.isdigit() else 0
+    if 1 <= level <= 4:
+        return "Alta"
+    if level >= 6:
+        return "Baixa"
+    return "Média"
+
+def import_ics(token: str, lines: Iterable[str], batch_size: int = IMPORT_BATCH_SIZE) -> Dict:
+    """Importa um calendário iCalendar, lendo-o por linhas.
+
+    VTODO e VEVENT sem recorrência viram tarefas; VEVENT com RRULE semanal vira cronograma.
+    Retorna {"tasks": resumo, "schedules": resumo}; o número do item é a posição do componente."""
+    summary = {"tasks": _new_summary(), "schedules": _new_summary()}
+    tasks = _BatchImporter(token, bulk_create_user_tasks, batch_size, summary["tasks"])
+    schedules = _BatchImporter(token, bulk_create_user_schedules, batch_size, summary["schedules"])
+    days_by_code = {code: day for day, code in ICS_DAYS.items()}
+
+    for item, (kind, props) in enumerate(_ics_components(lines), start=1):
+        title = _ics_unescape(props.get("SUMMARY", ""))
+        description = _ics_unescape(props.get("DESCRIPTION", ""))
+        rule = dict(part.partition("=")[::2] for part in props.get("RRULE", "").upper().split(";") if part)
+
+        if kind == "VEVENT" and rule.get("FREQ") == "WEEKLY":
+            start = props.get("DTSTART", "")
+            days = [days_by_code.get(code.lstrip("+-0123456789"))
+                    for code in rule.get("BYDAY", "").split(",") if code]
+            if None in days:
+                _record_error(summary["schedules"], item, f"Dias inválidos: {rule.get('BYDAY')}")
+                continue
+            schedules.add(item, {
+                "title": title,
+                "description": description,
+                "start_time": _ics_time(start),
+                "end_time": _ics_time(props.get("DTEND", "")),
+                "days": days
+            })
+        elif kind == "VEVENT" and rule:
+            _record_error(summary["schedules"], item, f"Recorrência não suportada: {props['RRULE']}")
+        else:
+            due = props.get("DUE") or props.get("DTSTART") or ""
+            tasks.add(item, {
+                "title": title,
+                "description": description,
+                "due_date": _ics_date(due) if len(due) >= 8 else due,
+                "priority": _ics_priority(props.get("PRIORITY"))
+            })
+
+    tasks.flush()
+    schedules.flush()
+    return summary
@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Configuração do cache de leituras por usuário
+DATA_CACHE_MAX_USERS = int(os.getenv("DATA_CACHE_MAX_USERS", "256"))
+DATA_CACHE_TTL = float(os.getenv("DATA_CACHE_TTL", "30"))
+
+class UserDataCache:
+    """Cache por usuário dos resultados de leitura de tarefas e cronogramas.
+
+    As chaves são tuplas cujo primeiro elemento é o tipo de dado ("tasks" ou "schedules"),
+    o que permite invalidar todas as entradas de um tipo após uma escrita. Cada entrada pode
+    guardar a versão dos dados do usuário; ao expirar, ela é revalidada pela versão antes de
+    ser recarregada. Os valores em cache são compartilhados e não devem ser alterados por
+    quem os lê."""
+
+    def __init__(self, max_users: int = DATA_CACHE_MAX_USERS, ttl: float = DATA_CACHE_TTL):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._users: "OrderedDict[int, Dict[Tuple, Tuple[float, Any, Optional[int]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidations": 0, "invalidations": 0, "patches": 0}
+
+    def _lookup(self, user_id: int, key: Tuple[Hashable, ...]) -> Tuple[Optional[tuple], bool]:
+        """Retorna a entrada (mesmo expirada) e se ela ainda está dentro do TTL."""
+        with self._lock:
+            entries = self._users.get(user_id)
+            entry = entries.get(key) if entries else None
+            fresh = entry is not None and entry[0] > time.monotonic()
+            if fresh:
+                self._users.move_to_end(user_id)
+                self._stats["hits"] += 1
+            return entry, fresh
+
+    def get(self, user_id: int, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        entry, fresh = self._lookup(user_id, key)
+        if not fresh:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        return entry[1]
+
+    def put(self, user_id: int, key: Tuple[Hashable, ...], value: Any, version: Optional[int] = None):
+        with self._lock:
+            self._users.setdefault(user_id, {})[key] = (time.monotonic() + self.ttl, value, version)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def get_or_load(self, user_id: int, key: Tuple[Hashable, ...], loader: Callable[[], Any],
+                    version_loader: Optional[Callable[[], Optional[int]]] = None) -> Any:
+        """Retorna o valor em cache ou o carrega com `loader` e o armazena.
+
+        Com `version_loader`, uma entrada expirada cuja versão não mudou é renovada sem recarregar."""
+        entry, fresh = self._lookup(user_id, key)
+        if fresh:
+            return entry[1]
+
+        # A versão é lida antes dos dados: uma escrita concorrente causa no máximo um recarregamento extra
+        version = version_loader() if version_loader else None
+        if entry is not None and version is not None and entry[2] == version:
+            self.put(user_id, key, entry[1], version)
+            with self._lock:
+                self._stats["revalidations"] += 1
+            return entry[1]
+
+        with self._lock:
+            self._stats["misses"] += 1
+        value = loader()
+        self.put(user_id, key, value, version)
+        return value
+
+    def patch(self, user_id: int, key: Tuple[Hashable, ...], update: Callable[[Any], Any]):
+        """Aplica `update` ao valor em cache (se existir), sem consultar o banco."""
+        with self._lock:
+            entries = self._users.get(user_id)
+            if entries and key in entries:
+                # A versão guardada fica desatualizada: a próxima revalidação recarrega do banco
+                expires_at, value, version = entries[key]
+                entries[key] = (expires_at, update(value), version)
+                self._stats["patches"] += 1
+
+    def update_kind(self, user_id: int, kind: str, update: Callable[[Tuple, Any], Any]):
+        """Aplica `update(chave, valor)` a todas as entradas de um tipo, sem consultar o banco.
+
+        As entradas para as quais `update` retorna None são descartadas."""
+        with self._lock:
+            entries = self._users.get(user_id)
+            if not entries:
+                return
+            for key in [k for k in entries if k[0] == kind]:
+                expires_at, value, version = entries[key]
+                value = update(key, value)
+                if value is None:
+                    del entries[key]
+                else:
+                    entries[key] = (expires_at, value, version)
+            self._stats["patches"] += 1
+
+    def invalidate(self, user_id: int, kind: Optional[str] = None):
+        """Remove as entradas do usuário, todas ou apenas as de um tipo."""
+        with self._lock:
+            entries = self._users.get(user_id)
+            if not entries:
+                return
+            for key in [k for k in entries if kind is None or k[0] == kind]:
+                del entries[key]
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def stats(self) -> Dict:
+        """Retorna contadores de acertos, falhas, invalidações e atualizações."""
+        with self._lock:
+            return dict(self._stats, users=len(self._users))
+
+# Cache compartilhado por todas as sessões do processo
+user_data_cache = UserDataCache()
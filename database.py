@@ -1,14 +1,377 @@
 import sqlite3
 import os
-import streamlit as st
-from typing import Dict, List, Optional
-from datetime import datetime
+import logging
+import queue
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+from datetime import date, datetime, timedelta
 import hashlib
 import secrets
 import string
+from schedule_index import ScheduleIndex, ScheduleIndexCache, minutes_to_time, time_to_minutes
+import query_stats
+from query_stats import timed
 
 # Configuração do banco de dados
-DB_PATH = os.path.join(os.path.dirname(__file__), 'student_calendar.db')
+DB_PATH = os.getenv("DB_PATH", os.path.join(os.path.dirname(__file__), 'student_calendar.db'))
+
+# Configuração das migrações de esquema
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+MIGRATION_BATCH_PAUSE = float(os.getenv("MIGRATION_BATCH_PAUSE", "0.01"))
+
+# Configuração do pool de conexões. POOL_SIZE limita apenas as conexões ociosas guardadas para
+# reutilização; as conexões abertas ao mesmo tempo não têm limite (uma por uso simultâneo)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "128"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("DB_HEALTH_CHECK_INTERVAL", "30"))
+
+# Configuração de concorrência (várias sessões do Streamlit usando o mesmo arquivo)
+JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+WRITE_RETRIES = int(os.getenv("DB_WRITE_RETRIES", "5"))
+WRITE_RETRY_BACKOFF = float(os.getenv("DB_WRITE_RETRY_BACKOFF", "0.05"))
+
+# Configuração do cache de validação de tokens
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "60"))
+
+# Número máximo de usuários com índice de intervalos dos cronogramas em memória
+SCHEDULE_INDEX_CACHE_SIZE = int(os.getenv("SCHEDULE_INDEX_CACHE_SIZE", "256"))
+
+# Busca textual: resultados por consulta e palavras consideradas
+SEARCH_RESULT_LIMIT = int(os.getenv("SEARCH_RESULT_LIMIT", "20"))
+SEARCH_MAX_TERMS = 8
+
+# Padrões da busca de horários livres de estudo
+FREE_SLOT_MIN_DURATION = int(os.getenv("FREE_SLOT_MIN_DURATION", "30"))
+FREE_SLOT_DAY_START = os.getenv("FREE_SLOT_DAY_START", "08:00")
+FREE_SLOT_DAY_END = os.getenv("FREE_SLOT_DAY_END", "22:00")
+# As sugestões de estudo começam no próximo múltiplo deste número de minutos
+STUDY_SLOT_GRANULARITY = 5
+
+# Configuração de expiração e compactação de tokens (em segundos)
+TOKEN_MAX_AGE = int(os.getenv("TOKEN_MAX_AGE", str(7 * 24 * 3600)))
+TOKEN_IDLE_TIMEOUT = int(os.getenv("TOKEN_IDLE_TIMEOUT", str(24 * 3600)))
+TOKEN_TOUCH_INTERVAL = int(os.getenv("TOKEN_TOUCH_INTERVAL", "60"))
+TOKEN_PURGE_INTERVAL = float(os.getenv("TOKEN_PURGE_INTERVAL", "3600"))
+TOKEN_PURGE_BATCH_SIZE = int(os.getenv("TOKEN_PURGE_BATCH_SIZE", "500"))
+
+# Paginação de tarefas
+TASK_PAGE_SIZE = int(os.getenv("TASK_PAGE_SIZE", "20"))
+PRIORITY_RANK_SQL = "CASE priority WHEN 'Alta' THEN 0 WHEN 'Média' THEN 1 ELSE 2 END"
+# A mesma ordem de PRIORITY_RANK_SQL, para ordenar tarefas já carregadas
+PRIORITY_RANKS = {"Alta": 0, "Média": 1, "Baixa": 2}
+
+# Valores aceitos em tarefas e cronogramas
+TASK_PRIORITIES = ("Baixa", "Média", "Alta")
+WEEK_DAYS = ("Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo")
+# Bit de cada dia em schedules.days_mask (Segunda = 1, Terça = 2, ..., Domingo = 64)
+DAY_BITS = {day: 1 << index for index, day in enumerate(WEEK_DAYS)}
+
+logger = logging.getLogger(__name__)
+
+# Exceções da camada de dados (a interface decide como exibi-las)
+class DataError(Exception):
+    """Erro base da camada de dados."""
+
+class DatabaseError(DataError):
+    """Falha ao acessar o banco de dados."""
+
+class InvalidTokenError(DataError):
+    """Token de sessão inexistente, expirado ou revogado."""
+
+class InvalidCredentialsError(DataError):
+    """Usuário ou senha incorretos."""
+
+class UserAlreadyExistsError(DataError):
+    """Nome de usuário já cadastrado."""
+
+class NotFoundError(DataError):
+    """Registro inexistente ou pertencente a outro usuário."""
+
+class ValidationError(DataError):
+    """Dados de tarefa ou cronograma inválidos."""
+
+class ScheduleConflictError(DataError):
+    """Cronograma com horário sobreposto a outros cronogramas do usuário."""
+
+    def __init__(self, message: str, conflicts: List[Dict]):
+        super().__init__(message)
+        self.conflicts = conflicts
+
+T = TypeVar("T")
+
+class ConnectionPool:
+    """Pool de conexões SQLite de longa duração compartilhado pelas funções do banco.
+
+    `size` é o número máximo de conexões ociosas mantidas; quando todas estão em uso, acquire()
+    abre uma nova conexão em vez de esperar, e as excedentes são fechadas ao serem devolvidas."""
+
+    def __init__(self, db_path: str, size: int = POOL_SIZE,
+                 cached_statements: int = STATEMENT_CACHE_SIZE,
+                 health_check_interval: float = HEALTH_CHECK_INTERVAL,
+                 journal_mode: str = JOURNAL_MODE, busy_timeout_ms: int = BUSY_TIMEOUT_MS,
+                 synchronous: str = SYNCHRONOUS):
+        self.db_path = db_path
+        self.size = size
+        self.cached_statements = cached_statements
+        self.health_check_interval = health_check_interval
+        self.journal_mode = journal_mode
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        # Pilha LIFO: a conexão mais recente (com o cache de statements "quente") é reutilizada primeiro
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {"created": 0, "reused": 0, "discarded": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            timeout=self.busy_timeout_ms / 1000,
+            factory=query_stats.connection_factory()
+        )
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        # auto_vacuum só tem efeito em bancos novos e precisa vir antes da troca de journal
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        # Integridade referencial vale apenas com foreign_keys ativado
+        conn.execute("PRAGMA foreign_keys = ON")
+        with self._lock:
+            self._stats["created"] += 1
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._stats["discarded"] += 1
+
+    def acquire(self) -> sqlite3.Connection:
+        """Obtém uma conexão ociosa do pool ou abre uma nova."""
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+
+            # Conexões paradas há muito tempo passam por uma verificação de saúde
+            if time.monotonic() - last_used >= self.health_check_interval and not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+
+            with self._lock:
+                self._stats["reused"] += 1
+            return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """Devolve a conexão ao pool, descartando transações pendentes."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        if self._closed:
+            self._discard(conn)
+            return
+
+        try:
+            self._idle.put_nowait((conn, time.monotonic()))
+        except queue.Full:
+            # Conexões excedentes (picos de uso) são fechadas
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict:
+        """Retorna contadores de uso do pool."""
+        with self._lock:
+            return dict(self._stats, idle=self._idle.qsize(), size=self.size)
+
+    def close(self):
+        """Fecha todas as conexões ociosas do pool."""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+class TokenCache:
+    """Cache LRU com TTL de token -> usuário, na frente de get_user_by_token."""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, token: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[token]
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(token)
+            self._stats["hits"] += 1
+            return dict(entry[1])
+
+    def put(self, token: str, user: Dict, expires_in: Optional[float] = None):
+        """Guarda o usuário do token; `expires_in` limita a entrada à validade restante do token."""
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl if expires_in is None else min(self.ttl, expires_in)
+        with self._lock:
+            self._entries[token] = (time.monotonic() + ttl, dict(user))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: int):
+        """Remove todas as entradas de um usuário (ex.: revogação de todos os tokens)."""
+        with self._lock:
+            for token in [t for t, (_, user) in self._entries.items() if user["id"] == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Retorna contadores de acertos e falhas do cache."""
+        with self._lock:
+            return dict(self._stats, size=len(self._entries), max_size=self.max_size)
+
+_token_cache = TokenCache()
+
+def get_token_cache() -> TokenCache:
+    """Retorna o cache de tokens do módulo."""
+    return _token_cache
+
+def invalidate_token(token: str):
+    """Remove o token do cache de validação."""
+    _token_cache.invalidate(token)
+
+# Índices de intervalos dos cronogramas, revalidados pela versão dos dados do usuário
+_schedule_index_cache = ScheduleIndexCache(SCHEDULE_INDEX_CACHE_SIZE)
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Retorna o pool de conexões do módulo, recriando-o se DB_PATH mudou."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.db_path != DB_PATH:
+            if _pool is not None:
+                _pool.close()
+                # Usuários e índices em cache pertencem ao banco anterior
+                _token_cache.clear()
+                _schedule_index_cache.clear()
+            _pool = ConnectionPool(DB_PATH)
+        return _pool
+
+def configure_pool(size: Optional[int] = None, cached_statements: Optional[int] = None,
+                   health_check_interval: Optional[float] = None, journal_mode: Optional[str] = None,
+                   busy_timeout_ms: Optional[int] = None, synchronous: Optional[str] = None) -> ConnectionPool:
+    """Recria o pool de conexões com novos parâmetros."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(
+            DB_PATH,
+            size=POOL_SIZE if size is None else size,
+            cached_statements=STATEMENT_CACHE_SIZE if cached_statements is None else cached_statements,
+            health_check_interval=HEALTH_CHECK_INTERVAL if health_check_interval is None else health_check_interval,
+            journal_mode=JOURNAL_MODE if journal_mode is None else journal_mode,
+            busy_timeout_ms=BUSY_TIMEOUT_MS if busy_timeout_ms is None else busy_timeout_ms,
+            synchronous=SYNCHRONOUS if synchronous is None else synchronous
+        )
+        return _pool
+
+def close_pool():
+    """Fecha o pool de conexões do módulo."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+        _token_cache.clear()
+        _schedule_index_cache.clear()
+
+def set_query_stats_enabled(enabled: bool):
+    """Liga ou desliga a medição de instruções e funções (query_stats).
+    
+    As conexões ociosas são fechadas para que as próximas sejam abertas com ou sem instrumentação."""
+    global _pool
+    query_stats.set_enabled(enabled)
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def get_connection():
+    """Context manager que empresta uma conexão do pool."""
+    return get_pool().connection()
+
+def _is_lock_error(error: sqlite3.Error) -> bool:
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+def run_write(work: Callable[[sqlite3.Connection], T]) -> T:
+    """Executa `work` em uma transação de escrita, repetindo com backoff se o banco estiver bloqueado."""
+    attempt = 0
+    while True:
+        try:
+            with get_connection() as conn:
+                # BEGIN IMMEDIATE reserva o lock de escrita no início e evita deadlocks de upgrade
+                conn.execute("BEGIN IMMEDIATE")
+                result = work(conn)
+                conn.commit()
+                return result
+        except sqlite3.OperationalError as e:
+            if not _is_lock_error(e) or attempt >= WRITE_RETRIES:
+                raise
+            # Backoff exponencial com jitter
+            time.sleep(WRITE_RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5))
+            attempt += 1
 
 # Função para gerar um token aleatório
 def generate_token(length=32):
@@ -21,7 +384,17 @@ def hash_password(password: str) -> str:
 
 # Inicialização do banco de dados
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    """Cria ou atualiza o esquema do banco aplicando as migrações pendentes.
+    
+    Idempotente: em um banco já atualizado custa apenas a leitura de PRAGMA user_version."""
+    check_sqlite_version()
+    with get_connection() as conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+    migrate()
+
+def _migration_initial_schema(conn: sqlite3.Connection):
+    """Esquema inicial; também completa bancos criados por versões sem migrações."""
     cursor = conn.cursor()
     
     # Tabela de usuários
@@ -42,10 +415,16 @@ def init_db():
         user_id INTEGER NOT NULL,
         token TEXT UNIQUE NOT NULL,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_used_at TIMESTAMP,
         FOREIGN KEY (user_id) REFERENCES users (id)
     )
     ''')
     
+    # Bancos criados antes da expiração por inatividade não têm a coluna last_used_at
+    token_columns = [row[1] for row in cursor.execute("PRAGMA table_info(tokens)")]
+    if "last_used_at" not in token_columns:
+        cursor.execute("ALTER TABLE tokens ADD COLUMN last_used_at TIMESTAMP")
+    
     # Tabela de tarefas
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS tasks (
@@ -84,45 +463,275 @@ def init_db():
     )
     ''')
     
-    conn.commit()
-    conn.close()
+    # Versões por usuário, incrementadas a cada escrita (validação barata de caches)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_versions (
+        user_id INTEGER PRIMARY KEY,
+        tasks_version INTEGER NOT NULL DEFAULT 0,
+        schedules_version INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+    
+    # Índices secundários: as consultas filtram sempre pelo dono (user_id) ou pelo cronograma
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tokens_user_id ON tokens (user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tokens_created_at ON tokens (created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tokens_last_activity ON tokens (COALESCE(last_used_at, created_at))")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_user_due_date ON tasks (user_id, due_date)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_tasks_user_priority_due_date ON tasks (user_id, {PRIORITY_RANK_SQL}, due_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_schedules_user_id ON schedules (user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_schedule_days_schedule_day ON schedule_days (schedule_id, day)")
+    
+
+# Migrações de esquema
+class Migration:
+    """Passo versionado do esquema.
+    
+    `apply` executa alterações curtas de esquema em uma transação. `backfill`, se houver,
+    processa um lote de no máximo `batch_size` linhas e retorna quantas processou; ele é
+    chamado em transações separadas até processar um lote incompleto, portanto deve
+    selecionar apenas linhas ainda não processadas."""
+
+    def __init__(self, version: int, name: str,
+                 apply: Optional[Callable[[sqlite3.Connection], None]] = None,
+                 backfill: Optional[Callable[[sqlite3.Connection, int], int]] = None):
+        self.version = version
+        self.name = name
+        self.apply = apply
+        self.backfill = backfill
+
+def _migration_add_days_mask(conn: sqlite3.Connection):
+    """Adiciona a máscara de dias da semana e os índices parciais por dia."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(schedules)")]
+    if "days_mask" not in columns:
+        conn.execute("ALTER TABLE schedules ADD COLUMN days_mask INTEGER NOT NULL DEFAULT 0")
+    # Um índice parcial por dia: "cronogramas ativos no dia X" lê apenas as entradas desse dia
+    for bit in DAY_BITS.values():
+        conn.execute(
+            f"""CREATE INDEX IF NOT EXISTS idx_schedules_user_day_{bit} ON schedules (user_id, start_time) 
+                WHERE days_mask & {bit} != 0"""
+        )
+
+def _backfill_days_mask(conn: sqlite3.Connection, batch_size: int) -> int:
+    """Converte os dias de um lote de cronogramas de schedule_days para days_mask.
+    
+    As linhas convertidas são removidas de schedule_days, o que garante o progresso do backfill."""
+    ids = [row[0] for row in conn.execute(
+        "SELECT DISTINCT schedule_id FROM schedule_days LIMIT ?", (batch_size,)
+    )]
+    if not ids:
+        return 0
+    
+    placeholders = ", ".join("?" * len(ids))
+    day_bit_sql = " ".join(f"WHEN '{day}' THEN {bit}" for day, bit in DAY_BITS.items())
+    conn.execute(
+        f"""UPDATE schedules SET days_mask = (
+                SELECT COALESCE(SUM(DISTINCT CASE d.day {day_bit_sql} ELSE 0 END), 0) 
+                FROM schedule_days d WHERE d.schedule_id = schedules.id
+            ) WHERE id IN ({placeholders})""",
+        ids
+    )
+    conn.execute(f"DELETE FROM schedule_days WHERE schedule_id IN ({placeholders})", ids)
+    return len(ids)
+
+# Tabelas indexadas pela busca textual: (tabela, índice FTS5)
+SEARCH_TABLES = (("tasks", "tasks_fts"), ("schedules", "schedules_fts"))
+
+# O rowid do índice é (user_id << 32) | id: as linhas de um usuário formam um intervalo contíguo
+_SEARCH_ROWID_SQL = "(({0}.user_id << 32) | {0}.id)"
+_SEARCH_ID_MASK = 0xFFFFFFFF
+
+def _migration_search_index(conn: sqlite3.Connection):
+    """Cria os índices FTS5 de título e descrição, sincronizados por triggers.
+    
+    O rowid agrupa as linhas por usuário, então a busca percorre só o intervalo do usuário
+    em vez de filtrar o resultado de todos. As linhas existentes são indexadas pelo backfill."""
+    for table, fts in SEARCH_TABLES:
+        conn.execute(
+            f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    title, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4'
+                )"""
+        )
+        new_rowid, old_rowid = _SEARCH_ROWID_SQL.format("new"), _SEARCH_ROWID_SQL.format("old")
+        values = f"{new_rowid}, new.title, COALESCE(new.description, '')"
+        conn.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN 
+                    INSERT INTO {fts} (rowid, title, description) VALUES ({values}); 
+                END"""
+        )
+        conn.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF title, description, user_id ON {table} BEGIN 
+                    DELETE FROM {fts} WHERE rowid = {old_rowid}; 
+                    INSERT INTO {fts} (rowid, title, description) VALUES ({values}); 
+                END"""
+        )
+        conn.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN 
+                    DELETE FROM {fts} WHERE rowid = {old_rowid}; 
+                END"""
+        )
+    # Progresso do backfill por tabela; removida quando todas as linhas foram indexadas
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS search_index_backfill (
+               table_name TEXT PRIMARY KEY,
+               last_id INTEGER NOT NULL DEFAULT 0
+           )"""
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO search_index_backfill (table_name) VALUES (?)",
+        [(table,) for table, _ in SEARCH_TABLES]
+    )
+
+def _backfill_search_index(conn: sqlite3.Connection, batch_size: int) -> int:
+    """Indexa um lote de tarefas e cronogramas existentes, em ordem de id.
+    
+    Linhas já indexadas pelos triggers (escritas durante a migração) são ignoradas."""
+    processed = 0
+    for table, fts in SEARCH_TABLES:
+        last_id = conn.execute(
+            "SELECT last_id FROM search_index_backfill WHERE table_name = ?", (table,)
+        ).fetchone()[0]
+        ids = [row[0] for row in conn.execute(
+            f"SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size - processed)
+        )]
+        if ids:
+            rowid = _SEARCH_ROWID_SQL.format(table)
+            conn.execute(
+                f"""INSERT INTO {fts} (rowid, title, description) 
+                    SELECT {rowid}, title, COALESCE(description, '') FROM {table} 
+                    WHERE id BETWEEN ? AND ? AND NOT EXISTS (SELECT 1 FROM {fts} WHERE rowid = {rowid})""",
+                (ids[0], ids[-1])
+            )
+            conn.execute("UPDATE search_index_backfill SET last_id = ? WHERE table_name = ?", (ids[-1], table))
+            processed += len(ids)
+        if processed >= batch_size:
+            return processed
+    conn.execute("DROP TABLE search_index_backfill")
+    return processed
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "esquema_inicial", apply=_migration_initial_schema),
+    Migration(2, "mascara_de_dias", apply=_migration_add_days_mask, backfill=_backfill_days_mask),
+    Migration(3, "remover_schedule_days", apply=lambda conn: conn.execute("DROP TABLE IF EXISTS schedule_days")),
+    Migration(4, "indice_de_busca", apply=_migration_search_index, backfill=_backfill_search_index),
+]
+
+# Versão do esquema, gravada em PRAGMA user_version ao final de cada migração
+SCHEMA_VERSION = max(migration.version for migration in MIGRATIONS)
+# Versão mínima do SQLite: as escritas usam UPSERT e RETURNING, disponíveis a partir da 3.35
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+def check_sqlite_version():
+    """Lança DatabaseError se a biblioteca SQLite usada pelo Python for anterior a MIN_SQLITE_VERSION."""
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        required = ".".join(map(str, MIN_SQLITE_VERSION))
+        raise DatabaseError(
+            f"SQLite {sqlite3.sqlite_version} não é suportado: é necessária a versão {required} ou superior "
+            "(atualize o Python ou a biblioteca SQLite do sistema)."
+        )
+
+@timed
+def get_schema_version() -> int:
+    """Obtém a versão de esquema registrada no banco."""
+    with get_connection() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        has_history = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+        ).fetchone()
+        if has_history:
+            version = max(version, conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0])
+    return version
+
+def _run_backfill(backfill: Callable[[sqlite3.Connection, int], int], batch_size: int) -> int:
+    """Executa o backfill em lotes, cada um em sua própria transação curta."""
+    total = 0
+    while True:
+        processed = run_write(lambda conn: backfill(conn, batch_size))
+        total += processed
+        if processed < batch_size:
+            return total
+        # Pausa entre lotes para que as sessões em andamento consigam escrever
+        time.sleep(MIGRATION_BATCH_PAUSE)
+
+def migrate(target: Optional[int] = None, dry_run: bool = False, batch_size: int = MIGRATION_BATCH_SIZE,
+            migrations: Optional[List[Migration]] = None) -> List[Dict]:
+    """Aplica em ordem as migrações pendentes (até `target`) e as registra no banco.
+    
+    Com dry_run=True apenas lista as migrações que seriam aplicadas."""
+    check_sqlite_version()
+    migrations = sorted(MIGRATIONS if migrations is None else migrations, key=lambda m: m.version)
+    current = get_schema_version()
+    pending = [m for m in migrations if m.version > current and (target is None or m.version <= target)]
+    
+    if dry_run:
+        return [{"version": m.version, "name": m.name, "status": "pending"} for m in pending]
+    
+    run_write(lambda conn: conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    '''))
+    
+    results = []
+    for migration in pending:
+        start = time.perf_counter()
+        if migration.apply:
+            run_write(migration.apply)
+        backfilled = _run_backfill(migration.backfill, batch_size) if migration.backfill else 0
+        
+        def _record(conn: sqlite3.Connection):
+            conn.execute(
+                "INSERT OR IGNORE INTO schema_migrations (version, name) VALUES (?, ?)",
+                (migration.version, migration.name)
+            )
+            conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+        
+        run_write(_record)
+        logger.info("Migração %d (%s) aplicada", migration.version, migration.name)
+        results.append({
+            "version": migration.version,
+            "name": migration.name,
+            "status": "applied",
+            "rows_backfilled": backfilled,
+            "duration": time.perf_counter() - start
+        })
+    return results
 
 # Funções de autenticação
+@timed
 def register_user(username: str, email: Optional[str], password: str) -> Optional[Dict]:
     """Registra um novo usuário no banco de dados."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Verificar se o usuário já existe
-        cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-        if cursor.fetchone():
-            st.error(f"Usuário {username} já existe!")
-            conn.close()
-            return None
-        
-        # Hash da senha
-        password_hash = hash_password(password)
-        
-        # Inserir novo usuário
-        if email:
-            cursor.execute(
-                "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
-                (username, email, password_hash)
-            )
-        else:
-            cursor.execute(
-                "INSERT INTO users (username, password_hash) VALUES (?, ?)",
-                (username, password_hash)
-            )
-        
-        user_id = cursor.lastrowid
-        conn.commit()
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            
+            # Verificar se o usuário já existe
+            cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+            if cursor.fetchone():
+                raise UserAlreadyExistsError(f"Usuário {username} já existe!")
+            
+            # Hash da senha
+            password_hash = hash_password(password)
+            
+            # Inserir novo usuário
+            if email:
+                cursor.execute(
+                    "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+                    (username, email, password_hash)
+                )
+            else:
+                cursor.execute(
+                    "INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                    (username, password_hash)
+                )
+            
+            # Obter dados do usuário
+            cursor.execute("SELECT id, username, email, created_at FROM users WHERE id = ?", (cursor.lastrowid,))
+            return cursor.fetchone()
         
-        # Obter dados do usuário
-        cursor.execute("SELECT id, username, email, created_at FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
-        conn.close()
+        user = run_write(_write)
         
         if user:
             return {
@@ -133,92 +742,308 @@ def register_user(username: str, email: Optional[str], password: str) -> Optiona
             }
         return None
     except sqlite3.Error as e:
-        st.error(f"Erro ao registrar usuário: {str(e)}")
-        return None
+        raise DatabaseError(f"Erro ao registrar usuário: {str(e)}") from e
 
+@timed
 def login_user(username: str, password: str) -> Optional[str]:
     """Realiza o login do usuário e retorna um token."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
         # Verificar credenciais
         password_hash = hash_password(password)
-        cursor.execute(
-            "SELECT id FROM users WHERE username = ? AND password_hash = ?",
-            (username, password_hash)
-        )
-        user = cursor.fetchone()
+        with get_connection() as conn:
+            user = conn.execute(
+                "SELECT id FROM users WHERE username = ? AND password_hash = ?",
+                (username, password_hash)
+            ).fetchone()
         
         if not user:
-            st.error("Credenciais inválidas!")
-            conn.close()
-            return None
+            raise InvalidCredentialsError("Credenciais inválidas!")
         
         user_id = user[0]
         
         # Gerar e armazenar token
         token = generate_token()
-        cursor.execute(
+        run_write(lambda conn: conn.execute(
             "INSERT INTO tokens (user_id, token) VALUES (?, ?)",
             (user_id, token)
-        )
-        conn.commit()
-        conn.close()
+        ))
         
         return token
     except sqlite3.Error as e:
-        st.error(f"Erro ao realizar login: {str(e)}")
-        return None
+        raise DatabaseError(f"Erro ao realizar login: {str(e)}") from e
 
+@timed
 def get_user_by_token(token: str) -> Optional[Dict]:
     """Obtém informações do usuário pelo token."""
+    cached = _token_cache.get(token)
+    if cached is not None:
+        return cached
+    
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            """SELECT u.id, u.username, u.email, u.created_at 
-               FROM users u 
-               JOIN tokens t ON u.id = t.user_id 
-               WHERE t.token = ?""",
-            (token,)
-        )
-        user = cursor.fetchone()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            max_age, idle_timeout = _token_expiry_modifiers()
+            cursor.execute(
+                """SELECT u.id, u.username, u.email, u.created_at, t.id, 
+                          COALESCE(t.last_used_at, t.created_at) <= datetime('now', ?), 
+                          MIN(julianday(t.created_at) * 86400 + ?, 
+                              julianday(COALESCE(t.last_used_at, t.created_at)) * 86400 + ?) 
+                              - julianday('now') * 86400 
+                   FROM users u 
+                   JOIN tokens t ON u.id = t.user_id 
+                   WHERE t.token = ? 
+                     AND t.created_at > datetime('now', ?) 
+                     AND COALESCE(t.last_used_at, t.created_at) > datetime('now', ?)""",
+                (f"-{TOKEN_TOUCH_INTERVAL} seconds", TOKEN_MAX_AGE, TOKEN_IDLE_TIMEOUT,
+                 token, max_age, idle_timeout)
+            )
+            user = cursor.fetchone()
         
         if user:
-            return {
+            # Renovar a última atividade só de tempos em tempos, evitando uma escrita por leitura
+            if user[5]:
+                run_write(lambda conn: conn.execute(
+                    "UPDATE tokens SET last_used_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    (user[4],)
+                ))
+            
+            user_data = {
                 "id": user[0],
                 "username": user[1],
                 "email": user[2],
                 "created_at": user[3]
             }
+            # A entrada em cache não sobrevive à expiração do token (user[6]: segundos restantes) nem ao
+            # intervalo de renovação: acertos no cache não atualizam last_used_at, e o token precisa voltar
+            # ao banco para que a inatividade seja medida corretamente
+            _token_cache.put(token, user_data, expires_in=min(user[6], TOKEN_TOUCH_INTERVAL))
+            return user_data
         return None
     except sqlite3.Error as e:
-        st.error(f"Erro ao obter informações do usuário: {str(e)}")
-        return None
+        raise DatabaseError(f"Erro ao obter informações do usuário: {str(e)}") from e
+
+def _require_user(token: str) -> Dict:
+    """Obtém o usuário do token ou lança InvalidTokenError."""
+    user = get_user_by_token(token)
+    if not user:
+        raise InvalidTokenError("Sessão inválida ou expirada. Por favor, faça login novamente.")
+    return user
+
+@timed
+def revoke_token(token: str) -> bool:
+    """Revoga o token no servidor (logout)."""
+    invalidate_token(token)
+    try:
+        deleted = run_write(lambda conn: conn.execute(
+            "DELETE FROM tokens WHERE token = ?", (token,)
+        ).rowcount)
+        return deleted > 0
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao revogar token: {str(e)}") from e
+
+@timed
+def revoke_user_tokens(user_id: int) -> int:
+    """Revoga todos os tokens de um usuário e retorna quantos foram removidos."""
+    _token_cache.invalidate_user(user_id)
+    try:
+        return run_write(lambda conn: conn.execute(
+            "DELETE FROM tokens WHERE user_id = ?", (user_id,)
+        ).rowcount)
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao revogar tokens: {str(e)}") from e
+
+# Compactação da tabela de tokens
+_EXPIRED_TOKEN_SQL = "(created_at <= datetime('now', ?) OR COALESCE(last_used_at, created_at) <= datetime('now', ?))"
+
+_purge_stats = {"runs": 0, "purged_total": 0, "last_purged": 0, "last_duration": 0.0, "last_rate": 0.0}
+_purge_stats_lock = threading.Lock()
+_compaction_thread: Optional[threading.Thread] = None
+_compaction_stop = threading.Event()
+_compaction_lock = threading.Lock()
+
+def _token_expiry_modifiers() -> tuple:
+    """Modificadores de datetime() para a expiração absoluta e por inatividade."""
+    return f"-{TOKEN_MAX_AGE} seconds", f"-{TOKEN_IDLE_TIMEOUT} seconds"
+
+@timed
+def purge_expired_tokens(batch_size: int = TOKEN_PURGE_BATCH_SIZE, max_batches: Optional[int] = None,
+                         pause: float = 0.01) -> int:
+    """Remove tokens expirados em lotes, cada um em uma transação curta."""
+    purged = 0
+    batches = 0
+    start = time.perf_counter()
+    while max_batches is None or batches < max_batches:
+        deleted = run_write(lambda conn: conn.execute(
+            f"""DELETE FROM tokens WHERE id IN (
+                    SELECT id FROM tokens WHERE {_EXPIRED_TOKEN_SQL} LIMIT ?
+                )""",
+            (*_token_expiry_modifiers(), batch_size)
+        ).rowcount)
+        purged += deleted
+        batches += 1
+        if deleted < batch_size:
+            break
+        # Pausa entre lotes para que outras sessões consigam o lock de escrita
+        time.sleep(pause)
+    
+    duration = time.perf_counter() - start
+    with _purge_stats_lock:
+        _purge_stats["runs"] += 1
+        _purge_stats["purged_total"] += purged
+        _purge_stats["last_purged"] = purged
+        _purge_stats["last_duration"] = duration
+        _purge_stats["last_rate"] = purged / duration if duration else 0.0
+    return purged
+
+@timed
+def get_token_metrics() -> Dict:
+    """Retorna o tamanho da tabela de tokens e as estatísticas de compactação."""
+    with get_connection() as conn:
+        total = conn.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+        expired = conn.execute(
+            f"SELECT COUNT(*) FROM tokens WHERE {_EXPIRED_TOKEN_SQL}",
+            _token_expiry_modifiers()
+        ).fetchone()[0]
+    with _purge_stats_lock:
+        return dict(_purge_stats, total=total, expired=expired)
+
+def _compaction_loop(interval: float):
+    while not _compaction_stop.is_set():
+        try:
+            purged = purge_expired_tokens()
+            if purged:
+                logger.info("Compactação de tokens removeu %d tokens expirados", purged)
+        except sqlite3.Error:
+            logger.exception("Erro na compactação de tokens")
+        _compaction_stop.wait(interval)
+
+def start_token_compaction(interval: float = TOKEN_PURGE_INTERVAL) -> threading.Thread:
+    """Inicia (uma única vez por processo) a compactação periódica de tokens em segundo plano."""
+    global _compaction_thread
+    with _compaction_lock:
+        if _compaction_thread is None or not _compaction_thread.is_alive():
+            _compaction_stop.clear()
+            _compaction_thread = threading.Thread(
+                target=_compaction_loop, args=(interval,), name="token-compaction", daemon=True
+            )
+            _compaction_thread.start()
+        return _compaction_thread
+
+def stop_token_compaction():
+    """Interrompe a compactação de tokens em segundo plano."""
+    _compaction_stop.set()
+
+# Versões de dados por usuário
+_VERSION_COLUMNS = {"tasks": "tasks_version", "schedules": "schedules_version"}
+
+def _bump_version(cursor: sqlite3.Cursor, user_id: int, kind: str) -> int:
+    """Incrementa a versão dos dados do usuário dentro da transação de escrita corrente e a retorna."""
+    column = _VERSION_COLUMNS[kind]
+    cursor.execute(
+        f"""INSERT INTO user_versions (user_id, {column}) VALUES (?, 1) 
+            ON CONFLICT (user_id) DO UPDATE SET {column} = {column} + 1 
+            RETURNING {column}""",
+        (user_id,)
+    )
+    return cursor.fetchone()[0]
+
+def _read_versions(cursor: sqlite3.Cursor, user_id: int) -> Dict:
+    cursor.execute(
+        "SELECT tasks_version, schedules_version FROM user_versions WHERE user_id = ?",
+        (user_id,)
+    )
+    row = cursor.fetchone()
+    return {"tasks": row[0], "schedules": row[1]} if row else {"tasks": 0, "schedules": 0}
+
+@timed
+def get_user_versions(token: str) -> Optional[Dict]:
+    """Obtém as versões atuais das tarefas e dos cronogramas do usuário."""
+    try:
+        user = _require_user(token)
+        
+        with get_connection() as conn:
+            return _read_versions(conn.cursor(), user["id"])
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao obter versões: {str(e)}") from e
+
+@timed
+def get_if_changed(token: str, kind: str, since_version: Optional[int] = None) -> Optional[Dict]:
+    """Retorna {"version", "data"} das tarefas ou cronogramas se mudaram desde `since_version`.
+    
+    Retorna None quando os dados não mudaram; a versão e os dados são lidos no mesmo snapshot."""
+    if kind not in _VERSION_COLUMNS:
+        raise ValueError(f"Tipo de dado inválido: {kind}")
+    
+    try:
+        user = _require_user(token)
+        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            version = _read_versions(cursor, user["id"])[kind]
+            if since_version is not None and version == since_version:
+                conn.commit()
+                return None
+            
+            if kind == "tasks":
+                data = _fetch_tasks(cursor, user["id"])
+            else:
+                data = _fetch_schedules(cursor, "s.user_id = ?", (user["id"],))
+            conn.commit()
+        
+        return {"version": version, "data": data}
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao obter dados: {str(e)}") from e
 
 # Funções para tarefas
+def _fetch_tasks(cursor: sqlite3.Cursor, user_id: int) -> List[Dict]:
+    """Busca todas as tarefas do usuário ordenadas pela data de entrega."""
+    cursor.execute(
+        """SELECT id, title, description, due_date, priority, created_at FROM tasks 
+           WHERE user_id = ? ORDER BY due_date, id""",
+        (user_id,)
+    )
+    return [
+        {
+            "id": task[0],
+            "title": task[1],
+            "description": task[2],
+            "due_date": task[3],
+            "priority": task[4],
+            "created_at": task[5]
+        }
+        for task in cursor.fetchall()
+    ]
+
+@timed
 def get_user_tasks(token: str) -> List[Dict]:
     """Obtém todas as tarefas do usuário."""
     try:
-        user = get_user_by_token(token)
-        if not user:
-            return []
+        user = _require_user(token)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        with get_connection() as conn:
+            return _fetch_tasks(conn.cursor(), user["id"])
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao obter tarefas: {str(e)}") from e
+
+@timed
+def get_user_task(token: str, task_id: int) -> Optional[Dict]:
+    """Obtém uma tarefa do usuário, com a descrição; None se ela não existir."""
+    try:
+        user = _require_user(token)
         
-        cursor.execute(
-            "SELECT id, title, description, due_date, priority, created_at FROM tasks WHERE user_id = ?",
-            (user["id"],)
-        )
-        tasks = cursor.fetchall()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT id, title, description, due_date, priority, created_at FROM tasks 
+                   WHERE id = ? AND user_id = ?""",
+                (task_id, user["id"])
+            )
+            task = cursor.fetchone()
         
-        return [
-            {
+        if task:
+            return {
                 "id": task[0],
                 "title": task[1],
                 "description": task[2],
@@ -226,41 +1051,70 @@ def get_user_tasks(token: str) -> List[Dict]:
                 "priority": task[4],
                 "created_at": task[5]
             }
-            for task in tasks
-        ]
+        return None
     except sqlite3.Error as e:
-        st.error(f"Erro ao obter tarefas: {str(e)}")
-        return []
+        raise DatabaseError(f"Erro ao obter tarefa: {str(e)}") from e
 
-def create_user_task(token: str, task_data: Dict) -> Optional[Dict]:
-    """Cria uma nova tarefa para o usuário."""
+@timed
+def query_user_tasks(token: str, limit: int = TASK_PAGE_SIZE, after: Optional[List] = None,
+                     due_from: Optional[str] = None, due_to: Optional[str] = None,
+                     priorities: Optional[List[str]] = None, overdue: bool = False,
+                     order_by: str = "due_date", with_description: bool = True) -> Dict:
+    """Obtém uma página de tarefas do usuário, filtrada e ordenada no banco.
+    
+    A paginação é por chave (keyset): `after` recebe o `next_cursor` da página anterior.
+    Com `with_description=False`, as tarefas vêm sem a chave "description" (carregada com get_user_task)."""
+    if order_by == "due_date":
+        key = ["due_date", "id"]
+    elif order_by == "priority":
+        key = [PRIORITY_RANK_SQL, "due_date", "id"]
+    else:
+        raise ValueError(f"Ordenação inválida: {order_by}")
+    
     try:
-        user = get_user_by_token(token)
-        if not user:
-            return None
+        user = _require_user(token)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        where = ["user_id = ?"]
+        params: List = [user["id"]]
+        if due_from:
+            where.append("due_date >= ?")
+            params.append(due_from)
+        if due_to:
+            where.append("due_date <= ?")
+            params.append(due_to)
+        if priorities:
+            where.append(f"priority IN ({', '.join('?' * len(priorities))})")
+            params.extend(priorities)
+        if overdue:
+            where.append("due_date < ?")
+            params.append(date.today().isoformat())
+        if after:
+            where.append(f"({', '.join(key)}) > ({', '.join('?' * len(key))})")
+            params.extend(after)
         
-        cursor.execute(
-            """INSERT INTO tasks (user_id, title, description, due_date, priority) 
-               VALUES (?, ?, ?, ?, ?)""",
-            (user["id"], task_data["title"], task_data["description"], 
-             task_data["due_date"], task_data["priority"])
-        )
-        task_id = cursor.lastrowid
-        conn.commit()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Uma linha a mais indica se existe próxima página
+            cursor.execute(
+                f"""SELECT id, title, {'description' if with_description else 'NULL'}, due_date, priority, 
+                           created_at, {PRIORITY_RANK_SQL} 
+                    FROM tasks 
+                    WHERE {' AND '.join(where)} 
+                    ORDER BY {', '.join(key)} 
+                    LIMIT ?""",
+                (*params, limit + 1)
+            )
+            rows = cursor.fetchall()
         
-        # Obter a tarefa criada
-        cursor.execute(
-            "SELECT id, title, description, due_date, priority, created_at FROM tasks WHERE id = ?",
-            (task_id,)
-        )
-        task = cursor.fetchone()
-        conn.close()
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = [last[3], last[0]] if order_by == "due_date" else [last[6], last[3], last[0]]
         
-        if task:
-            return {
+        tasks = [
+            {
                 "id": task[0],
                 "title": task[1],
                 "description": task[2],
@@ -268,48 +1122,46 @@ def create_user_task(token: str, task_data: Dict) -> Optional[Dict]:
                 "priority": task[4],
                 "created_at": task[5]
             }
-        return None
+            for task in page
+        ]
+        if not with_description:
+            for task in tasks:
+                del task["description"]
+        return {"tasks": tasks, "next_cursor": next_cursor}
     except sqlite3.Error as e:
-        st.error(f"Erro ao criar tarefa: {str(e)}")
-        return None
+        raise DatabaseError(f"Erro ao obter tarefas: {str(e)}") from e
 
-def update_user_task(token: str, task_id: int, task_data: Dict) -> Optional[Dict]:
-    """Atualiza uma tarefa existente."""
+def iter_user_tasks(token: str, batch_size: int = TASK_PAGE_SIZE) -> Iterator[Dict]:
+    """Percorre todas as tarefas do usuário em páginas, sem carregá-las de uma vez."""
+    after = None
+    while True:
+        page = query_user_tasks(token, limit=batch_size, after=after)
+        yield from page["tasks"]
+        after = page["next_cursor"]
+        if after is None:
+            return
+
+@timed
+def create_user_task(token: str, task_data: Dict) -> Optional[Dict]:
+    """Cria uma nova tarefa para o usuário."""
     try:
-        user = get_user_by_token(token)
-        if not user:
-            return None
-        
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Verificar se a tarefa pertence ao usuário
-        cursor.execute(
-            "SELECT id FROM tasks WHERE id = ? AND user_id = ?",
-            (task_id, user["id"])
-        )
-        if not cursor.fetchone():
-            st.error("Tarefa não encontrada ou não pertence ao usuário!")
-            conn.close()
-            return None
+        user = _require_user(token)
         
-        # Atualizar tarefa
-        cursor.execute(
-            """UPDATE tasks 
-               SET title = ?, description = ?, due_date = ?, priority = ? 
-               WHERE id = ?""",
-            (task_data["title"], task_data["description"], 
-             task_data["due_date"], task_data["priority"], task_id)
-        )
-        conn.commit()
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                """INSERT INTO tasks (user_id, title, description, due_date, priority) 
+                   VALUES (?, ?, ?, ?, ?) 
+                   RETURNING id, title, description, due_date, priority, created_at""",
+                (user["id"], task_data["title"], task_data["description"], 
+                 task_data["due_date"], task_data["priority"])
+            )
+            task = cursor.fetchone()
+            _bump_version(cursor, user["id"], "tasks")
+            return task
         
-        # Obter a tarefa atualizada
-        cursor.execute(
-            "SELECT id, title, description, due_date, priority, created_at FROM tasks WHERE id = ?",
-            (task_id,)
-        )
-        task = cursor.fetchone()
-        conn.close()
+        task = run_write(_write)
         
         if task:
             return {
@@ -322,245 +1174,962 @@ def update_user_task(token: str, task_id: int, task_data: Dict) -> Optional[Dict
             }
         return None
     except sqlite3.Error as e:
-        st.error(f"Erro ao atualizar tarefa: {str(e)}")
-        return None
+        raise DatabaseError(f"Erro ao criar tarefa: {str(e)}") from e
 
-def delete_user_task(token: str, task_id: int) -> bool:
-    """Remove uma tarefa do usuário."""
+@timed
+def update_user_task(token: str, task_id: int, task_data: Dict) -> Optional[Dict]:
+    """Atualiza uma tarefa existente."""
     try:
-        user = get_user_by_token(token)
-        if not user:
-            return False
+        user = _require_user(token)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            
+            # A condição em user_id verifica a posse na própria atualização
+            cursor.execute(
+                """UPDATE tasks 
+                   SET title = ?, description = ?, due_date = ?, priority = ? 
+                   WHERE id = ? AND user_id = ? 
+                   RETURNING id, title, description, due_date, priority, created_at""",
+                (task_data["title"], task_data["description"], 
+                 task_data["due_date"], task_data["priority"], task_id, user["id"])
+            )
+            task = cursor.fetchone()
+            if not task:
+                raise NotFoundError("Tarefa não encontrada ou não pertence ao usuário!")
+            _bump_version(cursor, user["id"], "tasks")
+            return task
         
-        # Verificar se a tarefa pertence ao usuário
-        cursor.execute(
-            "SELECT id FROM tasks WHERE id = ? AND user_id = ?",
-            (task_id, user["id"])
-        )
-        if not cursor.fetchone():
-            st.error("Tarefa não encontrada ou não pertence ao usuário!")
-            conn.close()
-            return False
+        task = run_write(_write)
         
-        # Excluir tarefa
-        cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-        conn.commit()
-        conn.close()
+        return {
+            "id": task[0],
+            "title": task[1],
+            "description": task[2],
+            "due_date": task[3],
+            "priority": task[4],
+            "created_at": task[5]
+        }
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao atualizar tarefa: {str(e)}") from e
+
+@timed
+def delete_user_task(token: str, task_id: int) -> bool:
+    """Remove uma tarefa do usuário."""
+    try:
+        user = _require_user(token)
         
-        return True
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "DELETE FROM tasks WHERE id = ? AND user_id = ? RETURNING id",
+                (task_id, user["id"])
+            )
+            if not cursor.fetchone():
+                raise NotFoundError("Tarefa não encontrada ou não pertence ao usuário!")
+            _bump_version(cursor, user["id"], "tasks")
+            return True
+        
+        return run_write(_write)
     except sqlite3.Error as e:
-        st.error(f"Erro ao excluir tarefa: {str(e)}")
-        return False
+        raise DatabaseError(f"Erro ao excluir tarefa: {str(e)}") from e
 
 # Funções para cronogramas
+def days_to_mask(days: List[str]) -> int:
+    """Converte uma lista de dias da semana na máscara de bits de schedules.days_mask."""
+    mask = 0
+    for day in days:
+        if day not in DAY_BITS:
+            raise ValueError(f"Dia da semana inválido: {day}")
+        mask |= DAY_BITS[day]
+    return mask
+
+def mask_to_days(mask: int) -> List[str]:
+    """Converte a máscara de bits na lista de dias da semana, na ordem da semana."""
+    return [day for day, bit in DAY_BITS.items() if mask & bit]
+
+def _fetch_schedules(cursor: sqlite3.Cursor, where: str, params: tuple, limit: Optional[int] = None) -> List[Dict]:
+    """Busca cronogramas ordenados por id; os dias vêm da máscara days_mask."""
+    cursor.execute(
+        f"""SELECT s.id, s.title, s.description, s.start_time, s.end_time, s.created_at, s.days_mask 
+           FROM schedules s 
+           WHERE {where} 
+           ORDER BY s.id{' LIMIT ?' if limit is not None else ''}""",
+        (*params, limit) if limit is not None else params
+    )
+    return [
+        {
+            "id": row[0],
+            "title": row[1],
+            "description": row[2],
+            "start_time": row[3],
+            "end_time": row[4],
+            "days": mask_to_days(row[6]),
+            "created_at": row[5]
+        }
+        for row in cursor.fetchall()
+    ]
+
+def _schedule_from_row(row: tuple) -> Dict:
+    """Monta o cronograma a partir da linha devolvida por RETURNING."""
+    return {
+        "id": row[0],
+        "title": row[1],
+        "description": row[2],
+        "start_time": row[3],
+        "end_time": row[4],
+        "days": mask_to_days(row[6]),
+        "created_at": row[5]
+    }
+
+@timed
 def get_user_schedules(token: str) -> List[Dict]:
     """Obtém todos os cronogramas do usuário."""
     try:
-        user = get_user_by_token(token)
-        if not user:
-            return []
+        user = _require_user(token)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        with get_connection() as conn:
+            return _fetch_schedules(conn.cursor(), "s.user_id = ?", (user["id"],))
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao obter cronogramas: {str(e)}") from e
+
+@timed
+def get_user_schedules_on_day(token: str, day: str) -> List[Dict]:
+    """Obtém os cronogramas do usuário ativos no dia da semana, ordenados pelo horário de início."""
+    if day not in DAY_BITS:
+        raise ValueError(f"Dia da semana inválido: {day}")
+    
+    try:
+        user = _require_user(token)
         
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            # O bit vai literal na consulta para que o SQLite use o índice parcial do dia
+            cursor.execute(
+                f"""SELECT id, title, description, start_time, end_time, created_at, days_mask 
+                    FROM schedules 
+                    WHERE user_id = ? AND days_mask & {DAY_BITS[day]} != 0 
+                    ORDER BY start_time""",
+                (user["id"],)
+            )
+            return [_schedule_from_row(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao obter cronogramas: {str(e)}") from e
+
+def iter_user_schedules(token: str, batch_size: int = TASK_PAGE_SIZE) -> Iterator[Dict]:
+    """Percorre todos os cronogramas do usuário em páginas ordenadas por id."""
+    last_id = 0
+    while True:
+        try:
+            user = _require_user(token)
+            
+            with get_connection() as conn:
+                page = _fetch_schedules(conn.cursor(), "s.user_id = ? AND s.id > ?", (user["id"], last_id), batch_size)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erro ao obter cronogramas: {str(e)}") from e
+        
+        yield from page
+        if len(page) < batch_size:
+            return
+        last_id = page[-1]["id"]
+
+# Detecção de conflitos de horário
+def _load_schedule_index(cursor: sqlite3.Cursor, user_id: int) -> ScheduleIndex:
+    """Obtém o índice de intervalos do usuário, reconstruindo-o se a versão dos cronogramas mudou.
+    
+    O índice em cache é compartilhado: quem precisar alterá-lo deve trabalhar em uma cópia."""
+    version = _read_versions(cursor, user_id)["schedules"]
+    index = _schedule_index_cache.get(user_id, version)
+    if index is None:
+        index = ScheduleIndex()
         cursor.execute(
-            """SELECT s.id, s.title, s.description, s.start_time, s.end_time, s.created_at 
-               FROM schedules s 
-               WHERE s.user_id = ?""",
-            (user["id"],)
+            "SELECT id, title, start_time, end_time, days_mask FROM schedules WHERE user_id = ?",
+            (user_id,)
         )
-        schedules = cursor.fetchall()
+        for row in cursor.fetchall():
+            index.add(row[0], row[2], row[3], row[4], row[1])
+        _schedule_index_cache.put(user_id, version, index)
+    return index
+
+def _advance_schedule_index(user_id: int, version: int, index: Optional[ScheduleIndex] = None,
+                            removed: Iterable[int] = ()):
+    """Atualiza o índice em cache após o commit de uma escrita que levou os cronogramas a `version`.
+    
+    Sem `index`, aplica as remoções sobre uma cópia do índice da versão anterior, se houver."""
+    if index is None:
+        previous = _schedule_index_cache.get(user_id, version - 1)
+        if previous is None:
+            return
+        index = previous.copy()
+        for schedule_id in removed:
+            index.remove(schedule_id)
+    _schedule_index_cache.advance(user_id, version - 1, version, index)
+
+def _conflict_message(conflicts: List[Dict]) -> str:
+    days = {bit: day for day, bit in DAY_BITS.items()}
+    described = [
+        f"{c['title']} ({days[c['day']]} {c['start_time']}-{c['end_time']})" for c in conflicts
+    ]
+    return f"Conflito de horário com: {', '.join(described)}"
+
+def _check_conflicts(index: ScheduleIndex, schedule_data: Dict, days_mask: int, exclude_id: Optional[int] = None):
+    conflicts = index.find_conflicts(schedule_data["start_time"], schedule_data["end_time"], days_mask, exclude_id)
+    if conflicts:
+        raise ScheduleConflictError(_conflict_message(conflicts), conflicts)
+
+@timed
+def find_schedule_conflicts(token: str) -> List[Dict]:
+    """Lista todos os pares de cronogramas do usuário com horários sobrepostos.
+    
+    Cada conflito é {"day", "schedules": [{"id", "title"}, ...], "start_time", "end_time"}."""
+    try:
+        user = _require_user(token)
+        
+        with get_connection() as conn:
+            index = _load_schedule_index(conn.cursor(), user["id"])
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao verificar conflitos: {str(e)}") from e
+    
+    days = {bit: day for day, bit in DAY_BITS.items()}
+    return [
+        {
+            "day": days[pair["day"]],
+            "schedules": [{"id": schedule_id, "title": index.title(schedule_id)} for schedule_id in pair["ids"]],
+            "start_time": pair["start_time"],
+            "end_time": pair["end_time"]
+        }
+        for pair in index.all_conflicts()
+    ]
+
+def _minutes_or_error(value: str) -> int:
+    try:
+        datetime.strptime(value, "%H:%M")
+    except (TypeError, ValueError):
+        raise ValidationError(f"Horário inválido: {value}")
+    return time_to_minutes(value)
+
+@timed
+def find_free_slots(token: str, min_duration: int = FREE_SLOT_MIN_DURATION, day_start: str = FREE_SLOT_DAY_START,
+                    day_end: str = FREE_SLOT_DAY_END) -> Dict[str, List[Dict]]:
+    """Calcula os horários livres de cada dia da semana entre day_start e day_end.
+    
+    Retorna {dia: [{"start_time", "end_time", "minutes"}, ...]}, apenas com intervalos de pelo menos
+    min_duration minutos. O resultado fica memorizado no índice da versão atual dos cronogramas."""
+    start, end = _minutes_or_error(day_start), _minutes_or_error(day_end)
+    if start >= end:
+        raise ValidationError("O início do período deve ser anterior ao término")
+    if min_duration <= 0:
+        raise ValidationError("A duração mínima deve ser positiva")
+    try:
+        user = _require_user(token)
+        
+        with get_connection() as conn:
+            index = _load_schedule_index(conn.cursor(), user["id"])
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao calcular horários livres: {str(e)}") from e
+    
+    return {
+        day: [
+            {"start_time": minutes_to_time(slot[0]), "end_time": minutes_to_time(slot[1]), "minutes": slot[1] - slot[0]}
+            for slot in slots
+        ]
+        for day, slots in zip(WEEK_DAYS, index.free_slots(start, end, min_duration))
+    }
+
+@timed
+def suggest_study_slots(token: str, min_duration: int = FREE_SLOT_MIN_DURATION,
+                        day_start: str = FREE_SLOT_DAY_START, day_end: str = FREE_SLOT_DAY_END,
+                        limit: int = 10, now: Optional[datetime] = None) -> List[Dict]:
+    """Sugere um horário livre de estudo para cada uma das próximas tarefas.
+    
+    As tarefas são atendidas por data de entrega e, no mesmo dia, por prioridade; cada uma recebe o
+    primeiro intervalo de min_duration minutos ainda livre entre agora e a data de entrega. Retorna
+    {"task", "date", "day", "start_time", "end_time"}, com date None quando não há horário disponível."""
+    now = now or datetime.now()
+    free = find_free_slots(token, min_duration, day_start, day_end)
+    try:
+        user = _require_user(token)
+        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""SELECT id, title, due_date, priority FROM tasks 
+                    WHERE user_id = ? AND due_date >= ? 
+                    ORDER BY due_date, {PRIORITY_RANK_SQL}, id 
+                    LIMIT ?""",
+                (user["id"], now.date().isoformat(), limit)
+            )
+            tasks = cursor.fetchall()
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao sugerir horários: {str(e)}") from e
+    
+    # Arredondado para o próximo múltiplo de STUDY_SLOT_GRANULARITY minutos
+    current = -(-(now.hour * 60 + now.minute) // STUDY_SLOT_GRANULARITY) * STUDY_SLOT_GRANULARITY
+    # Intervalos ainda livres por data, consumidos à medida que as sugestões são feitas
+    available: Dict[date, List[List[int]]] = {}
+    suggestions = []
+    for task_id, title, due_date, priority in tasks:
+        suggestion = {
+            "task": {"id": task_id, "title": title, "due_date": due_date, "priority": priority},
+            "date": None, "day": None, "start_time": None, "end_time": None
+        }
+        try:
+            last_day = date.fromisoformat(due_date)
+        except ValueError:
+            suggestions.append(suggestion)
+            continue
+        day = now.date()
+        while day <= last_day and suggestion["date"] is None:
+            if day not in available:
+                available[day] = [
+                    [max(time_to_minutes(slot["start_time"]), current) if day == now.date()
+                     else time_to_minutes(slot["start_time"]), time_to_minutes(slot["end_time"])]
+                    for slot in free[WEEK_DAYS[day.weekday()]]
+                ]
+            for slot in available[day]:
+                if slot[1] - slot[0] >= min_duration:
+                    suggestion.update(date=day.isoformat(), day=WEEK_DAYS[day.weekday()],
+                                      start_time=minutes_to_time(slot[0]),
+                                      end_time=minutes_to_time(slot[0] + min_duration))
+                    slot[0] += min_duration
+                    break
+            day += timedelta(days=1)
+        suggestions.append(suggestion)
+    return suggestions
+
+@timed
+def create_user_schedule(token: str, schedule_data: Dict, allow_conflicts: bool = False) -> Optional[Dict]:
+    """Cria um novo cronograma para o usuário.
+    
+    Lança ScheduleConflictError se o horário se sobrepõe a outro cronograma nos mesmos dias,
+    a menos que allow_conflicts seja True."""
+    error = _validate_schedule(schedule_data)
+    if error:
+        raise ValidationError(error)
+    days_mask = days_to_mask(schedule_data["days"])
+    try:
+        user = _require_user(token)
         
-        result = []
-        for schedule in schedules:
-            schedule_id = schedule[0]
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            index = _load_schedule_index(cursor, user["id"])
+            if not allow_conflicts:
+                _check_conflicts(index, schedule_data, days_mask)
             
-            # Obter os dias da semana para este cronograma
             cursor.execute(
-                "SELECT day FROM schedule_days WHERE schedule_id = ?",
-                (schedule_id,)
+                """INSERT INTO schedules (user_id, title, description, start_time, end_time, days_mask) 
+                   VALUES (?, ?, ?, ?, ?, ?) 
+                   RETURNING id, title, description, start_time, end_time, created_at, days_mask""",
+                (user["id"], schedule_data["title"], schedule_data["description"], 
+                 schedule_data["start_time"], schedule_data["end_time"], days_mask)
             )
-            days = [row[0] for row in cursor.fetchall()]
+            schedule = cursor.fetchone()
+            version = _bump_version(cursor, user["id"], "schedules")
             
-            result.append({
-                "id": schedule_id,
-                "title": schedule[1],
-                "description": schedule[2],
-                "start_time": schedule[3],
-                "end_time": schedule[4],
-                "days": days,
-                "created_at": schedule[5]
-            })
-        
-        conn.close()
-        return result
-    except sqlite3.Error as e:
-        st.error(f"Erro ao obter cronogramas: {str(e)}")
-        return []
-
-def create_user_schedule(token: str, schedule_data: Dict) -> Optional[Dict]:
-    """Cria um novo cronograma para o usuário."""
-    try:
-        user = get_user_by_token(token)
-        if not user:
-            return None
+            index = index.copy()
+            index.add(schedule[0], schedule[3], schedule[4], schedule[6], schedule[1])
+            return schedule, version, index
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Inserir cronograma
-        cursor.execute(
-            """INSERT INTO schedules (user_id, title, description, start_time, end_time) 
-               VALUES (?, ?, ?, ?, ?)""",
-            (user["id"], schedule_data["title"], schedule_data["description"], 
-             schedule_data["start_time"], schedule_data["end_time"])
-        )
-        schedule_id = cursor.lastrowid
+        schedule, version, index = run_write(_write)
+        _advance_schedule_index(user["id"], version, index)
+        return _schedule_from_row(schedule)
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao criar cronograma: {str(e)}") from e
+
+@timed
+def update_user_schedule(token: str, schedule_id: int, schedule_data: Dict,
+                         allow_conflicts: bool = False) -> Optional[Dict]:
+    """Atualiza um cronograma existente, com a mesma verificação de conflitos da criação."""
+    error = _validate_schedule(schedule_data)
+    if error:
+        raise ValidationError(error)
+    days_mask = days_to_mask(schedule_data["days"])
+    try:
+        user = _require_user(token)
         
-        # Inserir dias da semana
-        for day in schedule_data["days"]:
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            index = _load_schedule_index(cursor, user["id"])
+            if not allow_conflicts:
+                _check_conflicts(index, schedule_data, days_mask, exclude_id=schedule_id)
+            
+            # A condição em user_id verifica a posse na própria atualização
             cursor.execute(
-                "INSERT INTO schedule_days (schedule_id, day) VALUES (?, ?)",
-                (schedule_id, day)
+                """UPDATE schedules 
+                   SET title = ?, description = ?, start_time = ?, end_time = ?, days_mask = ? 
+                   WHERE id = ? AND user_id = ? 
+                   RETURNING id, title, description, start_time, end_time, created_at, days_mask""",
+                (schedule_data["title"], schedule_data["description"], schedule_data["start_time"], 
+                 schedule_data["end_time"], days_mask, schedule_id, user["id"])
             )
+            schedule = cursor.fetchone()
+            if not schedule:
+                raise NotFoundError("Cronograma não encontrado ou não pertence ao usuário!")
+            version = _bump_version(cursor, user["id"], "schedules")
+            
+            index = index.copy()
+            index.add(schedule[0], schedule[3], schedule[4], schedule[6], schedule[1])
+            return schedule, version, index
         
-        conn.commit()
-        
-        # Obter o cronograma criado
-        cursor.execute(
-            """SELECT id, title, description, start_time, end_time, created_at 
-               FROM schedules WHERE id = ?""",
-            (schedule_id,)
-        )
-        schedule = cursor.fetchone()
+        schedule, version, index = run_write(_write)
+        _advance_schedule_index(user["id"], version, index)
+        return _schedule_from_row(schedule)
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao atualizar cronograma: {str(e)}") from e
+
+@timed
+def delete_user_schedule(token: str, schedule_id: int) -> bool:
+    """Remove um cronograma do usuário."""
+    try:
+        user = _require_user(token)
         
-        # Obter os dias da semana
-        cursor.execute(
-            "SELECT day FROM schedule_days WHERE schedule_id = ?",
-            (schedule_id,)
-        )
-        days = [row[0] for row in cursor.fetchall()]
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "DELETE FROM schedules WHERE id = ? AND user_id = ? RETURNING id",
+                (schedule_id, user["id"])
+            )
+            if not cursor.fetchone():
+                raise NotFoundError("Cronograma não encontrado ou não pertence ao usuário!")
+            return _bump_version(cursor, user["id"], "schedules")
         
-        conn.close()
+        version = run_write(_write)
+        _advance_schedule_index(user["id"], version, removed=[schedule_id])
+        return True
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao excluir cronograma: {str(e)}") from e
+
+# Busca textual
+def _search_words(text: str) -> List[str]:
+    """Palavras do texto normalizadas como o tokenizador unicode61 (minúsculas, sem acentos)."""
+    text = "".join(c for c in unicodedata.normalize("NFD", text) if not unicodedata.combining(c))
+    return re.findall(r"[^\W_]+", text.lower())
+
+def _search_terms(text: str) -> List[str]:
+    """Palavras consideradas de uma busca."""
+    return _search_words(text)[:SEARCH_MAX_TERMS]
+
+def _search_score(terms: List[str], title: str, description: Optional[str]) -> Optional[int]:
+    """0 se todas as palavras são prefixo de alguma palavra do título, 1 se do título ou da descrição,
+    None se alguma não aparece. Palavras de uma letra só valem inteiras."""
+    def _matches(words: List[str]) -> List[bool]:
+        return [any(w == term if len(term) == 1 else w.startswith(term) for w in words) for term in terms]
+    
+    in_title = _matches(_search_words(title))
+    if all(in_title):
+        return 0
+    in_description = _matches(_search_words(description or ""))
+    return 1 if all(t or d for t, d in zip(in_title, in_description)) else None
+
+def _search_candidates(cursor: sqlite3.Cursor, table: str, fts: str, columns: str, user_id: int,
+                       terms: List[str]) -> List[tuple]:
+    """Linhas do usuário que contêm os prefixos das palavras (até 4 letras) no índice FTS5.
+    
+    Os prefixos curtos usam o índice de prefixos e o intervalo de rowids do usuário; um prefixo mais
+    longo obrigaria o FTS5 a juntar as listas de todos os termos do índice. As palavras são sempre
+    citadas, então operadores digitados pelo usuário são tratados como texto."""
+    expression = " AND ".join(f'"{term}"' if len(term) == 1 else f'"{term[:4]}"*' for term in terms)
+    low = user_id << 32
+    cursor.execute(
+        f"""SELECT {columns} FROM {fts} f JOIN {table} ON {table}.id = f.rowid & {_SEARCH_ID_MASK} 
+            WHERE {fts} MATCH ? AND f.rowid BETWEEN ? AND ?""",
+        (expression, low, low | _SEARCH_ID_MASK)
+    )
+    return cursor.fetchall()
+
+@timed
+def search_user_tasks(token: str, text: str, limit: int = SEARCH_RESULT_LIMIT) -> List[Dict]:
+    """Busca as tarefas do usuário pelo título e pela descrição.
+    
+    Tarefas com todas as palavras no título vêm primeiro; em seguida, por data de entrega."""
+    try:
+        user = _require_user(token)
+        terms = _search_terms(text)
+        if not terms:
+            return []
         
-        if schedule:
-            return {
-                "id": schedule[0],
-                "title": schedule[1],
-                "description": schedule[2],
-                "start_time": schedule[3],
-                "end_time": schedule[4],
-                "days": days,
-                "created_at": schedule[5]
+        with get_connection() as conn:
+            rows = _search_candidates(
+                conn.cursor(), "tasks", "tasks_fts",
+                "tasks.id, tasks.title, tasks.description, tasks.due_date, tasks.priority, tasks.created_at",
+                user["id"], terms
+            )
+        scored = [(score, task) for task in rows
+                  for score in [_search_score(terms, task[1], task[2])] if score is not None]
+        scored.sort(key=lambda item: (item[0], item[1][3], item[1][0]))
+        return [
+            {
+                "id": task[0],
+                "title": task[1],
+                "description": task[2],
+                "due_date": task[3],
+                "priority": task[4],
+                "created_at": task[5]
             }
-        return None
+            for _, task in scored[:limit]
+        ]
     except sqlite3.Error as e:
-        st.error(f"Erro ao criar cronograma: {str(e)}")
-        return None
+        raise DatabaseError(f"Erro ao buscar tarefas: {str(e)}") from e
 
-def update_user_schedule(token: str, schedule_id: int, schedule_data: Dict) -> Optional[Dict]:
-    """Atualiza um cronograma existente."""
+@timed
+def search_user_schedules(token: str, text: str, limit: int = SEARCH_RESULT_LIMIT) -> List[Dict]:
+    """Busca os cronogramas do usuário pelo título e pela descrição.
+    
+    Cronogramas com todas as palavras no título vêm primeiro; em seguida, por horário de início."""
     try:
-        user = get_user_by_token(token)
-        if not user:
-            return None
+        user = _require_user(token)
+        terms = _search_terms(text)
+        if not terms:
+            return []
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        with get_connection() as conn:
+            rows = _search_candidates(
+                conn.cursor(), "schedules", "schedules_fts",
+                "schedules.id, schedules.title, schedules.description, schedules.start_time, "
+                "schedules.end_time, schedules.created_at, schedules.days_mask",
+                user["id"], terms
+            )
+        scored = [(score, row) for row in rows
+                  for score in [_search_score(terms, row[1], row[2])] if score is not None]
+        scored.sort(key=lambda item: (item[0], item[1][3], item[1][0]))
+        return [_schedule_from_row(row) for _, row in scored[:limit]]
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao buscar cronogramas: {str(e)}") from e
+
+# Dados para análises (agregações feitas no banco ou devolvidas como tuplas numéricas)
+_MINUTES_SQL = "CAST(substr({0}, 1, 2) AS INTEGER) * 60 + CAST(substr({0}, 4, 2) AS INTEGER)"
+# Segunda-feira da semana da data de entrega
+_DUE_WEEK_SQL = "date(due_date, '-6 days', 'weekday 1')"
+
+@timed
+def get_user_schedule_intervals(token: str) -> List[tuple]:
+    """Obtém (início, término, days_mask) de cada cronograma do usuário, com os horários em minutos."""
+    try:
+        user = _require_user(token)
         
-        # Verificar se o cronograma pertence ao usuário
-        cursor.execute(
-            "SELECT id FROM schedules WHERE id = ? AND user_id = ?",
-            (schedule_id, user["id"])
-        )
-        if not cursor.fetchone():
-            st.error("Cronograma não encontrado ou não pertence ao usuário!")
-            conn.close()
-            return None
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""SELECT {_MINUTES_SQL.format('start_time')}, {_MINUTES_SQL.format('end_time')}, days_mask 
+                    FROM schedules WHERE user_id = ?""",
+                (user["id"],)
+            )
+            return cursor.fetchall()
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao obter cronogramas: {str(e)}") from e
+
+def iter_schedule_intervals(batch_size: int = 5000) -> Iterator[List[tuple]]:
+    """Percorre (início, término, days_mask) dos cronogramas de todos os usuários, em lotes por id."""
+    last_id = 0
+    while True:
+        try:
+            with get_connection() as conn:
+                rows = conn.execute(
+                    f"""SELECT id, {_MINUTES_SQL.format('start_time')}, {_MINUTES_SQL.format('end_time')}, days_mask 
+                        FROM schedules WHERE id > ? ORDER BY id LIMIT ?""",
+                    (last_id, batch_size)
+                ).fetchall()
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Erro ao obter cronogramas: {str(e)}") from e
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [row[1:] for row in rows]
+
+def _task_workload(cursor: sqlite3.Cursor, where: str, params: tuple) -> List[Dict]:
+    cursor.execute(
+        f"""SELECT {_DUE_WEEK_SQL} AS week, priority, COUNT(*) 
+            FROM tasks {where} 
+            GROUP BY week, priority 
+            ORDER BY week, {PRIORITY_RANK_SQL}""",
+        params
+    )
+    return [{"week": row[0], "priority": row[1], "count": row[2]} for row in cursor.fetchall()]
+
+@timed
+def get_user_task_workload(token: str) -> List[Dict]:
+    """Conta as tarefas do usuário por semana de entrega (segunda-feira) e prioridade."""
+    try:
+        user = _require_user(token)
         
-        # Atualizar cronograma
+        with get_connection() as conn:
+            return _task_workload(conn.cursor(), "WHERE user_id = ?", (user["id"],))
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao obter tarefas: {str(e)}") from e
+
+@timed
+def get_task_workload() -> List[Dict]:
+    """Conta as tarefas de todos os usuários por semana de entrega e prioridade (uma linha por grupo)."""
+    try:
+        with get_connection() as conn:
+            return _task_workload(conn.cursor(), "", ())
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao obter tarefas: {str(e)}") from e
+
+@timed
+def count_users() -> int:
+    try:
+        with get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao contar usuários: {str(e)}") from e
+
+# Operações em lote
+def _validate_task(task_data: Dict) -> Optional[str]:
+    """Retorna a mensagem de erro da tarefa ou None se ela for válida."""
+    if not str(task_data.get("title") or "").strip():
+        return "Título obrigatório"
+    try:
+        date.fromisoformat(str(task_data.get("due_date")))
+    except ValueError:
+        return f"Data de entrega inválida: {task_data.get('due_date')}"
+    if task_data.get("priority") not in TASK_PRIORITIES:
+        return f"Prioridade inválida: {task_data.get('priority')}"
+    return None
+
+def _validate_schedule(schedule_data: Dict) -> Optional[str]:
+    """Retorna a mensagem de erro do cronograma ou None se ele for válido."""
+    if not str(schedule_data.get("title") or "").strip():
+        return "Título obrigatório"
+    times = []
+    for field in ("start_time", "end_time"):
+        try:
+            times.append(datetime.strptime(str(schedule_data.get(field)), "%H:%M").time())
+        except ValueError:
+            return f"Horário inválido: {schedule_data.get(field)}"
+    if times[0] >= times[1]:
+        return "O horário de início deve ser anterior ao de término"
+    invalid_days = [day for day in schedule_data.get("days") or [] if day not in WEEK_DAYS]
+    if invalid_days:
+        return f"Dias inválidos: {', '.join(map(str, invalid_days))}"
+    return None
+
+def _owned_ids(cursor: sqlite3.Cursor, table: str, user_id: int, ids: List[int]) -> set:
+    """Retorna, dentre `ids`, os que pertencem ao usuário (em blocos, pelo limite de parâmetros)."""
+    owned = set()
+    unique_ids = list(dict.fromkeys(ids))
+    for start in range(0, len(unique_ids), 500):
+        chunk = unique_ids[start:start + 500]
         cursor.execute(
-            """UPDATE schedules 
-               SET title = ?, description = ?, start_time = ?, end_time = ? 
-               WHERE id = ?""",
-            (schedule_data["title"], schedule_data["description"], 
-             schedule_data["start_time"], schedule_data["end_time"], schedule_id)
+            f"SELECT id FROM {table} WHERE user_id = ? AND id IN ({', '.join('?' * len(chunk))})",
+            (user_id, *chunk)
         )
+        owned.update(row[0] for row in cursor.fetchall())
+    return owned
+
+def _inserted_ids(cursor: sqlite3.Cursor, count: int) -> List[int]:
+    """Ids gerados pelo último executemany de INSERT.
+    
+    Dentro da transação de escrita (BEGIN IMMEDIATE) nenhuma outra conexão insere, e
+    AUTOINCREMENT atribui ids consecutivos a partir do maior já usado."""
+    last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return list(range(last_id - count + 1, last_id + 1))
+
+@timed
+def bulk_create_user_tasks(token: str, tasks: List[Dict]) -> List[Dict]:
+    """Cria várias tarefas em uma única transação.
+    
+    Retorna um resultado por item, na ordem recebida: {"index", "ok", "id", "error"}.
+    Itens inválidos são ignorados sem impedir a gravação dos demais."""
+    results = [{"index": i, "ok": False, "id": None, "error": _validate_task(t)} for i, t in enumerate(tasks)]
+    valid = [r["index"] for r in results if r["error"] is None]
+    try:
+        user = _require_user(token)
+        if not valid:
+            return results
         
-        # Atualizar dias da semana
-        cursor.execute("DELETE FROM schedule_days WHERE schedule_id = ?", (schedule_id,))
-        for day in schedule_data["days"]:
-            cursor.execute(
-                "INSERT INTO schedule_days (schedule_id, day) VALUES (?, ?)",
-                (schedule_id, day)
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            cursor.executemany(
+                """INSERT INTO tasks (user_id, title, description, due_date, priority) 
+                   VALUES (?, ?, ?, ?, ?)""",
+                [(user["id"], tasks[i]["title"], tasks[i].get("description", ""), 
+                  tasks[i]["due_date"], tasks[i]["priority"]) for i in valid]
             )
+            ids = _inserted_ids(cursor, len(valid))
+            _bump_version(cursor, user["id"], "tasks")
+            return ids
         
-        conn.commit()
+        for i, task_id in zip(valid, run_write(_write)):
+            results[i].update(ok=True, id=task_id)
+        return results
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao criar tarefas: {str(e)}") from e
+
+@timed
+def bulk_update_user_tasks(token: str, tasks: List[Dict]) -> List[Dict]:
+    """Atualiza várias tarefas (cada item com "id" e os campos da tarefa) em uma única transação.
+    
+    Itens sem "description" mantêm a descrição atual. Retorna um resultado por item: {"index", "ok", "id", "error"}."""
+    results = [
+        {"index": i, "ok": False, "id": t.get("id"),
+         "error": "Id da tarefa obrigatório" if t.get("id") is None else _validate_task(t)}
+        for i, t in enumerate(tasks)
+    ]
+    try:
+        user = _require_user(token)
         
-        # Obter o cronograma atualizado
-        cursor.execute(
-            """SELECT id, title, description, start_time, end_time, created_at 
-               FROM schedules WHERE id = ?""",
-            (schedule_id,)
-        )
-        schedule = cursor.fetchone()
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            candidates = [r["index"] for r in results if r["error"] is None]
+            owned = _owned_ids(cursor, "tasks", user["id"], [tasks[i]["id"] for i in candidates])
+            valid = [i for i in candidates if tasks[i]["id"] in owned]
+            if valid:
+                cursor.executemany(
+                    """UPDATE tasks 
+                       SET title = ?, description = COALESCE(?, description), due_date = ?, priority = ? 
+                       WHERE id = ? AND user_id = ?""",
+                    [(tasks[i]["title"], tasks[i].get("description"), tasks[i]["due_date"], 
+                      tasks[i]["priority"], tasks[i]["id"], user["id"]) for i in valid]
+                )
+                _bump_version(cursor, user["id"], "tasks")
+            return valid
         
-        # Obter os dias da semana
-        cursor.execute(
-            "SELECT day FROM schedule_days WHERE schedule_id = ?",
-            (schedule_id,)
-        )
-        days = [row[0] for row in cursor.fetchall()]
+        valid = set(run_write(_write))
+        for r in results:
+            if r["index"] in valid:
+                r["ok"] = True
+            elif r["error"] is None:
+                r["error"] = "Tarefa não encontrada ou não pertence ao usuário!"
+        return results
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao atualizar tarefas: {str(e)}") from e
+
+@timed
+def bulk_delete_user_tasks(token: str, task_ids: List[int]) -> List[Dict]:
+    """Remove várias tarefas do usuário em uma única transação.
+    
+    Retorna um resultado por id: {"index", "ok", "id", "error"}."""
+    try:
+        user = _require_user(token)
         
-        conn.close()
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            owned = _owned_ids(cursor, "tasks", user["id"], task_ids)
+            if owned:
+                cursor.executemany(
+                    "DELETE FROM tasks WHERE id = ? AND user_id = ?",
+                    [(task_id, user["id"]) for task_id in owned]
+                )
+                _bump_version(cursor, user["id"], "tasks")
+            return owned
         
-        if schedule:
-            return {
-                "id": schedule[0],
-                "title": schedule[1],
-                "description": schedule[2],
-                "start_time": schedule[3],
-                "end_time": schedule[4],
-                "days": days,
-                "created_at": schedule[5]
-            }
-        return None
+        owned = run_write(_write)
+        return [
+            {"index": i, "ok": task_id in owned, "id": task_id,
+             "error": None if task_id in owned else "Tarefa não encontrada ou não pertence ao usuário!"}
+            for i, task_id in enumerate(task_ids)
+        ]
     except sqlite3.Error as e:
-        st.error(f"Erro ao atualizar cronograma: {str(e)}")
-        return None
+        raise DatabaseError(f"Erro ao excluir tarefas: {str(e)}") from e
 
-def delete_user_schedule(token: str, schedule_id: int) -> bool:
-    """Remove um cronograma do usuário."""
+@timed
+def bulk_create_user_schedules(token: str, schedules: List[Dict], allow_conflicts: bool = False) -> List[Dict]:
+    """Cria vários cronogramas em uma única transação.
+    
+    Retorna um resultado por item: {"index", "ok", "id", "error"}. Itens em conflito com
+    cronogramas existentes ou com itens anteriores do mesmo lote são rejeitados."""
+    results = [{"index": i, "ok": False, "id": None, "error": _validate_schedule(s)} for i, s in enumerate(schedules)]
     try:
-        user = get_user_by_token(token)
-        if not user:
-            return False
+        user = _require_user(token)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            index = _load_schedule_index(cursor, user["id"]).copy()
+            valid = []
+            for r in results:
+                if r["error"] is not None:
+                    continue
+                schedule = schedules[r["index"]]
+                days_mask = days_to_mask(schedule.get("days") or [])
+                conflicts = [] if allow_conflicts else index.find_conflicts(
+                    schedule["start_time"], schedule["end_time"], days_mask
+                )
+                if conflicts:
+                    r["error"] = _conflict_message(conflicts)
+                    continue
+                # Id provisório (negativo) até a inserção, para detectar conflitos dentro do lote
+                index.add(-1 - r["index"], schedule["start_time"], schedule["end_time"], days_mask, schedule["title"])
+                valid.append(r["index"])
+            if not valid:
+                return valid, [], None, None
+            
+            cursor.executemany(
+                """INSERT INTO schedules (user_id, title, description, start_time, end_time, days_mask) 
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                [(user["id"], schedules[i]["title"], schedules[i].get("description", ""), schedules[i]["start_time"], 
+                  schedules[i]["end_time"], days_to_mask(schedules[i].get("days") or [])) for i in valid]
+            )
+            ids = _inserted_ids(cursor, len(valid))
+            version = _bump_version(cursor, user["id"], "schedules")
+            for i, schedule_id in zip(valid, ids):
+                index.remove(-1 - i)
+                index.add(schedule_id, schedules[i]["start_time"], schedules[i]["end_time"],
+                          days_to_mask(schedules[i].get("days") or []), schedules[i]["title"])
+            return valid, ids, version, index
         
-        # Verificar se o cronograma pertence ao usuário
-        cursor.execute(
-            "SELECT id FROM schedules WHERE id = ? AND user_id = ?",
-            (schedule_id, user["id"])
-        )
-        if not cursor.fetchone():
-            st.error("Cronograma não encontrado ou não pertence ao usuário!")
-            conn.close()
-            return False
+        valid, ids, version, index = run_write(_write)
+        if valid:
+            _advance_schedule_index(user["id"], version, index)
+        for i, schedule_id in zip(valid, ids):
+            results[i].update(ok=True, id=schedule_id)
+        return results
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao criar cronogramas: {str(e)}") from e
+
+@timed
+def bulk_update_user_schedules(token: str, schedules: List[Dict], allow_conflicts: bool = False) -> List[Dict]:
+    """Atualiza vários cronogramas (cada item com "id" e os campos do cronograma) em uma única transação.
+    
+    Itens sem "description" mantêm a descrição atual. Retorna um resultado por item: {"index", "ok", "id", "error"}."""
+    results = [
+        {"index": i, "ok": False, "id": s.get("id"),
+         "error": "Id do cronograma obrigatório" if s.get("id") is None else _validate_schedule(s)}
+        for i, s in enumerate(schedules)
+    ]
+    try:
+        user = _require_user(token)
         
-        # Excluir cronograma (os dias serão excluídos automaticamente pela restrição ON DELETE CASCADE)
-        cursor.execute("DELETE FROM schedules WHERE id = ?", (schedule_id,))
-        conn.commit()
-        conn.close()
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            candidates = [r["index"] for r in results if r["error"] is None]
+            owned = _owned_ids(cursor, "schedules", user["id"], [schedules[i]["id"] for i in candidates])
+            index = _load_schedule_index(cursor, user["id"]).copy()
+            valid = []
+            for i in candidates:
+                schedule = schedules[i]
+                if schedule["id"] not in owned:
+                    results[i]["error"] = "Cronograma não encontrado ou não pertence ao usuário!"
+                    continue
+                days_mask = days_to_mask(schedule.get("days") or [])
+                conflicts = [] if allow_conflicts else index.find_conflicts(
+                    schedule["start_time"], schedule["end_time"], days_mask, exclude_id=schedule["id"]
+                )
+                if conflicts:
+                    results[i]["error"] = _conflict_message(conflicts)
+                    continue
+                index.add(schedule["id"], schedule["start_time"], schedule["end_time"], days_mask, schedule["title"])
+                valid.append(i)
+            if not valid:
+                return valid, None, None
+            
+            cursor.executemany(
+                """UPDATE schedules 
+                   SET title = ?, description = COALESCE(?, description), start_time = ?, end_time = ?, days_mask = ? 
+                   WHERE id = ? AND user_id = ?""",
+                [(schedules[i]["title"], schedules[i].get("description"), schedules[i]["start_time"], 
+                  schedules[i]["end_time"], days_to_mask(schedules[i].get("days") or []),
+                  schedules[i]["id"], user["id"]) for i in valid]
+            )
+            return valid, _bump_version(cursor, user["id"], "schedules"), index
         
-        return True
+        valid, version, index = run_write(_write)
+        if valid:
+            _advance_schedule_index(user["id"], version, index)
+        for i in valid:
+            results[i]["ok"] = True
+        return results
     except sqlite3.Error as e:
-        st.error(f"Erro ao excluir cronograma: {str(e)}")
-        return False
+        raise DatabaseError(f"Erro ao atualizar cronogramas: {str(e)}") from e
 
-# Inicializar o banco de dados quando o módulo for importado
-init_db()
\ No newline at end of file
+@timed
+def bulk_delete_user_schedules(token: str, schedule_ids: List[int]) -> List[Dict]:
+    """Remove vários cronogramas do usuário em uma única transação.
+    
+    Retorna um resultado por id: {"index", "ok", "id", "error"}."""
+    try:
+        user = _require_user(token)
+        
+        def _write(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+            owned = _owned_ids(cursor, "schedules", user["id"], schedule_ids)
+            if not owned:
+                return owned, None
+            cursor.executemany(
+                "DELETE FROM schedules WHERE id = ? AND user_id = ?",
+                [(schedule_id, user["id"]) for schedule_id in owned]
+            )
+            return owned, _bump_version(cursor, user["id"], "schedules")
+        
+        owned, version = run_write(_write)
+        if owned:
+            _advance_schedule_index(user["id"], version, removed=owned)
+        return [
+            {"index": i, "ok": schedule_id in owned, "id": schedule_id,
+             "error": None if schedule_id in owned else "Cronograma não encontrado ou não pertence ao usuário!"}
+            for i, schedule_id in enumerate(schedule_ids)
+        ]
+    except sqlite3.Error as e:
+        raise DatabaseError(f"Erro ao excluir cronogramas: {str(e)}") from e
+
+# Manutenção do banco de dados
+def _database_size(conn: sqlite3.Connection) -> Dict:
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {"page_size": page_size, "pages": page_count, "free_pages": freelist_count}
+
+# Tabelas cujas linhas pertencem a um usuário (coluna user_id)
+_USER_OWNED_TABLES = ("tokens", "tasks", "schedules", "user_versions")
+
+@timed
+def delete_orphan_rows(batch_size: int = 1000) -> Dict[str, int]:
+    """Remove, em lotes, linhas cujo usuário não existe mais; retorna quantas por tabela."""
+    removed = {}
+    for table in _USER_OWNED_TABLES:
+        removed[table] = 0
+        while True:
+            deleted = run_write(lambda conn: conn.execute(
+                f"""DELETE FROM {table} WHERE rowid IN (
+                       SELECT t.rowid FROM {table} t 
+                       WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = t.user_id) 
+                       LIMIT ?
+                   )""",
+                (batch_size,)
+            ).rowcount)
+            removed[table] += deleted
+            if deleted < batch_size:
+                break
+    return removed
+
+@timed
+def run_maintenance(batch_size: int = 1000, full_vacuum: bool = False) -> Dict:
+    """Remove registros órfãos, compacta os índices de busca, atualiza estatísticas e devolve espaço livre.
+    
+    Com full_vacuum=True executa um VACUUM completo, que também converte bancos antigos para
+    auto_vacuum incremental; caso contrário apenas as páginas livres são liberadas."""
+    file_size_before = os.path.getsize(DB_PATH)
+    
+    orphan_rows = delete_orphan_rows(batch_size)
+    
+    # Mescla os segmentos dos índices de busca, que crescem a cada escrita, e atualiza as estatísticas,
+    # em transações de escrita curtas e repetidas se o banco estiver bloqueado por outra sessão
+    for _, fts in SEARCH_TABLES:
+        run_write(lambda conn: conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')"))
+    run_write(lambda conn: conn.execute("ANALYZE"))
+    
+    with get_connection() as conn:
+        before = _database_size(conn)
+        if full_vacuum:
+            conn.execute("VACUUM")
+        elif conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+            conn.commit()
+        # Aplicar as alterações do WAL ao arquivo principal para que o espaço seja devolvido
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        after = _database_size(conn)
+        violations = len(conn.execute("PRAGMA foreign_key_check").fetchall())
+    file_size_after = os.path.getsize(DB_PATH)
+    
+    return {
+        "orphan_rows_removed": orphan_rows,
+        "foreign_key_violations": violations,
+        "pages_before": before["pages"],
+        "pages_after": after["pages"],
+        "free_pages_after": after["free_pages"],
+        "reclaimed_bytes": (before["pages"] - after["pages"]) * before["page_size"],
+        "file_size_before": file_size_before,
+        "file_size_after": file_size_after
+    }
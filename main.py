@@ -1,8 +1,33 @@
+import io
+import itertools
+import logging
+import os
+import uuid
+import pandas as pd
 import streamlit as st
-from typing import Dict, List, Optional
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
 from auth import check_authentication, logout, get_current_user
-from tasks import get_tasks, create_task, update_task, delete_task, render_task_form
-from schedules import get_schedules, create_schedule, update_schedule, delete_schedule, render_schedule_form
+from tasks import (
+    get_task, query_tasks, search_tasks, create_task, update_task, delete_task, render_task_form, render_task_filters,
+    render_task_bulk_actions
+)
+from schedules import (
+    get_schedules, search_schedules, get_schedule_conflicts, create_schedule, update_schedule, delete_schedule,
+    render_schedule_form, render_schedule_bulk_actions, render_free_slots
+)
+from database import (
+    DataError, WEEK_DAYS, init_db, start_token_compaction, get_user_versions, get_user_task_workload,
+    set_query_stats_enabled
+)
+from analytics import user_heatmap, hourly
+from calendar_io import (
+    iter_ics, iter_tasks_csv, iter_schedules_csv, import_ics, import_tasks_csv, import_schedules_csv,
+    write_export_file, purge_stale_exports
+)
+from data_cache import user_data_cache
+from profiling import PROFILE_RERUNS, PROFILE_DIR, RerunProfiler
+import query_stats
 
 # Configuração da página
 st.set_page_config(
@@ -11,30 +36,278 @@ st.set_page_config(
     layout="wide"
 )
 
+logger = logging.getLogger(__name__)
+
+# Usuários que veem a página de desempenho (nomes separados por vírgula)
+ADMIN_USERS = {name.strip() for name in os.getenv("ADMIN_USERS", "").split(",") if name.strip()}
+# Cronogramas exibidos por vez na lista (as tarefas seguem TASK_PAGE_SIZE)
+LIST_WINDOW_SIZE = int(os.getenv("LIST_WINDOW_SIZE", "20"))
+
+# Formatos de importação e exportação: (rótulo, nome do arquivo, exportação, importação)
+TRANSFER_FORMATS = [
+    ("Calendário (.ics)", "calendario.ics", iter_ics, import_ics),
+    ("Tarefas (.csv)", "tarefas.csv", iter_tasks_csv, import_tasks_csv),
+    ("Cronogramas (.csv)", "cronogramas.csv", iter_schedules_csv, import_schedules_csv),
+]
+
+def render_import_export(user_data: Optional[Dict]):
+    """Renderiza a exportação e a importação de tarefas e cronogramas."""
+    token = st.session_state.get("token", "")
+    label = st.selectbox("Formato", options=[f[0] for f in TRANSFER_FORMATS], key="transfer_format")
+    _, filename, exporter, importer = next(f for f in TRANSFER_FORMATS if f[0] == label)
+    
+    # O arquivo só é gerado sob demanda e lido uma única vez, pelo botão de download desta execução.
+    # O Streamlit guarda o conteúdo em memória até a próxima interação; o arquivo é removido logo em seguida
+    if st.button("Preparar exportação"):
+        purge_stale_exports()
+        try:
+            path = write_export_file(exporter(token), filename)
+        except (DataError, OSError) as e:
+            st.error(str(e))
+        else:
+            try:
+                with open(path, "rb") as handle:
+                    st.download_button("⬇️ Baixar", data=handle, file_name=filename)
+            finally:
+                os.remove(path)
+            st.caption("O download fica disponível até a próxima interação com a página.")
+    
+    uploaded = st.file_uploader("Importar arquivo", type=[filename.rsplit(".", 1)[1]], key="import_file")
+    if uploaded and st.button("Importar"):
+        try:
+            summary = importer(token, io.TextIOWrapper(uploaded, encoding="utf-8-sig", newline=""))
+        except DataError as e:
+            st.error(str(e))
+            return
+        user_data_cache.invalidate(user_data["id"] if user_data else None)
+        # A importação de .ics retorna um resumo por tipo; a de CSV, um único resumo
+        labels = {"tasks": "tarefa(s)", "schedules": "cronograma(s)"}
+        summaries = summary.items() if "created" not in summary else [("items", summary)]
+        for kind, result in summaries:
+            st.success(f"{result['created']} {labels.get(kind, 'item(s)')} importado(s)")
+            for sample in result["error_samples"]:
+                st.warning(f"Item {sample['item']}: {sample['error']}")
+            if result["errors"] > len(result["error_samples"]):
+                st.warning(f"... e mais {result['errors'] - len(result['error_samples'])} erro(s)")
+
+def render_analytics(user_data: Optional[Dict]):
+    """Renderiza o mapa de ocupação semanal e as tarefas por semana de entrega e prioridade."""
+    token = st.session_state.get("token", "")
+    user_id = user_data["id"] if user_data else None
+    try:
+        grid = user_data_cache.get_or_load(
+            user_id, ("heatmap",), lambda: user_heatmap(token), lambda: get_user_versions(token)["schedules"]
+        )
+        workload = user_data_cache.get_or_load(
+            user_id, ("tasks", "workload"), lambda: get_user_task_workload(token),
+            lambda: get_user_versions(token)["tasks"]
+        )
+    except DataError as e:
+        st.error(str(e))
+        return
+    
+    st.subheader("Ocupação semanal (minutos por hora)")
+    st.dataframe(pd.DataFrame(hourly(grid), index=list(WEEK_DAYS), columns=[f"{h:02d}h" for h in range(24)]))
+    st.write(f"**Total ocupado na semana:** {int(grid.sum()) // 60}h{int(grid.sum()) % 60:02d}")
+    
+    st.subheader("Tarefas por semana de entrega")
+    if workload:
+        chart = pd.DataFrame(workload).pivot_table(index="week", columns="priority", values="count", fill_value=0)
+        st.bar_chart(chart)
+    else:
+        st.info("Nenhuma tarefa cadastrada.")
+
+def render_query_stats():
+    """Renderiza o resumo da medição de instruções SQL e funções da camada de dados."""
+    enabled = st.checkbox("Medição ativa", value=query_stats.is_enabled())
+    if enabled != query_stats.is_enabled():
+        set_query_stats_enabled(enabled)
+    if not enabled:
+        st.info("A medição está desligada (ative aqui ou com QUERY_STATS=1).")
+    if st.button("Zerar estatísticas"):
+        query_stats.query_stats.reset()
+    
+    summary = query_stats.query_stats.snapshot()
+    st.subheader("Funções da camada de dados")
+    st.dataframe(pd.DataFrame(summary["functions"]), use_container_width=True)
+    st.subheader("Instruções SQL")
+    st.dataframe(pd.DataFrame(summary["statements"]), use_container_width=True)
+    st.subheader(f"Consultas lentas (acima de {query_stats.query_stats.slow_ms:g} ms)")
+    if summary["slow_queries"]:
+        st.dataframe(pd.DataFrame(summary["slow_queries"][::-1]), use_container_width=True)
+    else:
+        st.info("Nenhuma consulta lenta registrada.")
+
+def start_profiler() -> RerunProfiler:
+    """Inicia o perfil da execução, se ativado por PROFILE_RERUNS ou por ?profile=1 na URL."""
+    if not (PROFILE_RERUNS or st.experimental_get_query_params().get("profile") == ["1"]):
+        return RerunProfiler(False)
+    # Lidos no início: após st.stop() o Streamlit interrompe novas chamadas
+    session_id = st.session_state.setdefault("profile_session", uuid.uuid4().hex)
+    run = st.session_state["profile_run"] = st.session_state.get("profile_run", 0) + 1
+    profiler = RerunProfiler(True, session_id, run)
+    profiler.start()
+    return profiler
+
+def finish_profiler(profiler: RerunProfiler):
+    """Encerra o perfil e grava as fases e o cProfile da execução no diretório da sessão."""
+    profiler.stop()
+    if not profiler.enabled:
+        return
+    try:
+        profiler.dump(PROFILE_DIR)
+    except OSError:
+        logger.exception("Erro ao gravar o perfil da execução")
+    st.session_state["profile_last"] = profiler.summary()
+
+def render_profile():
+    """Renderiza o tempo de cada fase da execução anterior da página."""
+    last = st.session_state.get("profile_last")
+    if not last:
+        return
+    with st.expander(f"⏱️ Última execução: {last['total_ms']:.0f} ms"):
+        for entry in last["phases"]:
+            st.write(f"{entry['phase']}: {entry['ms']:.1f} ms")
+
+@st.cache_resource(show_spinner=False)
+def setup_database():
+    """Aplica as migrações pendentes e inicia a compactação de tokens (executada uma vez por processo)."""
+    init_db()
+    start_token_compaction()
+
+def set_state(name: str, value):
+    """Callback de botão: altera o estado da sessão antes da execução que renderiza o clique."""
+    st.session_state[name] = value
+
+def delete_item(delete, item_id: int, editing_key: str):
+    """Callback de exclusão: remove o item e fecha o seu formulário de edição, se estiver aberto."""
+    if delete(item_id) and st.session_state.get(editing_key) == item_id:
+        st.session_state.pop(editing_key)
+
+def load_task_page(search: str, filters: Dict, cursors: List) -> Dict:
+    """Obtém a página atual de tarefas (sem as descrições) ou, com texto de busca, o resultado da busca."""
+    if search:
+        return {"tasks": search_tasks(search), "next_cursor": None}
+    return query_tasks(after=cursors[-1] if cursors else None, with_description=False, **filters)
+
+def week_start(due_date: str) -> str:
+    """Segunda-feira da semana de uma data no formato AAAA-MM-DD."""
+    day = date.fromisoformat(due_date)
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+def render_task_item(task: Dict):
+    """Renderiza uma tarefa da lista; a descrição e as ações só são carregadas para a tarefa aberta."""
+    is_open = st.session_state.get("open_task") == task["id"]
+    with st.expander(f"{task['title']} - {task['due_date']}", expanded=is_open):
+        st.write(f"**Prioridade:** {task['priority']}")
+        if not is_open:
+            st.button("📄 Detalhes", key=f"open_{task['id']}", on_click=set_state, args=("open_task", task['id']))
+            return
+        details = task if "description" in task else get_task(task["id"])
+        st.write(f"**Descrição:** {details['description'] if details else ''}")
+        
+        # Os cliques são tratados em callbacks, antes da execução que renderiza a página
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button("✏️ Editar", key=f"edit_{task['id']}", on_click=set_state, args=("editing_task", task['id']))
+        with col2:
+            st.button("🗑️ Excluir", key=f"delete_{task['id']}", on_click=delete_item,
+                      args=(delete_task, task['id'], "editing_task"))
+
+def first_day(schedule: Dict) -> str:
+    """Primeiro dia da semana do cronograma, usado para ordenar e agrupar a lista."""
+    return schedule["days"][0] if schedule["days"] else ""
+
+def render_schedule_item(schedule: Dict):
+    """Renderiza um cronograma da lista; a descrição e as ações só aparecem no cronograma aberto."""
+    is_open = st.session_state.get("open_schedule") == schedule["id"]
+    with st.expander(f"{schedule['title']} - {', '.join(schedule['days'])}", expanded=is_open):
+        st.write(f"**Horário:** {schedule['start_time']} até {schedule['end_time']}")
+        if not is_open:
+            st.button("📄 Detalhes", key=f"open_schedule_{schedule['id']}", on_click=set_state,
+                      args=("open_schedule", schedule['id']))
+            return
+        st.write(f"**Descrição:** {schedule['description']}")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button("✏️ Editar", key=f"edit_schedule_{schedule['id']}", on_click=set_state,
+                      args=("editing_schedule", schedule['id']))
+        with col2:
+            st.button("🗑️ Excluir", key=f"delete_schedule_{schedule['id']}", on_click=delete_item,
+                      args=(delete_schedule, schedule['id'], "editing_schedule"))
+
+def list_window(items: List, key: str) -> Tuple[List, int]:
+    """Janela visível de uma lista já carregada, a partir do início guardado em `key`; retorna os itens e o início."""
+    last = max(len(items) - 1, 0) // LIST_WINDOW_SIZE * LIST_WINDOW_SIZE
+    start = min(st.session_state.get(key, 0), last)
+    return items[start:start + LIST_WINDOW_SIZE], start
+
+def render_window_nav(key: str, start: int, total: int):
+    """Renderiza a posição da janela e a navegação para a anterior e a próxima."""
+    if total <= LIST_WINDOW_SIZE:
+        return
+    st.caption(f"{start + 1}-{min(start + LIST_WINDOW_SIZE, total)} de {total}")
+    col1, col2 = st.columns(2)
+    with col1:
+        if start > 0:
+            st.button("⬅️ Anterior", key=f"{key}_previous", on_click=set_state, args=(key, start - LIST_WINDOW_SIZE))
+    with col2:
+        if start + LIST_WINDOW_SIZE < total:
+            st.button("Próxima ➡️", key=f"{key}_next", on_click=set_state, args=(key, start + LIST_WINDOW_SIZE))
+
 # Interface principal
 def main():
+    # Cada interação reexecuta o script inteiro: com o perfil ativo, cada fase é medida
+    profiler = start_profiler()
+    try:
+        render_app(profiler)
+    finally:
+        finish_profiler(profiler)
+
+def render_app(profiler: RerunProfiler):
     st.title("📚 Calendário Estudantil")
     
+    # Esquema do banco e compactação de tokens, uma única vez por processo
+    with profiler.phase("init_db"):
+        try:
+            setup_database()
+        except DataError as e:
+            st.error(str(e))
+            st.stop()
+    
     # Verificar autenticação
-    check_authentication()
+    with profiler.phase("check_authentication"):
+        check_authentication()
     
     # Obter informações do usuário atual
-    user_data = get_current_user()
+    with profiler.phase("get_current_user"):
+        user_data = get_current_user()
     
     # Menu lateral
-    with st.sidebar:
+    with st.sidebar, profiler.phase("sidebar"):
         if user_data:
             st.success(f"Bem-vindo, {user_data.get('username', 'Usuário')}!")
             
         st.header("Menu")
+        # A página de desempenho só aparece para os administradores
+        pages = ["Tarefas", "Cronogramas", "Análises"]
+        if user_data and user_data.get("username") in ADMIN_USERS:
+            pages.append("Desempenho")
         page = st.radio(
             "Navegação",
-            options=["Tarefas", "Cronogramas"],
+            options=pages,
             index=0
         )
         
+        with st.expander("📁 Importar / Exportar"):
+            render_import_export(user_data)
+        
         if st.button("Sair"):
             logout()
+        
+        if profiler.enabled:
+            render_profile()
     
     # Página de Tarefas
     if page == "Tarefas":
@@ -44,9 +317,11 @@ def main():
         if st.button("➕ Nova Tarefa"):
             st.session_state["adding_task"] = True
         
-        # Formulário para nova tarefa
+        # Formulário para nova tarefa; ao salvar, só o seu espaço é limpo, sem reexecutar a página
         if st.session_state.get("adding_task", False):
-            with st.form("new_task_form"):
+            form_slot = st.empty()
+            created = None
+            with form_slot.form("new_task_form"):
                 title = st.text_input("Título")
                 description = st.text_area("Descrição")
                 due_date = st.date_input("Data de entrega")
@@ -62,48 +337,66 @@ def main():
                         "due_date": due_date.isoformat(),
                         "priority": priority
                     }
-                    create_task(task_data)
-                    st.session_state["adding_task"] = False
-                    st.experimental_rerun()
+                    created = create_task(task_data)
+            if created:
+                st.session_state["adding_task"] = False
+                form_slot.empty()
         
-        # Formulário para editar tarefa existente
+        # Busca textual; sem busca, filtros e paginação (as escritas atualizam a página em cache)
+        search = st.text_input("🔎 Buscar tarefas", key="task_search").strip()
+        filters = render_task_filters()
+        if st.session_state.get("task_filters") != filters:
+            st.session_state["task_filters"] = filters
+            st.session_state["task_cursors"] = []
+        cursors = st.session_state.setdefault("task_cursors", [])
+        with profiler.phase("get_tasks"):
+            task_page = load_task_page(search, filters, cursors)
+        
+        # Formulário para editar tarefa existente (a página não traz as descrições)
         if st.session_state.get("editing_task"):
-            # Obter dados da tarefa atual
-            current_task = None
-            for task in get_tasks():
-                if task['id'] == st.session_state["editing_task"]:
-                    current_task = task
-                    break
+            current_task = get_task(st.session_state["editing_task"])
             
             if current_task:
-                task_data = render_task_form(current_task)
-                if task_data:
-                    update_task(st.session_state["editing_task"], task_data)
+                form_slot = st.empty()
+                with form_slot.container():
+                    task_data = render_task_form(current_task)
+                    updated = task_data and update_task(st.session_state["editing_task"], task_data)
+                if updated:
                     st.session_state.pop("editing_task")
-                    st.experimental_rerun()
+                    form_slot.empty()
+                    # A lista abaixo já mostra a tarefa alterada, lida do cache atualizado
+                    task_page = load_task_page(search, filters, cursors)
             else:
                 st.error("Tarefa não encontrada!")
                 st.session_state.pop("editing_task")
-                st.experimental_rerun()
         
         # Lista de tarefas
-        tasks = get_tasks()
-        for task in tasks:
-            with st.expander(f"{task['title']} - {task['due_date']}"):
-                st.write(f"**Descrição:** {task['description']}")
-                st.write(f"**Prioridade:** {task['priority']}")
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button("✏️ Editar", key=f"edit_{task['id']}"):
-                        st.session_state["editing_task"] = task['id']
-                with col2:
-                    if st.button("🗑️ Excluir", key=f"delete_{task['id']}"):
-                        delete_task(task['id'])
-                        st.experimental_rerun()
+        tasks = task_page["tasks"]
+        if not tasks:
+            st.info("Nenhuma tarefa encontrada.")
+        elif render_task_bulk_actions(tasks):
+            st.session_state.pop("task_bulk_selection", None)
+            st.experimental_rerun()
+        # Só a página atual é renderizada; em ordem de entrega, agrupada pela semana
+        by_week = not search and filters["order_by"] == "due_date"
+        with profiler.phase("render_tasks"):
+            for week, group in itertools.groupby(tasks, key=lambda t: week_start(t["due_date"]) if by_week else None):
+                if week:
+                    st.markdown(f"**📅 Semana de {week}**")
+                for task in group:
+                    render_task_item(task)
+        
+        # Navegação entre páginas
+        col1, col2 = st.columns(2)
+        with col1:
+            if cursors and not search:
+                st.button("⬅️ Anterior", on_click=cursors.pop)
+        with col2:
+            if task_page["next_cursor"]:
+                st.button("Próxima ➡️", on_click=cursors.append, args=(task_page["next_cursor"],))
     
     # Página de Cronogramas
-    else:
+    elif page == "Cronogramas":
         st.header("Gerenciamento de Cronogramas")
         
         # Botão para adicionar novo cronograma
@@ -112,11 +405,14 @@ def main():
         
         # Formulário para novo cronograma
         if st.session_state.get("adding_schedule", False):
-            schedule_data = render_schedule_form()
-            if schedule_data:
-                create_schedule(schedule_data)
+            form_slot = st.empty()
+            with form_slot.container():
+                schedule_data = render_schedule_form()
+                # Em caso de conflito de horário o formulário continua aberto, com o erro exibido
+                created = schedule_data and create_schedule(schedule_data)
+            if created:
                 st.session_state["adding_schedule"] = False
-                st.experimental_rerun()
+                form_slot.empty()
         
         # Formulário para editar cronograma existente
         if st.session_state.get("editing_schedule"):
@@ -128,31 +424,62 @@ def main():
                     break
             
             if current_schedule:
-                schedule_data = render_schedule_form(current_schedule)
-                if schedule_data:
-                    update_schedule(st.session_state["editing_schedule"], schedule_data)
+                form_slot = st.empty()
+                with form_slot.container():
+                    schedule_data = render_schedule_form(current_schedule)
+                    updated = schedule_data and update_schedule(st.session_state["editing_schedule"], schedule_data)
+                if updated:
                     st.session_state.pop("editing_schedule")
-                    st.experimental_rerun()
+                    form_slot.empty()
             else:
                 st.error("Cronograma não encontrado!")
                 st.session_state.pop("editing_schedule")
-                st.experimental_rerun()
-        
-        # Lista de cronogramas
-        schedules = get_schedules()
-        for schedule in schedules:
-            with st.expander(f"{schedule['title']} - {', '.join(schedule['days'])}"):
-                st.write(f"**Descrição:** {schedule['description']}")
-                st.write(f"**Horário:** {schedule['start_time']} até {schedule['end_time']}")
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button("✏️ Editar", key=f"edit_schedule_{schedule['id']}"):
-                        st.session_state["editing_schedule"] = schedule['id']
-                with col2:
-                    if st.button("🗑️ Excluir", key=f"delete_schedule_{schedule['id']}"):
-                        delete_schedule(schedule['id'])
-                        st.experimental_rerun()
+        
+        # Cronogramas com horários sobrepostos
+        with profiler.phase("conflicts"):
+            conflicts = get_schedule_conflicts()
+            if conflicts:
+                with st.expander(f"⚠️ Conflitos de horário ({len(conflicts)})"):
+                    for conflict in conflicts:
+                        titles = " e ".join(s["title"] for s in conflict["schedules"])
+                        st.warning(f"{conflict['day']}, {conflict['start_time']} até {conflict['end_time']}: {titles}")
+        
+        with profiler.phase("free_slots"):
+            render_free_slots()
+        
+        # Lista de cronogramas (ou o resultado da busca)
+        search = st.text_input("🔎 Buscar cronogramas", key="schedule_search").strip()
+        with profiler.phase("get_schedules"):
+            schedules = search_schedules(search) if search else get_schedules()
+        if search and not schedules:
+            st.info("Nenhum cronograma encontrado.")
+        # Sem busca, a lista é ordenada e agrupada pelo primeiro dia da semana; só a janela visível é renderizada
+        if not search:
+            schedules = sorted(schedules, key=lambda s: (
+                WEEK_DAYS.index(first_day(s)) if s["days"] else len(WEEK_DAYS), s["start_time"], s["id"]
+            ))
+        visible, start = list_window(schedules, "schedule_window")
+        if visible and render_schedule_bulk_actions(visible):
+            st.session_state.pop("schedule_bulk_selection", None)
+            st.experimental_rerun()
+        with profiler.phase("render_schedules"):
+            for day, group in itertools.groupby(visible, key=lambda s: None if search else first_day(s)):
+                if day:
+                    st.markdown(f"**📅 {day}**")
+                for schedule in group:
+                    render_schedule_item(schedule)
+        render_window_nav("schedule_window", start, len(schedules))
+    
+    # Página de Análises
+    elif page == "Análises":
+        st.header("Análises")
+        with profiler.phase("analytics"):
+            render_analytics(user_data)
+    
+    # Página de Desempenho (administradores)
+    else:
+        st.header("Desempenho")
+        render_query_stats()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,26 @@
+import argparse
+import json
+from typing import List, Optional
+import calendar_io
+import database
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Manutenção do banco de dados do Calendário Estudantil")
+    parser.add_argument("--db", help="Arquivo SQLite (padrão: banco da aplicação)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Registros órfãos removidos por transação")
+    parser.add_argument("--full-vacuum", action="store_true",
+                        help="Executa VACUUM completo (bloqueia o banco durante a execução)")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_PATH = args.db
+    database.init_db()
+
+    result = database.run_maintenance(batch_size=args.batch_size, full_vacuum=args.full_vacuum)
+    database.close_pool()
+    # Exportações da interface abandonadas por sessões encerradas
+    result["stale_exports_removed"] = calendar_io.purge_stale_exports()
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,27 @@
+import argparse
+import json
+from typing import List, Optional
+import database
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Migrações de esquema do banco do Calendário Estudantil")
+    parser.add_argument("--db", help="Arquivo SQLite (padrão: banco da aplicação)")
+    parser.add_argument("--dry-run", action="store_true", help="Apenas lista as migrações pendentes")
+    parser.add_argument("--target", type=int, help="Versão máxima a aplicar (padrão: a mais recente)")
+    parser.add_argument("--batch-size", type=int, default=database.MIGRATION_BATCH_SIZE,
+                        help="Linhas processadas por transação nos backfills")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_PATH = args.db
+
+    result = {
+        "from_version": database.get_schema_version(),
+        "migrations": database.migrate(target=args.target, dry_run=args.dry_run, batch_size=args.batch_size)
+    }
+    result["to_version"] = database.get_schema_version()
+    database.close_pool()
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import cProfile
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Perfil de cada execução do script do Streamlit (também ativado por ?profile=1 na URL)
+PROFILE_RERUNS = os.getenv("PROFILE_RERUNS", "0") == "1"
+# Diretório dos perfis, com um subdiretório por sessão
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "profiles"))
+
+_NO_PHASE = nullcontext()
+
+class RerunProfiler:
+    """Tempo de cada fase de uma execução da página e, opcionalmente, o perfil cProfile completo.
+
+    Desligado, phase() devolve sempre o mesmo contexto vazio."""
+
+    def __init__(self, enabled: bool, session_id: str = "", run: int = 0, with_cprofile: bool = True):
+        self.enabled = enabled
+        self.session_id = session_id
+        self.run = run
+        self.phases: List[Tuple[str, float]] = []
+        self._stack: List[str] = []
+        self._profile: Optional[cProfile.Profile] = None
+        self._with_cprofile = with_cprofile
+        self._start = 0.0
+        self.total_ms = 0.0
+
+    def start(self):
+        if not self.enabled:
+            return
+        if self._with_cprofile:
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError:
+                # Outro perfilador ativo no processo (Python 3.12+): mede só as fases
+                self._profile = None
+        self._start = time.perf_counter()
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.total_ms = (time.perf_counter() - self._start) * 1000
+        if self._profile is not None:
+            self._profile.disable()
+
+    @contextmanager
+    def _phase(self, name: str):
+        self._stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Fases aninhadas recebem o caminho completo, ex.: "tarefas/lista"
+            self.phases.append(("/".join(self._stack), (time.perf_counter() - start) * 1000))
+            self._stack.pop()
+
+    def phase(self, name: str):
+        """Context manager que mede uma fase da execução."""
+        return self._phase(name) if self.enabled else _NO_PHASE
+
+    def summary(self) -> Dict:
+        return {
+            "run": self.run,
+            "at": datetime.now().isoformat(timespec="milliseconds"),
+            "total_ms": self.total_ms,
+            "phases": [{"phase": name, "ms": ms} for name, ms in self.phases]
+        }
+
+    def dump(self, directory: str) -> Optional[str]:
+        """Grava as fases em <diretório>/<sessão>/phases.jsonl e o perfil cProfile em <execução>.prof.
+
+        O .prof (formato pstats) pode ser aberto com `python -m pstats`, snakeviz ou flameprof
+        (gráfico de chamas). Retorna o caminho do .prof, se houver."""
+        if not self.enabled:
+            return None
+        session_dir = os.path.join(directory, self.session_id)
+        os.makedirs(session_dir, exist_ok=True)
+        with open(os.path.join(session_dir, "phases.jsonl"), "a", encoding="utf-8") as phases_file:
+            phases_file.write(json.dumps(self.summary(), ensure_ascii=False) + "\n")
+        if self._profile is None:
+            return None
+        path = os.path.join(session_dir, f"{self.run:05d}.prof")
+        self._profile.dump_stats(path)
+        return path
@@ -0,0 +1,230 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, TypeVar
+
+# Medição das instruções SQL e das funções da camada de dados (desativada por padrão)
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS", "0") == "1"
+# Instruções acima deste tempo (em milissegundos) vão para o log de consultas lentas
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Arquivo opcional do log de consultas lentas (uma linha JSON por consulta)
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "")
+# Consultas lentas mantidas em memória para o painel de administração
+SLOW_QUERY_HISTORY = int(os.getenv("SLOW_QUERY_HISTORY", "100"))
+
+slow_query_logger = logging.getLogger("query_stats.slow")
+if SLOW_QUERY_LOG:
+    slow_query_logger.addHandler(logging.FileHandler(SLOW_QUERY_LOG, encoding="utf-8"))
+
+F = TypeVar("F", bound=Callable)
+
+# Função pública em execução na thread atual: [nome, linhas lidas ou alteradas pelas suas instruções]
+_current_call: contextvars.ContextVar = contextvars.ContextVar("query_stats_call", default=None)
+
+def normalize_sql(sql: str) -> str:
+    """Instrução em uma linha, com espaços consecutivos reduzidos, usada como chave das estatísticas."""
+    return re.sub(r"\s+", " ", sql).strip()
+
+class QueryStats:
+    """Contagem, tempo total/máximo e linhas por instrução SQL e por função pública."""
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, history: int = SLOW_QUERY_HISTORY):
+        self.slow_ms = slow_ms
+        self._statements: Dict[str, List] = {}
+        self._functions: Dict[str, List] = {}
+        self._slow: deque = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _add(table: Dict[str, List], key: str, seconds: float, rows: int):
+        entry = table.get(key)
+        if entry is None:
+            table[key] = [1, seconds, seconds, rows]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3] += rows
+
+    def record_statement(self, sql: str, seconds: float, rows: int):
+        call = _current_call.get()
+        if call is not None:
+            call[1] += rows
+        sql = normalize_sql(sql)
+        with self._lock:
+            self._add(self._statements, sql, seconds, rows)
+        if seconds * 1000 >= self.slow_ms:
+            entry = {
+                "at": datetime.now().isoformat(timespec="milliseconds"),
+                "function": call[0] if call is not None else None,
+                "sql": sql,
+                "ms": round(seconds * 1000, 3),
+                "rows": rows
+            }
+            with self._lock:
+                self._slow.append(entry)
+            slow_query_logger.warning(json.dumps(entry, ensure_ascii=False))
+
+    def record_call(self, name: str, seconds: float, rows: int):
+        with self._lock:
+            self._add(self._functions, name, seconds, rows)
+
+    @staticmethod
+    def _summary(table: Dict[str, List], key: str) -> List[Dict]:
+        rows = [
+            {key: name, "count": count, "total_ms": total * 1000, "mean_ms": total / count * 1000,
+             "max_ms": longest * 1000, "rows": rows}
+            for name, (count, total, longest, rows) in table.items()
+        ]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def snapshot(self) -> Dict:
+        """Estatísticas atuais, em ordem decrescente de tempo total, e as consultas lentas mais recentes."""
+        with self._lock:
+            return {
+                "statements": self._summary(self._statements, "sql"),
+                "functions": self._summary(self._functions, "function"),
+                "slow_queries": list(self._slow)
+            }
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._functions.clear()
+            self._slow.clear()
+
+query_stats = QueryStats()
+_enabled = QUERY_STATS_ENABLED
+
+def is_enabled() -> bool:
+    return _enabled
+
+def set_enabled(enabled: bool):
+    """Liga ou desliga a medição. Só as conexões abertas depois disso passam a ser medidas."""
+    global _enabled
+    _enabled = enabled
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que mede cada instrução, da execução até a última linha lida."""
+
+    _sql: Optional[str] = None
+    _seconds = 0.0
+    _rows = 0
+
+    def _finish(self):
+        if self._sql is not None:
+            # Escritas não retornam linhas: conta as linhas alteradas
+            rows = self._rows if self.description is not None else max(self.rowcount, 0)
+            query_stats.record_statement(self._sql, self._seconds, rows)
+            self._sql = None
+
+    def _run(self, method, sql: str, *args):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return method(sql, *args)
+        finally:
+            self._sql, self._seconds, self._rows = sql, time.perf_counter() - start, 0
+
+    def execute(self, sql: str, parameters=()):
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters):
+        return self._run(super().executemany, sql, seq_of_parameters)
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        self._seconds += time.perf_counter() - start
+        return result
+
+    def fetchone(self):
+        row = self._fetch(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size: int = 1):
+        rows = self._fetch(super().fetchmany, size)
+        self._rows += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._fetch(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            # Cursores coletados no encerramento do interpretador
+            pass
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os de execute/executemany) são InstrumentedCursor."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def connection_factory() -> type:
+    """Classe de conexão para sqlite3.connect: instrumentada apenas com a medição ligada."""
+    return InstrumentedConnection if _enabled else sqlite3.Connection
+
+def timed(func: F) -> F:
+    """Mede as chamadas de uma função pública da camada de dados.
+
+    Desligada, a medição custa apenas a verificação de uma variável. Em chamadas aninhadas,
+    o tempo e as linhas da função interna também contam para a externa."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        call = [name, 0]
+        context_token = _current_call.set(call)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_call.reset(context_token)
+            parent = _current_call.get()
+            if parent is not None:
+                parent[1] += call[1]
+            query_stats.record_call(name, elapsed, call[1])
+
+    return wrapper
@@ -0,0 +1,222 @@
+import bisect
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+def time_to_minutes(value: str) -> int:
+    """Converte um horário "HH:MM" em minutos desde a meia-noite."""
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def minutes_to_time(value: int) -> str:
+    return f"{value // 60:02d}:{value % 60:02d}"
+
+class _DayIntervals:
+    """Intervalos de um dia da semana ordenados pelo início.
+
+    Sem sobreposições (o caso normal, garantido pela verificação de conflitos), os términos também
+    ficam em ordem e a busca custa O(log n + k), para k intervalos encontrados. Em um dia com
+    cronogramas sobrepostos (salvos com allow_conflicts ou anteriores à verificação), a busca percorre
+    todos os intervalos que começam antes do término pedido, em O(n). Inserir e remover custam O(n)
+    pelo deslocamento da lista."""
+
+    def __init__(self):
+        self.items: List[Tuple[int, int, int]] = []  # (início, término, id)
+        # Pares de intervalos vizinhos que se sobrepõem; zero quando o dia não tem sobreposições
+        self.overlaps = 0
+
+    def _overlap(self, position: int) -> int:
+        """1 se o intervalo em `position` se sobrepõe ao seguinte, senão 0."""
+        items = self.items
+        return int(0 <= position < len(items) - 1 and items[position][1] > items[position + 1][0])
+
+    def add(self, start: int, end: int, schedule_id: int):
+        position = bisect.bisect_left(self.items, (start, end, schedule_id))
+        self.overlaps -= self._overlap(position - 1)
+        self.items.insert(position, (start, end, schedule_id))
+        self.overlaps += self._overlap(position - 1) + self._overlap(position)
+
+    def remove(self, start: int, end: int, schedule_id: int):
+        position = bisect.bisect_left(self.items, (start, end, schedule_id))
+        if position < len(self.items) and self.items[position] == (start, end, schedule_id):
+            self.overlaps -= self._overlap(position - 1) + self._overlap(position)
+            del self.items[position]
+            self.overlaps += self._overlap(position - 1)
+
+    def overlapping(self, start: int, end: int) -> List[int]:
+        """Ids dos intervalos que se sobrepõem a [start, end); encostar no limite não é conflito."""
+        # Candidatos: intervalos que começam antes do término pedido
+        position = bisect.bisect_left(self.items, (end,))
+        if self.overlaps:
+            return [item[2] for item in reversed(self.items[:position]) if item[1] > start]
+        # Sem sobreposições, o primeiro intervalo (de trás para frente) que termina até `start` encerra a busca
+        found = []
+        while position > 0 and self.items[position - 1][1] > start:
+            position -= 1
+            found.append(self.items[position][2])
+        return found
+
+    def copy(self) -> "_DayIntervals":
+        clone = _DayIntervals()
+        clone.items = list(self.items)
+        clone.overlaps = self.overlaps
+        return clone
+
+class ScheduleIndex:
+    """Índice de intervalos dos cronogramas de um usuário, separado por dia da semana.
+
+    Os dias são os bits da máscara days_mask (bit 0 = Segunda, ..., bit 6 = Domingo)."""
+
+    def __init__(self):
+        self._days = [_DayIntervals() for _ in range(7)]
+        # Dias compartilhados com outra cópia do índice são copiados antes da primeira alteração
+        self._owned = [True] * 7
+        self._entries: Dict[int, Tuple[int, int, int, str]] = {}
+        # Horários livres já calculados; o índice em cache não muda, cada escrita gera uma cópia
+        self._free_slots: Dict[Tuple[int, int, int], List[List[Tuple[int, int]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _writable_day(self, day: int) -> _DayIntervals:
+        if not self._owned[day]:
+            self._days[day] = self._days[day].copy()
+            self._owned[day] = True
+        return self._days[day]
+
+    def add(self, schedule_id: int, start_time: str, end_time: str, days_mask: int, title: str = ""):
+        self.remove(schedule_id)
+        start, end = time_to_minutes(start_time), time_to_minutes(end_time)
+        self._entries[schedule_id] = (start, end, days_mask, title)
+        for day in range(7):
+            if days_mask & (1 << day):
+                self._writable_day(day).add(start, end, schedule_id)
+
+    def remove(self, schedule_id: int):
+        entry = self._entries.pop(schedule_id, None)
+        if entry is None:
+            return
+        start, end, days_mask, _ = entry
+        for day in range(7):
+            if days_mask & (1 << day):
+                self._writable_day(day).remove(start, end, schedule_id)
+
+    def title(self, schedule_id: int) -> str:
+        return self._entries[schedule_id][3]
+
+    def find_conflicts(self, start_time: str, end_time: str, days_mask: int,
+                       exclude_id: Optional[int] = None) -> List[Dict]:
+        """Retorna os cronogramas que se sobrepõem ao horário nos dias da máscara.
+
+        Cada conflito é {"id", "title", "day", "start_time", "end_time"}, com o bit do dia em "day"."""
+        start, end = time_to_minutes(start_time), time_to_minutes(end_time)
+        conflicts = []
+        for day in range(7):
+            if not days_mask & (1 << day):
+                continue
+            for schedule_id in self._days[day].overlapping(start, end):
+                if schedule_id == exclude_id:
+                    continue
+                other_start, other_end, _, title = self._entries[schedule_id]
+                conflicts.append({
+                    "id": schedule_id,
+                    "title": title,
+                    "day": 1 << day,
+                    "start_time": minutes_to_time(other_start),
+                    "end_time": minutes_to_time(other_end)
+                })
+        return conflicts
+
+    def all_conflicts(self) -> List[Dict]:
+        """Lista todos os pares de cronogramas sobrepostos, por dia, em uma varredura ordenada.
+
+        Cada par é {"day", "ids", "start_time", "end_time"}, com o trecho em comum."""
+        pairs = []
+        for day, intervals in enumerate(self._days):
+            active: List[Tuple[int, int]] = []  # (término, id) dos intervalos em andamento
+            for start, end, schedule_id in intervals.items:
+                active = [item for item in active if item[0] > start]
+                for other_end, other_id in active:
+                    pairs.append({
+                        "day": 1 << day,
+                        "ids": sorted((other_id, schedule_id)),
+                        "start_time": minutes_to_time(start),
+                        "end_time": minutes_to_time(min(end, other_end))
+                    })
+                active.append((end, schedule_id))
+        return pairs
+
+    def free_slots(self, day_start: int, day_end: int, min_duration: int) -> List[List[Tuple[int, int]]]:
+        """Intervalos livres (início, término), em minutos, de cada dia entre day_start e day_end.
+
+        Os cronogramas de cada dia são mesclados em uma varredura pela ordem de início; só
+        entram os intervalos com pelo menos min_duration minutos."""
+        key = (day_start, day_end, min_duration)
+        if key in self._free_slots:
+            return self._free_slots[key]
+        result = []
+        for intervals in self._days:
+            free = []
+            cursor = day_start
+            for start, end, _ in intervals.items:
+                if start >= day_end:
+                    break
+                if start > cursor:
+                    free.append((cursor, start))
+                cursor = max(cursor, end)
+            if cursor < day_end:
+                free.append((cursor, day_end))
+            result.append([slot for slot in free if slot[1] - slot[0] >= min_duration])
+        self._free_slots[key] = result
+        return result
+
+    def copy(self) -> "ScheduleIndex":
+        """Cópia independente: o dicionário de entradas é copiado (O(n)); as listas de cada dia são
+        compartilhadas e só são copiadas, por qualquer um dos dois índices, no primeiro dia alterado."""
+        clone = ScheduleIndex()
+        clone._entries = dict(self._entries)
+        clone._days = list(self._days)
+        clone._owned = [False] * 7
+        self._owned = [False] * 7
+        return clone
+
+class ScheduleIndexCache:
+    """Cache LRU dos índices de intervalos por usuário, validado pela versão dos cronogramas."""
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._entries: "OrderedDict[int, Tuple[int, ScheduleIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, user_id: int, version: int) -> Optional[ScheduleIndex]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, user_id: int, version: int, index: ScheduleIndex):
+        with self._lock:
+            self._entries[user_id] = (version, index)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def advance(self, user_id: int, expected_version: int, version: int, index: ScheduleIndex):
+        """Substitui o índice somente se o cache ainda estiver na versão anterior à escrita."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == expected_version:
+                self._entries[user_id] = (version, index)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats, users=len(self._entries))
@@ -1,7 +1,19 @@
 import streamlit as st
 from typing import Dict, List, Optional
 from datetime import datetime, time
-from database import get_user_schedules, create_user_schedule, update_user_schedule, delete_user_schedule
+from database import (
+    DataError, get_user_by_token, get_user_versions, get_user_schedules,
+    create_user_schedule, update_user_schedule, delete_user_schedule, find_schedule_conflicts,
+    find_free_slots, suggest_study_slots, search_user_schedules, FREE_SLOT_MIN_DURATION, FREE_SLOT_DAY_START, FREE_SLOT_DAY_END,
+    STUDY_SLOT_GRANULARITY,
+    bulk_create_user_schedules, bulk_update_user_schedules, bulk_delete_user_schedules
+)
+from data_cache import user_data_cache
+
+def _current_user_id() -> Optional[int]:
+    """Obtém o id do usuário da sessão (validação de token em cache)."""
+    user = get_user_by_token(st.session_state.get('token', ''))
+    return user["id"] if user else None
 
 def get_schedules() -> List[Dict]:
     """Obtém a lista de cronogramas do usuário."""
@@ -9,7 +21,91 @@ def get_schedules() -> List[Dict]:
         st.error("Erro: Token de autenticação não encontrado. Por favor, faça login novamente.")
         return []
     
-    return get_user_schedules(st.session_state.get('token', ''))
+    token = st.session_state.get('token', '')
+    try:
+        user_id = _current_user_id()
+        if user_id is None:
+            return []
+        return user_data_cache.get_or_load(
+            user_id, ("schedules",), lambda: get_user_schedules(token),
+            lambda: get_user_versions(token)["schedules"]
+        )
+    except DataError as e:
+        st.error(str(e))
+        return []
+
+def _invalidate_derived():
+    """Descarta os resultados calculados a partir dos cronogramas (conflitos, horários livres, sugestões, ocupação e buscas)."""
+    user_id = _current_user_id()
+    for kind in ("conflicts", "free_slots", "study_suggestions", "heatmap", "schedule_search"):
+        user_data_cache.invalidate(user_id, kind)
+
+def get_schedule_conflicts() -> List[Dict]:
+    """Obtém os pares de cronogramas do usuário com horários sobrepostos."""
+    token = st.session_state.get('token', '')
+    try:
+        user_id = _current_user_id()
+        if user_id is None:
+            return []
+        return user_data_cache.get_or_load(
+            user_id, ("conflicts",), lambda: find_schedule_conflicts(token),
+            lambda: get_user_versions(token)["schedules"]
+        )
+    except DataError as e:
+        st.error(str(e))
+        return []
+
+def get_free_slots(min_duration: int, day_start: str, day_end: str) -> Dict[str, List[Dict]]:
+    """Obtém os horários livres de cada dia da semana."""
+    token = st.session_state.get('token', '')
+    try:
+        user_id = _current_user_id()
+        if user_id is None:
+            return {}
+        return user_data_cache.get_or_load(
+            user_id, ("free_slots", min_duration, day_start, day_end),
+            lambda: find_free_slots(token, min_duration, day_start, day_end),
+            lambda: get_user_versions(token)["schedules"]
+        )
+    except DataError as e:
+        st.error(str(e))
+        return {}
+
+def get_study_suggestions(min_duration: int, day_start: str, day_end: str) -> List[Dict]:
+    """Sugere horários de estudo para as próximas tarefas.
+
+    O resultado depende do horário atual: fica em cache pela data e pelo horário arredondado para
+    STUDY_SLOT_GRANULARITY minutos, validado pelas versões das tarefas e dos cronogramas."""
+    token = st.session_state.get('token', '')
+    try:
+        user_id = _current_user_id()
+        if user_id is None:
+            return []
+        now = datetime.now()
+        slot = -(-(now.hour * 60 + now.minute) // STUDY_SLOT_GRANULARITY)
+        return user_data_cache.get_or_load(
+            user_id, ("study_suggestions", min_duration, day_start, day_end, now.date().isoformat(), slot),
+            lambda: suggest_study_slots(token, min_duration, day_start, day_end, now=now),
+            lambda: tuple(get_user_versions(token)[kind] for kind in ("tasks", "schedules"))
+        )
+    except DataError as e:
+        st.error(str(e))
+        return []
+
+def search_schedules(text: str) -> List[Dict]:
+    """Busca os cronogramas do usuário pelo título e pela descrição."""
+    token = st.session_state.get('token', '')
+    try:
+        user_id = _current_user_id()
+        if user_id is None:
+            return []
+        return user_data_cache.get_or_load(
+            user_id, ("schedule_search", text), lambda: search_user_schedules(token, text),
+            lambda: get_user_versions(token)["schedules"]
+        )
+    except DataError as e:
+        st.error(str(e))
+        return []
 
 def create_schedule(schedule_data: Dict) -> Optional[Dict]:
     """Cria um novo cronograma."""
@@ -17,7 +113,15 @@ def create_schedule(schedule_data: Dict) -> Optional[Dict]:
         st.error("Erro: Token de autenticação não encontrado. Por favor, faça login novamente.")
         return None
     
-    return create_user_schedule(st.session_state.get('token', ''), schedule_data)
+    try:
+        schedule = create_user_schedule(st.session_state.get('token', ''), schedule_data)
+    except DataError as e:
+        st.error(str(e))
+        return None
+    # A lista em cache é ordenada por id: o novo cronograma vai para o final
+    user_data_cache.patch(_current_user_id(), ("schedules",), lambda schedules: schedules + [schedule])
+    _invalidate_derived()
+    return schedule
 
 def update_schedule(schedule_id: int, schedule_data: Dict) -> Optional[Dict]:
     """Atualiza um cronograma existente."""
@@ -25,7 +129,17 @@ def update_schedule(schedule_id: int, schedule_data: Dict) -> Optional[Dict]:
         st.error("Erro: Token de autenticação não encontrado. Por favor, faça login novamente.")
         return None
     
-    return update_user_schedule(st.session_state.get('token', ''), schedule_id, schedule_data)
+    try:
+        schedule = update_user_schedule(st.session_state.get('token', ''), schedule_id, schedule_data)
+    except DataError as e:
+        st.error(str(e))
+        return None
+    user_data_cache.patch(
+        _current_user_id(), ("schedules",),
+        lambda schedules: [schedule if s["id"] == schedule_id else s for s in schedules]
+    )
+    _invalidate_derived()
+    return schedule
 
 def delete_schedule(schedule_id: int) -> bool:
     """Remove um cronograma."""
@@ -33,7 +147,97 @@ def delete_schedule(schedule_id: int) -> bool:
         st.error("Erro: Token de autenticação não encontrado. Por favor, faça login novamente.")
         return False
     
-    return delete_user_schedule(st.session_state.get('token', ''), schedule_id)
+    try:
+        delete_user_schedule(st.session_state.get('token', ''), schedule_id)
+    except DataError as e:
+        st.error(str(e))
+        return False
+    user_data_cache.patch(
+        _current_user_id(), ("schedules",),
+        lambda schedules: [s for s in schedules if s["id"] != schedule_id]
+    )
+    _invalidate_derived()
+    return True
+
+def _run_bulk(operation, items: List) -> List[Dict]:
+    """Executa uma operação em lote e descarta a lista de cronogramas e os dados derivados em cache."""
+    if not st.session_state.get('token'):
+        st.error("Erro: Token de autenticação não encontrado. Por favor, faça login novamente.")
+        return []
+    
+    try:
+        results = operation(st.session_state.get('token', ''), items)
+    except DataError as e:
+        st.error(str(e))
+        return []
+    if any(r["ok"] for r in results):
+        user_data_cache.invalidate(_current_user_id(), "schedules")
+        _invalidate_derived()
+    return results
+
+def bulk_create_schedules(schedules_data: List[Dict]) -> List[Dict]:
+    """Cria vários cronogramas; retorna o resultado de cada item."""
+    return _run_bulk(bulk_create_user_schedules, schedules_data)
+
+def bulk_update_schedules(schedules_data: List[Dict]) -> List[Dict]:
+    """Atualiza vários cronogramas (cada um com "id"); retorna o resultado de cada item."""
+    return _run_bulk(bulk_update_user_schedules, schedules_data)
+
+def bulk_delete_schedules(schedule_ids: List[int]) -> List[Dict]:
+    """Remove vários cronogramas; retorna o resultado de cada item."""
+    return _run_bulk(bulk_delete_user_schedules, schedule_ids)
+
+def render_schedule_bulk_actions(schedules: List[Dict]) -> bool:
+    """Renderiza as ações em lote sobre os cronogramas selecionados; retorna True se algo mudou."""
+    # O número do cronograma distingue rótulos repetidos
+    labels = {f"{s['title']} - {s['start_time']} (#{s['id']})": s["id"] for s in schedules}
+    with st.expander("☑️ Ações em lote"):
+        selected = [labels[label] for label in st.multiselect(
+            "Cronogramas selecionados", options=list(labels), key="schedule_bulk_selection"
+        ) if label in labels]
+        if st.button("🗑️ Excluir selecionados", key="schedule_bulk_delete", disabled=not selected):
+            results = bulk_delete_schedules(selected)
+            done = sum(1 for r in results if r["ok"])
+            if done:
+                st.success(f"{done} cronograma(s) excluído(s) com sucesso!")
+            for r in results:
+                if not r["ok"]:
+                    st.warning(f"Item {r['index'] + 1}: {r['error']}")
+            return done > 0
+    return False
+
+def render_free_slots():
+    """Renderiza o painel de horários livres e as sugestões de estudo para as próximas tarefas."""
+    with st.expander("🕒 Horários livres"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            min_duration = int(st.number_input("Duração mínima (min)", min_value=5, max_value=600,
+                                               value=FREE_SLOT_MIN_DURATION, step=5, key="free_min_duration"))
+        with col2:
+            day_start = st.time_input("Início do dia", value=datetime.strptime(FREE_SLOT_DAY_START, "%H:%M").time(),
+                                      key="free_day_start")
+        with col3:
+            day_end = st.time_input("Fim do dia", value=datetime.strptime(FREE_SLOT_DAY_END, "%H:%M").time(),
+                                    key="free_day_end")
+        if day_start >= day_end:
+            st.warning("O início do dia deve ser anterior ao fim.")
+            return
+        day_start, day_end = day_start.strftime("%H:%M"), day_end.strftime("%H:%M")
+        
+        for day, slots in get_free_slots(min_duration, day_start, day_end).items():
+            described = ", ".join(f"{slot['start_time']}-{slot['end_time']}" for slot in slots)
+            st.write(f"**{day}:** {described or 'sem horários livres'}")
+        
+        suggestions = get_study_suggestions(min_duration, day_start, day_end)
+        if suggestions:
+            st.write("**Sugestões para as próximas tarefas**")
+        for suggestion in suggestions:
+            task = suggestion["task"]
+            if suggestion["date"]:
+                st.write(f"{task['title']} ({task['priority']}, entrega {task['due_date']}): "
+                         f"{suggestion['day']} {suggestion['date']}, {suggestion['start_time']} até {suggestion['end_time']}")
+            else:
+                st.write(f"{task['title']} ({task['priority']}, entrega {task['due_date']}): sem horário livre até a entrega")
 
 def render_schedule_form(existing_data: Optional[Dict] = None) -> Dict:
     """Renderiza o formulário para criar/editar cronograma."""
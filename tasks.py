@@ -1,7 +1,78 @@
 import streamlit as st
 from typing import Dict, List, Optional
 from datetime import datetime, date
-from database import get_user_tasks, create_user_task, update_user_task, delete_user_task
+from database import (
+    DataError, TASK_PRIORITIES, TASK_PAGE_SIZE, PRIORITY_RANKS, get_user_by_token, get_user_versions, get_user_tasks, get_user_task, query_user_tasks, search_user_tasks,
+    create_user_task, update_user_task, delete_user_task,
+    bulk_create_user_tasks, bulk_update_user_tasks, bulk_delete_user_tasks
+)
+from data_cache import user_data_cache
+
+def _current_user_id() -> Optional[int]:
+    """Obtém o id do usuário da sessão (validação de token em cache)."""
+    user = get_user_by_token(st.session_state.get('token', ''))
+    return user["id"] if user else None
+
+def _filters_key(filters: Dict) -> tuple:
+    return tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in filters.items()
+    ))
+
+def _task_sort_key(task: Dict, order_by: str) -> list:
+    """Chave de ordenação da tarefa, no formato do `next_cursor` de query_user_tasks."""
+    key = [task["due_date"], task["id"]]
+    return [PRIORITY_RANKS.get(task["priority"], 2)] + key if order_by == "priority" else key
+
+def _task_matches(task: Dict, filters: Dict) -> bool:
+    """Verifica se a tarefa atende aos filtros de query_user_tasks."""
+    due_date = task["due_date"]
+    return not (
+        (filters.get("due_from") and due_date < filters["due_from"])
+        or (filters.get("due_to") and due_date > filters["due_to"])
+        or (filters.get("priorities") and task["priority"] not in filters["priorities"])
+        or (filters.get("overdue") and due_date >= date.today().isoformat())
+    )
+
+def _patch_task_page(page: Dict, filters: Dict, task_id: int, task: Optional[Dict]) -> Dict:
+    """Remove a tarefa `task_id` da página e insere `task` na sua posição, se ela pertencer à página."""
+    order_by = filters.get("order_by", "due_date")
+    tasks = [t for t in page["tasks"] if t["id"] != task_id]
+    next_cursor = page["next_cursor"]
+    if task is not None and _task_matches(task, filters):
+        if not filters.get("with_description", True):
+            task = {name: value for name, value in task.items() if name != "description"}
+        key = _task_sort_key(task, order_by)
+        after = filters.get("after")
+        # A página cobre as chaves após o cursor anterior até o próprio next_cursor (a última, até o fim)
+        if (not after or key > list(after)) and (next_cursor is None or key <= next_cursor):
+            tasks = sorted(tasks + [task], key=lambda t: _task_sort_key(t, order_by))
+            # A tarefa excedente passa para a próxima página, que é buscada pelo novo cursor
+            if len(tasks) > filters.get("limit", TASK_PAGE_SIZE):
+                tasks.pop()
+                next_cursor = _task_sort_key(tasks[-1], order_by)
+    return {"tasks": tasks, "next_cursor": next_cursor}
+
+def _patch_task_entry(key: tuple, value, task_id: int, task: Optional[Dict]):
+    """Aplica a escrita de uma tarefa (`task` None na exclusão) a uma entrada em cache; None a descarta."""
+    if key == ("tasks",):
+        tasks = [t for t in value if t["id"] != task_id]
+        return sorted(tasks + [task], key=lambda t: (t["due_date"], t["id"])) if task else tasks
+    if key[1] == "page":
+        return _patch_task_page(value, dict(key[2]), task_id, task)
+    if key[1] == "task":
+        return value if key[2] != task_id else task
+    if key[1] == "search" and task is None:
+        return [t for t in value if t["id"] != task_id]
+    # Buscas após criação ou edição e a carga por semana são recalculadas no banco
+    return None
+
+def _patch_tasks(task_id: int, task: Optional[Dict]):
+    """Atualiza as listas e páginas de tarefas em cache com a linha retornada pela escrita."""
+    user_id = _current_user_id()
+    user_data_cache.update_kind(user_id, "tasks", lambda key, value: _patch_task_entry(key, value, task_id, task))
+    # As sugestões de estudo dependem das próximas tarefas
+    user_data_cache.invalidate(user_id, "study_suggestions")
 
 def get_tasks() -> List[Dict]:
     """Obtém a lista de tarefas do usuário."""
@@ -9,7 +80,68 @@ def get_tasks() -> List[Dict]:
         st.error("Erro: Token de autenticação não encontrado. Por favor, faça login novamente.")
         return []
     
-    return get_user_tasks(st.session_state.get('token', ''))
+    token = st.session_state.get('token', '')
+    try:
+        user_id = _current_user_id()
+        if user_id is None:
+            return []
+        return user_data_cache.get_or_load(
+            user_id, ("tasks",), lambda: get_user_tasks(token),
+            lambda: get_user_versions(token)["tasks"]
+        )
+    except DataError as e:
+        st.error(str(e))
+        return []
+
+def get_task(task_id: int) -> Optional[Dict]:
+    """Obtém uma tarefa do usuário com a descrição, carregada só quando a tarefa é aberta."""
+    token = st.session_state.get('token', '')
+    try:
+        user_id = _current_user_id()
+        if user_id is None:
+            return None
+        return user_data_cache.get_or_load(
+            user_id, ("tasks", "task", task_id), lambda: get_user_task(token, task_id),
+            lambda: get_user_versions(token)["tasks"]
+        )
+    except DataError as e:
+        st.error(str(e))
+        return None
+
+def query_tasks(**filters) -> Dict:
+    """Obtém uma página de tarefas do usuário, com filtros e ordenação."""
+    if not st.session_state.get('token'):
+        st.error("Erro: Token de autenticação não encontrado. Por favor, faça login novamente.")
+        return {"tasks": [], "next_cursor": None}
+    
+    token = st.session_state.get('token', '')
+    try:
+        user_id = _current_user_id()
+        if user_id is None:
+            return {"tasks": [], "next_cursor": None}
+        return user_data_cache.get_or_load(
+            user_id, ("tasks", "page", _filters_key(filters)),
+            lambda: query_user_tasks(token, **filters),
+            lambda: get_user_versions(token)["tasks"]
+        )
+    except DataError as e:
+        st.error(str(e))
+        return {"tasks": [], "next_cursor": None}
+
+def search_tasks(text: str) -> List[Dict]:
+    """Busca as tarefas do usuário pelo título e pela descrição."""
+    token = st.session_state.get('token', '')
+    try:
+        user_id = _current_user_id()
+        if user_id is None:
+            return []
+        return user_data_cache.get_or_load(
+            user_id, ("tasks", "search", text), lambda: search_user_tasks(token, text),
+            lambda: get_user_versions(token)["tasks"]
+        )
+    except DataError as e:
+        st.error(str(e))
+        return []
 
 def create_task(task_data: Dict) -> Optional[Dict]:
     """Cria uma nova tarefa."""
@@ -17,7 +149,14 @@ def create_task(task_data: Dict) -> Optional[Dict]:
         st.error("Erro: Token de autenticação não encontrado. Por favor, faça login novamente.")
         return None
     
-    return create_user_task(st.session_state.get('token', ''), task_data)
+    try:
+        task = create_user_task(st.session_state.get('token', ''), task_data)
+    except DataError as e:
+        st.error(str(e))
+        return None
+    if task:
+        _patch_tasks(task["id"], task)
+    return task
 
 def update_task(task_id: int, task_data: Dict) -> Optional[Dict]:
     """Atualiza uma tarefa existente."""
@@ -25,7 +164,13 @@ def update_task(task_id: int, task_data: Dict) -> Optional[Dict]:
         st.error("Erro: Token de autenticação não encontrado. Por favor, faça login novamente.")
         return None
     
-    return update_user_task(st.session_state.get('token', ''), task_id, task_data)
+    try:
+        task = update_user_task(st.session_state.get('token', ''), task_id, task_data)
+    except DataError as e:
+        st.error(str(e))
+        return None
+    _patch_tasks(task_id, task)
+    return task
 
 def delete_task(task_id: int) -> bool:
     """Remove uma tarefa."""
@@ -33,7 +178,50 @@ def delete_task(task_id: int) -> bool:
         st.error("Erro: Token de autenticação não encontrado. Por favor, faça login novamente.")
         return False
     
-    return delete_user_task(st.session_state.get('token', ''), task_id)
+    try:
+        delete_user_task(st.session_state.get('token', ''), task_id)
+    except DataError as e:
+        st.error(str(e))
+        return False
+    _patch_tasks(task_id, None)
+    return True
+
+def _run_bulk(operation, items: List) -> List[Dict]:
+    """Executa uma operação em lote e invalida as listas de tarefas em cache."""
+    if not st.session_state.get('token'):
+        st.error("Erro: Token de autenticação não encontrado. Por favor, faça login novamente.")
+        return []
+    
+    try:
+        results = operation(st.session_state.get('token', ''), items)
+    except DataError as e:
+        st.error(str(e))
+        return []
+    if any(r["ok"] for r in results):
+        user_data_cache.invalidate(_current_user_id(), "tasks")
+        user_data_cache.invalidate(_current_user_id(), "study_suggestions")
+    return results
+
+def bulk_create_tasks(tasks_data: List[Dict]) -> List[Dict]:
+    """Cria várias tarefas; retorna o resultado de cada item."""
+    return _run_bulk(bulk_create_user_tasks, tasks_data)
+
+def bulk_update_tasks(tasks_data: List[Dict]) -> List[Dict]:
+    """Atualiza várias tarefas (cada uma com "id"); retorna o resultado de cada item."""
+    return _run_bulk(bulk_update_user_tasks, tasks_data)
+
+def bulk_delete_tasks(task_ids: List[int]) -> List[Dict]:
+    """Remove várias tarefas; retorna o resultado de cada item."""
+    return _run_bulk(bulk_delete_user_tasks, task_ids)
+
+def report_bulk_results(results: List[Dict], action: str):
+    """Exibe o total de itens processados e o erro de cada item rejeitado."""
+    done = sum(1 for r in results if r["ok"])
+    if done:
+        st.success(f"{done} tarefa(s) {action} com sucesso!")
+    for r in results:
+        if not r["ok"]:
+            st.warning(f"Item {r['index'] + 1}: {r['error']}")
 
 def render_task_form(existing_data: Optional[Dict] = None) -> Dict:
     """Renderiza o formulário para criar/editar tarefa."""
@@ -63,6 +251,50 @@ def render_task_form(existing_data: Optional[Dict] = None) -> Dict:
             }
     return None
 
+def render_task_filters() -> Dict:
+    """Renderiza os filtros e a ordenação da lista de tarefas."""
+    with st.expander("🔎 Filtros"):
+        col1, col2 = st.columns(2)
+        with col1:
+            due_range = st.date_input("Período de entrega", value=(), key="task_due_range")
+            priorities = st.multiselect("Prioridade", options=["Baixa", "Média", "Alta"], key="task_priorities")
+        with col2:
+            order_by = st.radio("Ordenar por", options=["Data de entrega", "Prioridade"], key="task_order_by")
+            overdue = st.checkbox("Somente atrasadas", key="task_overdue")
+    
+    # Durante a seleção do período o widget pode devolver apenas a data inicial
+    due_range = tuple(due_range) if isinstance(due_range, (list, tuple)) else (due_range,)
+    return {
+        "due_from": due_range[0].isoformat() if len(due_range) > 0 else None,
+        "due_to": due_range[1].isoformat() if len(due_range) > 1 else None,
+        "priorities": priorities,
+        "overdue": overdue,
+        "order_by": "priority" if order_by == "Prioridade" else "due_date"
+    }
+
+def render_task_bulk_actions(tasks: List[Dict]) -> bool:
+    """Renderiza as ações em lote sobre as tarefas selecionadas; retorna True se algo mudou."""
+    by_id = {task["id"]: task for task in tasks}
+    # O número da tarefa distingue rótulos repetidos
+    labels = {f"{task['title']} - {task['due_date']} (#{task['id']})": task["id"] for task in tasks}
+    with st.expander("☑️ Ações em lote"):
+        selected = [labels[label] for label in st.multiselect(
+            "Tarefas selecionadas", options=list(labels), key="task_bulk_selection"
+        ) if label in labels]
+        col1, col2 = st.columns(2)
+        with col1:
+            priority = st.selectbox("Nova prioridade", options=list(TASK_PRIORITIES), key="task_bulk_priority")
+            if st.button("Alterar prioridade", key="task_bulk_update", disabled=not selected):
+                results = bulk_update_tasks([dict(by_id[task_id], priority=priority) for task_id in selected])
+                report_bulk_results(results, "atualizada(s)")
+                return any(r["ok"] for r in results)
+        with col2:
+            if st.button("🗑️ Excluir selecionadas", key="task_bulk_delete", disabled=not selected):
+                results = bulk_delete_tasks(selected)
+                report_bulk_results(results, "excluída(s)")
+                return any(r["ok"] for r in results)
+    return False
+
 def render_task_list():
     """Renderiza a lista de tarefas com opções de edição e exclusão."""
     tasks = get_tasks()
@@ -78,7 +310,5 @@ def render_task_list():
                     st.session_state["editing_task"] = task['id']
                     st.session_state["task_data"] = task
             with col2:
-                if st.button("🗑️ Excluir", key=f"delete_{task['id']}"):
-                    if delete_task(task['id']):
-                        st.success("Tarefa excluída com sucesso!")
-                        st.experimental_rerun()
\ No newline at end of file
+                # A exclusão roda antes da próxima execução, que já mostra a lista sem a tarefa
+                st.button("🗑️ Excluir", key=f"delete_{task['id']}", on_click=delete_task, args=(task['id'],))
\ No newline at end of file
@@ -1,14 +1,46 @@
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
 import unittest
+from datetime import datetime
+from unittest import mock
 import streamlit as st
+import database
+import benchmark
+import calendar_io
+import analytics
+import query_stats
+from profiling import RerunProfiler
+from schedule_index import ScheduleIndex, minutes_to_time
+from data_cache import UserDataCache, user_data_cache
 from main import *
 from auth import *
 from tasks import *
 from schedules import *
 
+# Tempo máximo (em segundos) para importar a camada de dados
+IMPORT_TIME_BUDGET = 0.25
+
 class TestCalendarioEstudantil(unittest.TestCase):
     def setUp(self):
         """Configuração inicial para os testes"""
-        pass
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.original_db_path = database.DB_PATH
+        database.DB_PATH = os.path.join(self.tmpdir.name, "test.db")
+        database.init_db()
+
+    def tearDown(self):
+        user_data_cache.clear()
+        database.close_pool()
+        database.DB_PATH = self.original_db_path
+        self.tmpdir.cleanup()
 
     def test_autenticacao(self):
         """Teste das funcionalidades de autenticação"""
@@ -25,5 +57,985 @@ class TestCalendarioEstudantil(unittest.TestCase):
         # Implementar testes de cronogramas
         pass
 
+    def test_camada_de_dados_independente_da_interface(self):
+        """Teste que importar a camada de dados é rápido, não importa o Streamlit nem cria o banco"""
+        db_path = os.path.join(self.tmpdir.name, "import.db")
+        code = ("import sys, time; start = time.perf_counter(); import database; "
+                "print(time.perf_counter() - start, 'streamlit' in sys.modules)")
+        output = subprocess.run(
+            [sys.executable, "-c", code], env=dict(os.environ, DB_PATH=db_path),
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        ).stdout.split()
+
+        self.assertLess(float(output[0]), IMPORT_TIME_BUDGET)
+        self.assertEqual(output[1], "False")
+        self.assertFalse(os.path.exists(db_path))
+
+    def test_inicializacao_idempotente(self):
+        """Teste que init_db em um banco atualizado apenas lê PRAGMA user_version"""
+        pool = database.configure_pool(size=1)
+        statements = []
+        conn = pool.acquire()
+        conn.set_trace_callback(statements.append)
+        pool.release(conn)
+
+        database.init_db()
+        self.assertEqual(statements, ["PRAGMA user_version"])
+        with database.get_connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], database.SCHEMA_VERSION)
+
+        with self.assertRaises(database.InvalidTokenError):
+            database.get_user_tasks("token-inexistente")
+        database.register_user("ana", None, "senha")
+        with self.assertRaises(database.UserAlreadyExistsError):
+            database.register_user("ana", None, "outra")
+        with self.assertRaises(database.InvalidCredentialsError):
+            database.login_user("ana", "errada")
+
+    def test_migracoes_versionadas(self):
+        """Teste do dry-run, da aplicação em lotes e do registro das migrações"""
+        database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        for day in range(1, 6):
+            database.create_user_task(token, {
+                "title": f"Prova {day}", "description": "", "due_date": f"2024-05-{day:02d}", "priority": "Alta"
+            })
+
+        def backfill(conn, batch_size):
+            return conn.execute(
+                "UPDATE tasks SET title_length = LENGTH(title) WHERE id IN "
+                "(SELECT id FROM tasks WHERE title_length IS NULL LIMIT ?)", (batch_size,)
+            ).rowcount
+
+        version = database.SCHEMA_VERSION + 1
+        migrations = database.MIGRATIONS + [database.Migration(
+            version, "tamanho_do_titulo", apply=lambda conn: conn.execute("ALTER TABLE tasks ADD COLUMN title_length INTEGER"),
+            backfill=backfill
+        )]
+        self.assertEqual(database.migrate(migrations=migrations, dry_run=True),
+                         [{"version": version, "name": "tamanho_do_titulo", "status": "pending"}])
+        self.assertEqual(database.get_schema_version(), version - 1)
+
+        result = database.migrate(migrations=migrations, batch_size=2)
+        self.assertEqual([(r["version"], r["rows_backfilled"]) for r in result], [(version, 5)])
+        self.assertEqual(database.get_schema_version(), version)
+        self.assertEqual(database.migrate(migrations=migrations), [])
+        with database.get_connection() as conn:
+            self.assertEqual(conn.execute("SELECT version, name FROM schema_migrations ORDER BY version").fetchall(),
+                             [(m.version, m.name) for m in migrations])
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM tasks WHERE title_length IS NULL").fetchone()[0], 0)
+
+        # SQLite sem UPSERT ... RETURNING é recusado com uma mensagem clara
+        with mock.patch.object(database.sqlite3, "sqlite_version_info", (3, 31, 1)):
+            with self.assertRaisesRegex(database.DatabaseError, "3.35.0 ou superior"):
+                database.init_db()
+
+    def test_pool_conexoes(self):
+        """Teste da reutilização de conexões pelo pool"""
+        pool = database.configure_pool(size=2)
+        database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        for _ in range(5):
+            database.get_user_tasks(token)
+
+        stats = pool.stats()
+        self.assertLessEqual(stats["created"], 2)
+        self.assertGreater(stats["reused"], 0)
+        self.assertLessEqual(stats["idle"], 2)
+
+    def test_concorrencia_sem_bloqueios(self):
+        """Teste de leitores e escritores concorrentes em threads e processos"""
+        result = benchmark.run_concurrency_benchmark(database.DB_PATH, threads=4, processes=2, operations=50)
+
+        self.assertEqual(result["errors"], 0)
+        self.assertEqual(result["reads"] + result["writes"], 6 * 50)
+        with database.get_connection() as conn:
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(journal_mode, "wal")
+
+    def test_teste_de_carga(self):
+        """Teste do gerador de dados e das sessões simuladas do teste de carga"""
+        result = benchmark.run_load_benchmark(database.DB_PATH, users=5, tasks=200, schedules=40,
+                                              threads=3, processes=1, operations=40)
+
+        self.assertEqual(result["errors"], 0)
+        self.assertEqual(database.count_users(), 5)
+        # Login e logout de cada sessão, além das chamadas sorteadas
+        self.assertEqual(result["calls"], 4 * (40 + 3))
+        self.assertTrue({"login_user", "get_user_tasks", "revoke_token"} <= set(result["operations"]))
+        stats = result["operations"]["get_user_tasks"]
+        self.assertLessEqual(stats["p50_ms"], stats["p95_ms"])
+        self.assertLessEqual(stats["p95_ms"], stats["p99_ms"])
+        self.assertGreater(result["db_size_bytes"]["after_seed"], 0)
+
+        # O resultado é gravado em JSON e comparado com execuções anteriores
+        baseline = json.loads(json.dumps(result))
+        self.assertFalse(any(c["regression"] for c in benchmark.compare_load_results(baseline, result)))
+        baseline["operations"]["get_user_tasks"]["p95_ms"] = stats["p95_ms"] / 2
+        regressions = [c["operation"] for c in benchmark.compare_load_results(baseline, result) if c["regression"]]
+        self.assertEqual(regressions, ["get_user_tasks"])
+
+    def test_cronogramas_em_consulta_unica(self):
+        """Teste que os cronogramas e seus dias são obtidos sem consultas N+1"""
+        database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        for i in range(5):
+            database.create_user_schedule(token, {
+                "title": f"Estudos {i}", "description": "", "start_time": "08:00", "end_time": "10:00",
+                "days": ["Segunda", "Quarta"] if i % 2 else []
+            }, allow_conflicts=True)
+
+        pool = database.configure_pool(size=1)
+        statements = []
+        conn = pool.acquire()
+        conn.set_trace_callback(statements.append)
+        pool.release(conn)
+
+        schedules = database.get_user_schedules(token)
+
+        self.assertEqual(len(statements), 1)  # token já está em cache
+        self.assertEqual([s["title"] for s in schedules], [f"Estudos {i}" for i in range(5)])
+        self.assertEqual([s["days"] for s in schedules],
+                         [[], ["Segunda", "Quarta"], [], ["Segunda", "Quarta"], []])
+
+    def test_mutacoes_em_instrucao_unica(self):
+        """Teste que as mutações verificam a posse na própria instrução, sem SELECT adicional"""
+        database.register_user("ana", None, "senha")
+        database.register_user("bia", None, "senha")
+        token = database.login_user("ana", "senha")
+        other = database.login_user("bia", "senha")
+        task_data = {"title": "Prova", "description": "", "due_date": "2024-05-10", "priority": "Alta"}
+        schedule_data = {"title": "Estudos", "description": "", "start_time": "08:00", "end_time": "10:00",
+                         "days": ["Segunda"]}
+        task = database.create_user_task(token, task_data)
+        schedule = database.create_user_schedule(token, schedule_data)
+        self.assertEqual(schedule["days"], ["Segunda"])
+
+        for mutation in (lambda t: database.update_user_task(t, task["id"], dict(task_data, title="Outra")),
+                         lambda t: database.delete_user_task(t, task["id"]),
+                         lambda t: database.update_user_schedule(t, schedule["id"], schedule_data),
+                         lambda t: database.delete_user_schedule(t, schedule["id"])):
+            with self.assertRaises(database.NotFoundError):
+                mutation(other)
+        self.assertEqual(database.get_user_tasks(token)[0]["title"], "Prova")
+
+        pool = database.configure_pool(size=1)
+        statements = []
+        conn = pool.acquire()
+        conn.set_trace_callback(statements.append)
+        pool.release(conn)
+
+        updated = database.update_user_task(token, task["id"], dict(task_data, title="Prova 1"))
+        self.assertEqual((updated["title"], updated["created_at"]), ("Prova 1", task["created_at"]))
+        updated = database.update_user_schedule(token, schedule["id"], dict(schedule_data, days=["Terça", "Quinta"]))
+        self.assertEqual(updated, database.get_user_schedules(token)[0])
+        statements.clear()
+        database.delete_user_task(token, task["id"])
+        database.delete_user_schedule(token, schedule["id"])
+        # Cada exclusão: BEGIN, DELETE ... RETURNING, versão e COMMIT (a cascata também é rastreada);
+        # as instruções internas do FTS5 disparadas pelos triggers ('main'.'..._fts_*') ficam de fora
+        statements = [sql for sql in statements if "'main'." not in sql]
+        self.assertFalse([sql for sql in statements if sql.lstrip().upper().startswith("SELECT")])
+        self.assertEqual(statements.count("BEGIN IMMEDIATE"), 2)
+        self.assertEqual(len(set(statements)), 6)
+
+    def test_operacoes_em_lote(self):
+        """Teste das operações em lote em uma única transação, com resultado por item"""
+        database.register_user("ana", None, "senha")
+        database.register_user("bia", None, "senha")
+        token = database.login_user("ana", "senha")
+        other = database.login_user("bia", "senha")
+        foreign = database.create_user_task(other, {
+            "title": "Outra", "description": "", "due_date": "2024-05-10", "priority": "Alta"
+        })
+
+        pool = database.configure_pool(size=1)
+        statements = []
+        conn = pool.acquire()
+        conn.set_trace_callback(statements.append)
+        pool.release(conn)
+
+        results = database.bulk_create_user_tasks(token, [
+            {"title": f"Tarefa {i}", "description": "", "due_date": f"2024-05-{i + 1:02d}", "priority": "Média"}
+            for i in range(3)
+        ] + [{"title": "", "description": "", "due_date": "2024-05-10", "priority": "Alta"},
+             {"title": "Data", "description": "", "due_date": "10/05/2024", "priority": "Alta"}])
+        self.assertEqual([r["ok"] for r in results], [True, True, True, False, False])
+        self.assertEqual(statements.count("BEGIN IMMEDIATE"), 1)
+        tasks = database.get_user_tasks(token)
+        self.assertEqual([t["id"] for t in tasks], [r["id"] for r in results[:3]])
+
+        results = database.bulk_update_user_tasks(token, [dict(t, priority="Alta") for t in tasks[:2]]
+                                                  + [dict(foreign, priority="Baixa"), dict(tasks[2], priority="X")])
+        self.assertEqual([r["ok"] for r in results], [True, True, False, False])
+        self.assertEqual([t["priority"] for t in database.get_user_tasks(token)], ["Alta", "Alta", "Média"])
+        self.assertEqual(database.get_user_tasks(other)[0]["priority"], "Alta")
+
+        results = database.bulk_delete_user_tasks(token, [tasks[0]["id"], foreign["id"], tasks[1]["id"]])
+        self.assertEqual([r["ok"] for r in results], [True, False, True])
+        self.assertEqual(len(database.get_user_tasks(token)), 1)
+        self.assertEqual(len(database.get_user_tasks(other)), 1)
+
+        schedule = {"title": "Estudos", "description": "Sala 3", "start_time": "08:00", "end_time": "10:00",
+                    "days": ["Segunda", "Quarta"]}
+        results = database.bulk_create_user_schedules(token, [schedule, dict(schedule, days=["Feriado"]),
+                                                              dict(schedule, start_time="11:00")])
+        self.assertEqual([r["ok"] for r in results], [True, False, False])
+        # Sem "description", a atualização em lote mantém a descrição atual
+        update = {name: value for name, value in schedule.items() if name != "description"}
+        results = database.bulk_update_user_schedules(token, [dict(update, id=results[0]["id"], days=["Sexta"])])
+        self.assertTrue(results[0]["ok"])
+        self.assertEqual(database.get_user_schedules(token)[0]["days"], ["Sexta"])
+        self.assertEqual(database.get_user_schedules(token)[0]["description"], "Sala 3")
+        self.assertTrue(database.bulk_delete_user_schedules(token, [results[0]["id"]])[0]["ok"])
+        self.assertEqual(database.get_user_schedules(token), [])
+        self.assertEqual(database.get_user_versions(token), {"tasks": 3, "schedules": 3})
+
+    def test_importacao_e_exportacao(self):
+        """Teste da exportação e importação em CSV e .ics, em lotes"""
+        database.register_user("ana", None, "senha")
+        database.register_user("bia", None, "senha")
+        token = database.login_user("ana", "senha")
+        other = database.login_user("bia", "senha")
+        for i in range(3):
+            database.create_user_task(token, {
+                "title": f"Prova {i}, parte; final", "description": "Capítulos 1-3\n" + "é" * 60,
+                "due_date": f"2024-05-{i + 1:02d}", "priority": ["Baixa", "Média", "Alta"][i]
+            })
+        database.create_user_schedule(token, {
+            "title": "Estudos", "description": "", "start_time": "08:00", "end_time": "09:30", "days": ["Terça", "Sexta"]
+        })
+
+        ics = "".join(calendar_io.iter_ics(token, batch_size=1))
+        self.assertTrue(all(len(line.encode("utf-8")) <= 75 for line in ics.split("\r\n")))
+        self.assertIn("RRULE:FREQ=WEEKLY;BYDAY=TU,FR", ics)
+        summary = calendar_io.import_ics(other, io.StringIO(ics, newline=""), batch_size=2)
+        self.assertEqual((summary["tasks"]["created"], summary["schedules"]["created"]), (3, 1))
+        strip = lambda rows: [{k: v for k, v in row.items() if k not in ("id", "created_at")} for row in rows]
+        self.assertEqual(strip(database.get_user_tasks(other)), strip(database.get_user_tasks(token)))
+        self.assertEqual(strip(database.get_user_schedules(other)), strip(database.get_user_schedules(token)))
+
+        csv_text = "".join(calendar_io.iter_tasks_csv(token, batch_size=2))
+        csv_text += ",Sem data,,31/12/2024,Alta,\r\n"
+        summary = calendar_io.import_tasks_csv(other, io.StringIO(csv_text, newline=""), batch_size=2)
+        self.assertEqual((summary["created"], summary["errors"]), (3, 1))
+        self.assertEqual(summary["error_samples"], [{"item": 4, "error": "Data de entrega inválida: 31/12/2024"}])
+        summary = calendar_io.import_schedules_csv(
+            other, io.StringIO("".join(calendar_io.iter_schedules_csv(token)), newline="")
+        )
+        # O mesmo cronograma importado de novo conflita com o já existente
+        self.assertEqual((summary["created"], summary["errors"]), (0, 1))
+        self.assertIn("Conflito de horário", summary["error_samples"][0]["error"])
+        self.assertEqual(len(database.get_user_tasks(other)), 6)
+        self.assertEqual(database.get_user_schedules(other)[-1]["days"], ["Terça", "Sexta"])
+
+        # Na interface, a exportação vai para um arquivo temporário; os abandonados são removidos pela idade
+        path = calendar_io.write_export_file(calendar_io.iter_tasks_csv(token), "tarefas.csv", self.tmpdir.name)
+        with open(path, encoding="utf-8", newline="") as handle:
+            self.assertEqual(handle.read(), "".join(calendar_io.iter_tasks_csv(token)))
+        fresh = calendar_io.write_export_file(calendar_io.iter_ics(token), "calendario.ics", self.tmpdir.name)
+        os.utime(path, (0, 0))
+        self.assertEqual(calendar_io.purge_stale_exports(60, self.tmpdir.name), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(fresh))
+
+    def test_cache_de_tokens(self):
+        """Teste do cache de validação de tokens (TTL, LRU e invalidação)"""
+        database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        cache = database.get_token_cache()
+        cache.clear()
+        hits = cache.stats()["hits"]
+
+        user = database.get_user_by_token(token)
+        self.assertEqual(database.get_user_by_token(token), user)
+        self.assertEqual(cache.stats()["hits"], hits + 1)
+
+        database.invalidate_token(token)
+        self.assertIsNone(cache.get(token))
+
+        lru = database.TokenCache(max_size=2, ttl=60)
+        for name in ("a", "b"):
+            lru.put(name, {"id": 1})
+        lru.get("a")
+        lru.put("c", {"id": 2})
+        self.assertIsNone(lru.get("b"))
+        self.assertIsNotNone(lru.get("a"))
+        lru.invalidate_user(1)
+        self.assertIsNone(lru.get("a"))
+        self.assertEqual(lru.stats()["evictions"], 1)
+
+        expired = database.TokenCache(max_size=2, ttl=0)
+        expired.put("a", {"id": 1})
+        self.assertIsNone(expired.get("a"))
+
+        # Um token perto de expirar não continua válido no cache além da sua validade
+        with database.get_connection() as conn:
+            conn.execute("UPDATE tokens SET created_at = datetime('now', ?), last_used_at = CURRENT_TIMESTAMP "
+                         "WHERE token = ?", (f"-{database.TOKEN_MAX_AGE - 5} seconds", token))
+            conn.commit()
+        cache.clear()
+        self.assertEqual(database.get_user_by_token(token), user)
+        self.assertIsNotNone(cache.get(token))
+        with mock.patch("database.time.monotonic", return_value=database.time.monotonic() + 10):
+            self.assertIsNone(cache.get(token))
+
+        # Nem além do intervalo de renovação da última atividade, qualquer que seja o TTL do cache
+        with database.get_connection() as conn:
+            conn.execute("UPDATE tokens SET created_at = CURRENT_TIMESTAMP WHERE token = ?", (token,))
+            conn.commit()
+        cache.clear()
+        with mock.patch.object(database, "TOKEN_TOUCH_INTERVAL", 5):
+            self.assertEqual(database.get_user_by_token(token), user)
+        with mock.patch("database.time.monotonic", return_value=database.time.monotonic() + 10):
+            self.assertIsNone(cache.get(token))
+
+    def test_expiracao_e_compactacao_de_tokens(self):
+        """Teste de expiração, revogação e compactação de tokens"""
+        user = database.register_user("ana", None, "senha")
+        tokens = [database.login_user("ana", "senha") for _ in range(7)]
+        with database.get_connection() as conn:
+            conn.execute("UPDATE tokens SET created_at = datetime('now', '-30 days') WHERE token IN (?, ?, ?)",
+                         tuple(tokens[:3]))
+            conn.execute("UPDATE tokens SET last_used_at = datetime('now', '-2 days') WHERE token = ?",
+                         (tokens[3],))
+            conn.commit()
+        database.get_token_cache().clear()
+
+        self.assertIsNone(database.get_user_by_token(tokens[0]))
+        self.assertIsNone(database.get_user_by_token(tokens[3]))
+        self.assertEqual(database.get_user_by_token(tokens[4])["id"], user["id"])
+
+        self.assertTrue(database.revoke_token(tokens[4]))
+        self.assertIsNone(database.get_user_by_token(tokens[4]))
+
+        self.assertEqual(database.get_token_metrics()["expired"], 4)
+        self.assertEqual(database.purge_expired_tokens(batch_size=2), 4)
+        metrics = database.get_token_metrics()
+        self.assertEqual((metrics["total"], metrics["expired"], metrics["last_purged"]), (2, 0, 4))
+
+        self.assertEqual(database.revoke_user_tokens(user["id"]), 2)
+        self.assertIsNone(database.get_user_by_token(tokens[5]))
+
+    def test_integridade_e_manutencao(self):
+        """Teste de integridade referencial e remoção de registros órfãos"""
+        ana = database.register_user("ana", None, "senha")
+        bia = database.register_user("bia", None, "senha")
+        database.login_user("ana", "senha")
+        token = database.login_user("bia", "senha")
+        data = {"title": "Estudos", "description": "", "start_time": "08:00", "end_time": "10:00",
+                "days": ["Segunda", "Quarta"]}
+        for _ in range(3):
+            database.create_user_schedule(token, data, allow_conflicts=True)
+        database.create_user_task(token, {"title": "Prova", "description": "", "due_date": "2024-05-10",
+                                          "priority": "Alta"})
+
+        # Com foreign_keys ativado, não é possível remover um usuário que ainda tem dados
+        with self.assertRaises(sqlite3.IntegrityError):
+            with database.get_connection() as conn:
+                conn.execute("DELETE FROM users WHERE id = ?", (bia["id"],))
+
+        # Simular órfãos deixados por versões antigas (sem foreign_keys)
+        with database.get_connection() as conn:
+            conn.execute("PRAGMA foreign_keys = OFF")
+            conn.execute("DELETE FROM users WHERE id = ?", (bia["id"],))
+            conn.commit()
+            conn.execute("PRAGMA foreign_keys = ON")
+
+        result = database.run_maintenance(batch_size=1)
+        self.assertEqual(result["orphan_rows_removed"],
+                         {"tokens": 1, "tasks": 1, "schedules": 3, "user_versions": 1})
+        self.assertEqual(result["foreign_key_violations"], 0)
+        with database.get_connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM tokens WHERE user_id = ?", (ana["id"],)).fetchone()[0], 1)
+
+    def test_mascara_de_dias(self):
+        """Teste da migração dos dias para a máscara de bits e da consulta por dia da semana"""
+        database.close_pool()
+        database.DB_PATH = os.path.join(self.tmpdir.name, "legacy.db")
+        database.migrate(target=1)
+        user = database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        legacy_days = [["Quarta", "Segunda"], [], ["Domingo", "Domingo", "Feriado"], ["Terça"]]
+
+        def _seed(conn):
+            for i, days in enumerate(legacy_days):
+                schedule_id = conn.execute(
+                    "INSERT INTO schedules (user_id, title, description, start_time, end_time) VALUES (?, ?, '', ?, ?)",
+                    (user["id"], f"Estudos {i}", f"{10 - i:02d}:00", f"{11 - i:02d}:00")
+                ).lastrowid
+                conn.executemany("INSERT INTO schedule_days (schedule_id, day) VALUES (?, ?)",
+                                 [(schedule_id, day) for day in days])
+
+        database.run_write(_seed)
+        result = database.migrate(batch_size=2)
+        self.assertEqual([(r["version"], r["rows_backfilled"]) for r in result], [(2, 3), (3, 0), (4, 4)])
+        with database.get_connection() as conn:
+            self.assertIsNone(conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'schedule_days'"
+            ).fetchone())
+        self.assertEqual([s["days"] for s in database.get_user_schedules(token)],
+                         [["Segunda", "Quarta"], [], ["Domingo"], ["Terça"]])
+
+        self.assertEqual(database.days_to_mask(["Segunda", "Domingo"]), 1 | 64)
+        with self.assertRaises(ValueError):
+            database.days_to_mask(["Feriado"])
+        database.create_user_schedule(token, {"title": "Cedo", "description": "", "start_time": "07:00",
+                                               "end_time": "08:00", "days": ["Segunda", "Sexta"]})
+        self.assertEqual([s["title"] for s in database.get_user_schedules_on_day(token, "Segunda")],
+                         ["Cedo", "Estudos 0"])
+        self.assertEqual(database.get_user_schedules_on_day(token, "Sábado"), [])
+
+    def test_conflitos_de_horario(self):
+        """Teste da detecção de cronogramas com horários sobrepostos"""
+        database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        slot = lambda title, start, end, days: {"title": title, "description": "", "start_time": start,
+                                                "end_time": end, "days": days}
+        aula = database.create_user_schedule(token, slot("Aula", "08:00", "10:00", ["Segunda", "Quarta"]))
+
+        with self.assertRaises(database.ScheduleConflictError) as ctx:
+            database.create_user_schedule(token, slot("Estudos", "09:30", "11:00", ["Quarta"]))
+        self.assertEqual([(c["id"], c["day"]) for c in ctx.exception.conflicts], [(aula["id"], 4)])
+        self.assertIn("Aula (Quarta 08:00-10:00)", str(ctx.exception))
+        with self.assertRaises(database.ValidationError):
+            database.create_user_schedule(token, slot("Estudos", "10:00", "09:00", ["Quarta"]))
+
+        # Encostar no limite, outro dia ou editar o próprio cronograma não é conflito
+        estudos = database.create_user_schedule(token, slot("Estudos", "10:00", "11:00", ["Segunda"]))
+        database.create_user_schedule(token, slot("Revisão", "09:00", "10:00", ["Terça"]))
+        database.update_user_schedule(token, aula["id"], slot("Aula", "07:30", "10:00", ["Segunda", "Quarta"]))
+        with self.assertRaises(database.ScheduleConflictError):
+            database.update_user_schedule(token, estudos["id"], slot("Estudos", "09:00", "11:00", ["Segunda"]))
+
+        results = database.bulk_create_user_schedules(token, [
+            slot("Lab", "14:00", "16:00", ["Sexta"]), slot("Grupo", "15:00", "17:00", ["Sexta"]),
+            slot("Leitura", "08:00", "09:00", ["Segunda"])
+        ])
+        self.assertEqual([r["ok"] for r in results], [True, False, False])
+        self.assertIn("Lab (Sexta 14:00-16:00)", results[1]["error"])
+
+        # Conflitos permitidos explicitamente aparecem no relatório
+        database.create_user_schedule(token, slot("Monitoria", "15:30", "16:30", ["Sexta", "Sábado"]),
+                                      allow_conflicts=True)
+        self.assertEqual(database.find_schedule_conflicts(token), [{
+            "day": "Sexta", "schedules": [{"id": results[0]["id"], "title": "Lab"},
+                                          {"id": results[0]["id"] + 1, "title": "Monitoria"}],
+            "start_time": "15:30", "end_time": "16:00"
+        }])
+
+        # O índice em cache acompanha as escritas sem ser reconstruído
+        cache = database._schedule_index_cache
+        misses = cache.stats()["misses"]
+        database.delete_user_schedule(token, results[0]["id"])
+        database.bulk_delete_user_schedules(token, [aula["id"]])
+        self.assertEqual(database.find_schedule_conflicts(token), [])
+        database.create_user_schedule(token, slot("Aula", "08:00", "10:00", ["Segunda"]))
+        self.assertEqual(cache.stats()["misses"], misses)
+
+        # Com ou sem sobreposições no dia, a busca no índice coincide com a comparação direta,
+        # e as cópias não alteram o índice de origem
+        rng = random.Random(17)
+        index, intervals = ScheduleIndex(), {}
+        for schedule_id in range(300):
+            if intervals and rng.random() < 0.3:
+                removed = rng.choice(list(intervals))
+                index.remove(removed)
+                del intervals[removed]
+            start = rng.randrange(0, 1380, 10)
+            end = start + (840 if schedule_id == 150 else rng.randrange(10, 60, 10))
+            if schedule_id < 150 and any(s < end and start < e for s, e in intervals.values()):
+                continue
+            before = index
+            index = index.copy()
+            index.add(schedule_id, minutes_to_time(start), minutes_to_time(end), 1)
+            intervals[schedule_id] = (start, end)
+            self.assertNotIn(schedule_id, before._entries)
+            query = rng.randrange(0, 1380, 5)
+            found = {c["id"] for c in index.find_conflicts(minutes_to_time(query), minutes_to_time(query + 45), 1)}
+            self.assertEqual(found, {i for i, (s, e) in intervals.items() if s < query + 45 and query < e})
+
+    def test_horarios_livres(self):
+        """Teste do cálculo de horários livres e das sugestões de estudo"""
+        database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        database.create_user_schedule(token, {"title": "Aula", "description": "", "start_time": "08:00",
+                                               "end_time": "12:00", "days": ["Segunda", "Terça"]})
+        database.create_user_schedule(token, {"title": "Lab", "description": "", "start_time": "11:00",
+                                               "end_time": "13:30", "days": ["Segunda"]}, allow_conflicts=True)
+        database.create_user_schedule(token, {"title": "Grupo", "description": "", "start_time": "15:00",
+                                               "end_time": "15:40", "days": ["Segunda"]})
+
+        free = database.find_free_slots(token, 60, "07:00", "18:00")
+        self.assertEqual([(s["start_time"], s["end_time"]) for s in free["Segunda"]],
+                         [("07:00", "08:00"), ("13:30", "15:00"), ("15:40", "18:00")])
+        self.assertEqual(free["Quarta"], [{"start_time": "07:00", "end_time": "18:00", "minutes": 660}])
+        with self.assertRaises(database.ValidationError):
+            database.find_free_slots(token, 60, "18:00", "07:00")
+
+        # O resultado é memorizado no índice da versão atual e recalculado após uma edição
+        user_id = database.get_user_by_token(token)["id"]
+        index = database._schedule_index_cache.get(user_id, database.get_user_versions(token)["schedules"])
+        self.assertIs(index.free_slots(420, 1080, 60), index.free_slots(420, 1080, 60))
+        database.create_user_schedule(token, {"title": "Monitoria", "description": "", "start_time": "16:00",
+                                               "end_time": "18:00", "days": ["Segunda"]})
+        self.assertEqual([(s["start_time"], s["end_time"]) for s in database.find_free_slots(token, 60, "07:00", "18:00")["Segunda"]],
+                         [("07:00", "08:00"), ("13:30", "15:00")])
+
+        for title, priority in (("Lista", "Baixa"), ("Prova", "Alta"), ("Resumo", "Média")):
+            database.create_user_task(token, {"title": title, "description": "", "due_date": "2024-05-07",
+                                              "priority": priority})
+        database.create_user_task(token, {"title": "Antiga", "description": "", "due_date": "2024-05-01",
+                                          "priority": "Alta"})
+        suggestions = database.suggest_study_slots(token, 90, "08:00", "18:00", now=datetime(2024, 5, 6, 13, 2))
+        self.assertEqual(
+            [(s["task"]["title"], s["date"], s["start_time"], s["end_time"]) for s in suggestions],
+            [("Prova", "2024-05-06", "13:30", "15:00"), ("Resumo", "2024-05-07", "12:00", "13:30"),
+             ("Lista", "2024-05-07", "13:30", "15:00")]
+        )
+
+        # Na interface, as sugestões ficam em cache até uma escrita ou até o próximo horário arredondado
+        pool = database.configure_pool(size=1)
+        statements = []
+        conn = pool.acquire()
+        conn.set_trace_callback(statements.append)
+        pool.release(conn)
+        clock = mock.Mock(wraps=datetime)
+        clock.now.return_value = datetime(2024, 5, 6, 13, 2)
+        with mock.patch("streamlit.session_state", {"token": token}), mock.patch("schedules.datetime", clock):
+            self.assertEqual(get_study_suggestions(90, "08:00", "18:00"), suggestions)
+            statements.clear()
+            self.assertEqual(get_study_suggestions(90, "08:00", "18:00"), suggestions)
+            self.assertEqual(statements, [])
+            delete_task(suggestions[0]["task"]["id"])
+            self.assertEqual([s["task"]["title"] for s in get_study_suggestions(90, "08:00", "18:00")],
+                             ["Resumo", "Lista"])
+
+    def test_analises_de_ocupacao(self):
+        """Teste do mapa de ocupação vetorizado e dos agregados por semana e prioridade"""
+        database.register_user("ana", None, "senha")
+        database.register_user("bia", None, "senha")
+        token = database.login_user("ana", "senha")
+        other = database.login_user("bia", "senha")
+        database.create_user_schedule(token, {"title": "Aula", "description": "", "start_time": "08:10",
+                                               "end_time": "09:00", "days": ["Segunda", "Terça"]})
+        database.create_user_schedule(token, {"title": "Lab", "description": "", "start_time": "08:30",
+                                               "end_time": "10:00", "days": ["Segunda"]}, allow_conflicts=True)
+        database.create_user_schedule(other, {"title": "Aula", "description": "", "start_time": "08:00",
+                                               "end_time": "08:30", "days": ["Segunda"]})
+
+        grid = analytics.user_heatmap(token)
+        self.assertEqual(grid.shape, (7, 96))
+        # 08:10-10:00 na segunda (sobreposição contada uma vez) e 08:10-09:00 na terça
+        self.assertEqual(grid[0, 32:41].tolist(), [5, 15, 15, 15, 15, 15, 15, 15, 0])
+        self.assertEqual((int(grid[0].sum()), int(grid[1].sum()), int(grid[2:].sum())), (110, 50, 0))
+        self.assertEqual(analytics.hourly(grid)[0, 8:10].tolist(), [50, 60])
+
+        # O agregado em lotes de um cronograma soma os minutos de todos os usuários
+        result = analytics.admin_workload(batch_size=1)
+        self.assertEqual(result["users"], 2)
+        self.assertEqual(result["heatmap"][0, 32:35].tolist(), [20, 30, 30])
+        self.assertEqual(int(result["heatmap"].sum()), 50 + 90 + 50 + 30)
+
+        for due_date, priority in (("2024-05-06", "Baixa"), ("2024-05-12", "Alta"), ("2024-05-13", "Alta")):
+            database.create_user_task(token, {"title": "Prova", "description": "", "due_date": due_date,
+                                              "priority": priority})
+        self.assertEqual(database.get_user_task_workload(token), [
+            {"week": "2024-05-06", "priority": "Alta", "count": 1},
+            {"week": "2024-05-06", "priority": "Baixa", "count": 1},
+            {"week": "2024-05-13", "priority": "Alta", "count": 1}
+        ])
+        self.assertEqual(database.get_task_workload(), database.get_user_task_workload(token))
+        self.assertEqual(database.get_user_task_workload(other), [])
+
+    def test_busca_textual(self):
+        """Teste da busca FTS5: ordem, prefixos, escopo por usuário e sincronização por triggers"""
+        database.register_user("ana", None, "senha")
+        database.register_user("bia", None, "senha")
+        token = database.login_user("ana", "senha")
+        other = database.login_user("bia", "senha")
+        lista = database.create_user_task(token, {"title": "Lista 3", "description": "Exercícios de cálculo",
+                                                  "due_date": "2024-05-10", "priority": "Média"})
+        prova = database.create_user_task(token, {"title": "Prova de Cálculo", "description": "Capítulos 1-3",
+                                                  "due_date": "2024-05-12", "priority": "Alta"})
+        database.create_user_task(other, {"title": "Cálculo II", "description": "", "due_date": "2024-05-12",
+                                          "priority": "Alta"})
+
+        # Título antes da descrição; acentos e maiúsculas são ignorados
+        self.assertEqual([t["id"] for t in database.search_user_tasks(token, "CALC")], [prova["id"], lista["id"]])
+        self.assertEqual([t["id"] for t in database.search_user_tasks(token, "calc cap")], [prova["id"]])
+        # Prefixos com mais de 4 letras também restringem o resultado
+        self.assertEqual([t["id"] for t in database.search_user_tasks(token, "Cálcul")], [prova["id"], lista["id"]])
+        self.assertEqual([t["id"] for t in database.search_user_tasks(token, "exercicios")], [lista["id"]])
+        self.assertEqual([t["id"] for t in database.search_user_tasks(token, "prova cálcul")], [prova["id"]])
+        self.assertEqual(database.search_user_tasks(token, "calculadora"), [])
+        self.assertEqual(database.search_user_tasks(token, 'calc" OR title:*'), [])
+        self.assertEqual(database.search_user_tasks(token, "  -- "), [])
+        self.assertEqual([t["title"] for t in database.search_user_tasks(other, "cálculo")], ["Cálculo II"])
+
+        database.update_user_task(token, lista["id"], dict(lista, title="Lista de física", description=""))
+        database.delete_user_task(token, prova["id"])
+        self.assertEqual(database.search_user_tasks(token, "calculo"), [])
+        self.assertEqual([t["title"] for t in database.search_user_tasks(token, "fis")], ["Lista de física"])
+        schedule = database.create_user_schedule(token, {"title": "Revisão", "description": "Física e química",
+                                                         "start_time": "08:00", "end_time": "09:00",
+                                                         "days": ["Segunda"]})
+        self.assertEqual(database.search_user_schedules(token, "quim"), [schedule])
+        self.assertEqual(database.search_user_schedules(other, "quim"), [])
+
+        # Linhas anteriores ao índice são indexadas pelo backfill da migração, em lotes
+        database.run_write(lambda conn: conn.execute("DELETE FROM tasks_fts"))
+        database.run_write(database._migration_search_index)
+        self.assertEqual(database._run_backfill(database._backfill_search_index, 1), 3)
+        self.assertEqual([t["title"] for t in database.search_user_tasks(token, "fis")], ["Lista de física"])
+        with database.get_connection() as conn:
+            self.assertIsNone(conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'search_index_backfill'"
+            ).fetchone())
+        database.run_maintenance()
+        self.assertEqual(len(database.search_user_tasks(other, "calc")), 1)
+
+    def test_paginacao_de_tarefas(self):
+        """Teste de ordenação, filtros e paginação por chave das tarefas"""
+        database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        priorities = ["Baixa", "Média", "Alta"]
+        for i in range(7):
+            database.create_user_task(token, {
+                "title": f"Tarefa {i}", "description": "", "due_date": f"2024-01-{7 - i:02d}",
+                "priority": priorities[i % 3]
+            })
+
+        titles, cursor = [], None
+        while True:
+            page = database.query_user_tasks(token, limit=3, after=cursor)
+            titles.extend(task["title"] for task in page["tasks"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(titles, [f"Tarefa {i}" for i in range(6, -1, -1)])
+
+        page = database.query_user_tasks(token, order_by="priority", due_from="2024-01-02", due_to="2024-01-06")
+        self.assertEqual([task["priority"] for task in page["tasks"]], ["Alta", "Alta", "Média", "Média", "Baixa"])
+        first = database.query_user_tasks(token, limit=2, order_by="priority")
+        second = database.query_user_tasks(token, limit=2, order_by="priority", after=first["next_cursor"])
+        self.assertEqual([task["title"] for task in first["tasks"] + second["tasks"]],
+                         ["Tarefa 5", "Tarefa 2", "Tarefa 4", "Tarefa 1"])
+
+        page = database.query_user_tasks(token, priorities=["Alta"], overdue=True)
+        self.assertEqual({task["title"] for task in page["tasks"]}, {"Tarefa 2", "Tarefa 5"})
+
+    def test_cache_de_leituras_com_invalidacao(self):
+        """Teste que leituras repetidas não consultam o banco e que escritas atualizam o cache"""
+        database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        schedule_data = {"title": "Estudos", "description": "", "start_time": "08:00", "end_time": "10:00",
+                         "days": ["Segunda"]}
+        task_data = {"title": "Prova", "description": "", "due_date": "2024-05-10", "priority": "Alta"}
+
+        pool = database.configure_pool(size=1)
+        statements = []
+        conn = pool.acquire()
+        conn.set_trace_callback(statements.append)
+        pool.release(conn)
+
+        with mock.patch("streamlit.session_state", {"token": token}):
+            get_tasks()
+            get_schedules()
+            query_tasks(order_by="due_date", priorities=["Alta"])
+            statements.clear()
+            self.assertEqual((get_tasks(), get_schedules()), ([], []))
+            query_tasks(order_by="due_date", priorities=["Alta"])
+            self.assertEqual(statements, [])
+
+            task = create_task(task_data)
+            schedule = create_schedule(schedule_data)
+            self.assertEqual(get_tasks(), [task])
+            self.assertEqual(query_tasks(order_by="due_date", priorities=["Alta"])["tasks"], [task])
+            self.assertEqual(get_schedules(), [schedule])
+
+            updated = update_schedule(schedule["id"], dict(schedule_data, title="Revisão"))
+            self.assertEqual(get_schedules(), [updated])
+            delete_schedule(schedule["id"])
+            delete_task(task["id"])
+            statements.clear()
+            self.assertEqual((get_tasks(), get_schedules()), ([], []))
+            # Tarefas e cronogramas são atualizados no cache com as linhas retornadas pelas escritas
+            self.assertEqual(statements, [])
+
+    def test_paginas_atualizadas_pelas_escritas(self):
+        """Teste que as páginas de tarefas em cache, atualizadas localmente, coincidem com as do banco"""
+        database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        for i in range(5):
+            database.create_user_task(token, {
+                "title": f"Tarefa {i}", "description": "", "due_date": f"2024-01-{2 * i + 2:02d}",
+                "priority": "Alta" if i % 2 else "Baixa"
+            })
+        views = [{"limit": 2}, {"limit": 2, "order_by": "priority"}, {"priorities": ["Alta"]},
+                 {"due_from": "2024-01-03", "due_to": "2024-01-08"}]
+
+        def cached_pages(filters):
+            pages, after = [], None
+            while True:
+                page = query_tasks(after=after, **filters)
+                pages.append(page)
+                after = page["next_cursor"]
+                if after is None:
+                    return pages
+
+        with mock.patch("streamlit.session_state", {"token": token}):
+            for filters in views:
+                cached_pages(filters)
+            created = create_task({"title": "Nova", "description": "", "due_date": "2024-01-01", "priority": "Alta"})
+            update_task(1, {"title": "Movida", "description": "", "due_date": "2024-01-09", "priority": "Alta"})
+            delete_task(4)
+            self.assertIn(created, get_tasks() + query_tasks(priorities=["Alta"])["tasks"])
+
+            pool = database.configure_pool(size=1)
+            statements = []
+            conn = pool.acquire()
+            conn.set_trace_callback(statements.append)
+            pool.release(conn)
+            for filters in views:
+                query_tasks(after=None, **filters)
+            self.assertEqual(statements, [])
+            for filters in views:
+                # Uma página pode ficar com uma tarefa a menos, mas a sequência das páginas é a do banco
+                tasks = [task for page in cached_pages(filters) for task in page["tasks"]]
+                expected = database.query_user_tasks(token, **dict(filters, limit=100))["tasks"]
+                self.assertEqual(tasks, expected)
+
+    def test_descricoes_sob_demanda(self):
+        """Teste da lista sem descrições, da tarefa carregada ao abrir e da janela visível"""
+        database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        task = database.create_user_task(token, {
+            "title": "Prova", "description": "Capítulos 1 a 3", "due_date": "2024-05-10", "priority": "Alta"
+        })
+        page = database.query_user_tasks(token, with_description=False)
+        self.assertEqual(page["tasks"], [{name: value for name, value in task.items() if name != "description"}])
+        self.assertEqual(database.get_user_task(token, task["id"]), task)
+        self.assertIsNone(database.get_user_task(token, task["id"] + 1))
+        # Sem "description", a atualização em lote mantém a descrição atual
+        database.bulk_update_user_tasks(token, [dict(page["tasks"][0], priority="Baixa")])
+        self.assertEqual(database.get_user_task(token, task["id"])["description"], "Capítulos 1 a 3")
+
+        with mock.patch("streamlit.session_state", {"token": token}):
+            query_tasks(after=None, with_description=False)
+            self.assertEqual(get_task(task["id"])["priority"], "Baixa")
+            created = create_task({"title": "Lista", "description": "Exercícios", "due_date": "2024-05-01",
+                                   "priority": "Média"})
+            self.assertNotIn("description", query_tasks(after=None, with_description=False)["tasks"][0])
+            update_task(task["id"], dict(task, title="Prova final"))
+            self.assertEqual(get_task(task["id"])["title"], "Prova final")
+            delete_task(created["id"])
+            self.assertIsNone(get_task(created["id"]))
+
+            self.assertEqual(week_start("2024-05-12"), "2024-05-06")
+            st.session_state["window"] = 40
+            self.assertEqual(list_window(list(range(25)), "window"), (list(range(20, 25)), 20))
+
+    def test_versoes_de_dados(self):
+        """Teste das versões por usuário e da consulta condicional"""
+        database.register_user("ana", None, "senha")
+        database.register_user("bia", None, "senha")
+        token = database.login_user("ana", "senha")
+        other = database.login_user("bia", "senha")
+        task_data = {"title": "Prova", "description": "", "due_date": "2024-05-10", "priority": "Alta"}
+
+        self.assertEqual(database.get_user_versions(token), {"tasks": 0, "schedules": 0})
+        first = database.get_if_changed(token, "tasks")
+        self.assertEqual(first, {"version": 0, "data": []})
+        self.assertIsNone(database.get_if_changed(token, "tasks", first["version"]))
+
+        task = database.create_user_task(token, task_data)
+        database.update_user_task(token, task["id"], dict(task_data, title="Prova 1"))
+        with self.assertRaises(database.NotFoundError):  # não pertence a bia: sem nova versão
+            database.update_user_task(other, task["id"], task_data)
+        changed = database.get_if_changed(token, "tasks", first["version"])
+        self.assertEqual(changed["version"], 2)
+        self.assertEqual([t["title"] for t in changed["data"]], ["Prova 1"])
+        self.assertEqual(database.get_user_versions(token)["schedules"], 0)
+        self.assertEqual(database.get_user_versions(other), {"tasks": 0, "schedules": 0})
+
+        schedule = database.create_user_schedule(token, {
+            "title": "Estudos", "description": "", "start_time": "08:00", "end_time": "10:00", "days": []
+        })
+        database.delete_user_schedule(token, schedule["id"])
+        self.assertEqual(database.get_user_versions(token), {"tasks": 2, "schedules": 2})
+
+        # Entradas expiradas do cache são revalidadas pela versão, sem recarregar os dados
+        cache = UserDataCache(ttl=0)
+        loads = []
+        version = lambda: database.get_user_versions(token)["tasks"]
+        load = lambda: loads.append(1) or database.get_user_tasks(token)
+        cache.get_or_load(1, ("tasks",), load, version)
+        cache.get_or_load(1, ("tasks",), load, version)
+        self.assertEqual((len(loads), cache.stats()["revalidations"]), (1, 1))
+        database.delete_user_task(token, task["id"])
+        self.assertEqual(cache.get_or_load(1, ("tasks",), load, version), [])
+        self.assertEqual(len(loads), 2)
+
+    def test_medicao_de_consultas(self):
+        """Teste da medição por instrução e por função e do log de consultas lentas"""
+        stats = query_stats.query_stats
+        database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        database.create_user_task(token, {"title": "Prova", "description": "", "due_date": "2024-05-10",
+                                          "priority": "Alta"})
+        stats.reset()
+
+        # Desligada, nada é medido
+        database.get_user_tasks(token)
+        self.assertEqual(stats.snapshot()["functions"], [])
+
+        database.set_query_stats_enabled(True)
+        try:
+            with self.assertLogs("query_stats.slow", level="WARNING") as logs, \
+                    mock.patch.object(stats, "slow_ms", 0):
+                database.get_user_tasks(token)
+            database.get_user_tasks(token)
+            database.update_user_task(token, 1, {"title": "Prova 1", "description": "", "due_date": "2024-05-10",
+                                                 "priority": "Alta"})
+        finally:
+            database.set_query_stats_enabled(False)
+        database.get_user_tasks(token)
+
+        summary = stats.snapshot()
+        functions = {f["function"]: f for f in summary["functions"]}
+        self.assertEqual(functions["get_user_tasks"]["count"], 2)
+        self.assertEqual(functions["get_user_tasks"]["rows"], 2)
+        self.assertEqual(functions["update_user_task"]["count"], 1)
+        self.assertGreaterEqual(functions["get_user_tasks"]["max_ms"], functions["get_user_tasks"]["mean_ms"])
+        select = next(s for s in summary["statements"] if s["sql"].startswith("SELECT id, title, description, due_date"))
+        self.assertEqual((select["count"], select["rows"]), (2, 2))
+        self.assertNotIn("\n", select["sql"])
+
+        # Consultas lentas: linha JSON no log e histórico em memória, com a função de origem
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["function"], "get_user_tasks")
+        self.assertEqual({e["function"] for e in summary["slow_queries"]}, {"get_user_tasks"})
+        stats.reset()
+
+    def test_perfil_de_execucao(self):
+        """Teste da medição das fases de uma execução e da gravação do perfil por sessão"""
+        disabled = RerunProfiler(False)
+        disabled.start()
+        with disabled.phase("check_authentication"):
+            pass
+        disabled.stop()
+        self.assertEqual(disabled.phases, [])
+        self.assertIsNone(disabled.dump(self.tmpdir.name))
+
+        profiler = RerunProfiler(True, "sessao", 3)
+        profiler.start()
+        database.register_user("ana", None, "senha")
+        token = database.login_user("ana", "senha")
+        with profiler.phase("get_tasks"):
+            database.get_user_tasks(token)
+        with profiler.phase("render_tasks"), profiler.phase("expander"):
+            pass
+        with self.assertRaises(RuntimeError), profiler.phase("render_schedules"):
+            raise RuntimeError("interrompida")
+        profiler.stop()
+
+        self.assertEqual([name for name, _ in profiler.phases],
+                         ["get_tasks", "render_tasks/expander", "render_tasks", "render_schedules"])
+        self.assertGreaterEqual(profiler.total_ms, sum(ms for name, ms in profiler.phases if "/" not in name))
+        path = profiler.dump(self.tmpdir.name)
+        self.assertEqual(path, os.path.join(self.tmpdir.name, "sessao", "00003.prof"))
+        functions = {name for _, _, name in pstats.Stats(path).stats}
+        self.assertIn("get_user_tasks", functions)
+        with open(os.path.join(self.tmpdir.name, "sessao", "phases.jsonl"), encoding="utf-8") as phases_file:
+            entry = json.loads(phases_file.readline())
+        self.assertEqual((entry["run"], len(entry["phases"])), (3, 4))
+
+    def test_planos_de_consulta_sem_varredura_completa(self):
+        """Teste que nenhuma consulta da camada de dados faz varredura completa de tabela"""
+        pool = database.configure_pool(size=1)
+        statements = []
+        conn = pool.acquire()
+        conn.set_trace_callback(statements.append)
+        pool.release(conn)
+
+        database.register_user("ana", "ana@example.com", "senha")
+        token = database.login_user("ana", "senha")
+        task = database.create_user_task(token, {
+            "title": "Prova", "description": "Cálculo", "due_date": "2099-05-10", "priority": "Alta"
+        })
+        schedule = database.create_user_schedule(token, {
+            "title": "Estudos", "description": "", "start_time": "08:00", "end_time": "10:00",
+            "days": ["Segunda", "Quarta"]
+        })
+
+        def uncached(call):
+            # O índice de cronogramas em memória evita a consulta: descartado para que ela seja rastreada
+            database._schedule_index_cache.clear()
+            return call()
+
+        # Consultas de cada pedido: (pedido, chamada)
+        calls = [
+            ("tokens", lambda: database._token_cache.clear() or database.get_user_by_token(token)),
+            ("tarefas", lambda: database.get_user_tasks(token)),
+            ("tarefas", lambda: database.update_user_task(token, task["id"], dict(task, title="Prova 1"))),
+            ("versões", lambda: database.get_user_versions(token)),
+            ("versões", lambda: database.get_if_changed(token, "tasks", 0)),
+            ("versões", lambda: database.get_if_changed(token, "schedules")),
+            ("paginação", lambda: database.query_user_tasks(
+                token, limit=1, due_from="2024-01-01", priorities=["Alta"], overdue=True)),
+            ("paginação", lambda: database.query_user_tasks(token, order_by="priority", after=[0, "2024-01-01", 0])),
+            ("paginação", lambda: list(database.iter_user_tasks(token, batch_size=1))),
+            ("cronogramas", lambda: database.get_user_schedules(token)),
+            ("cronogramas", lambda: list(database.iter_user_schedules(token, batch_size=1))),
+            ("cronogramas", lambda: database.update_user_schedule(token, schedule["id"], dict(schedule, days=["Terça"]))),
+            ("cronogramas por dia", lambda: database.get_user_schedules_on_day(token, "Terça")),
+            ("conflitos", lambda: uncached(lambda: database.find_schedule_conflicts(token))),
+            ("horários livres", lambda: uncached(lambda: database.find_free_slots(token))),
+            ("horários livres", lambda: database.suggest_study_slots(token)),
+            ("análises", lambda: analytics.user_heatmap(token)),
+            ("análises", lambda: database.get_user_task_workload(token)),
+            ("busca", lambda: database.search_user_tasks(token, "prova calc")),
+            ("busca", lambda: database.search_user_schedules(token, "estu")),
+            ("listas sob demanda", lambda: database.query_user_tasks(token, with_description=False)),
+            ("listas sob demanda", lambda: database.query_user_tasks(
+                token, with_description=False, after=["2024-01-01", 0])),
+            ("listas sob demanda", lambda: database.get_user_task(token, task["id"])),
+            ("lote", lambda: database.bulk_update_user_tasks(token, [dict(task, priority="Baixa")])),
+            ("lote", lambda: database.bulk_delete_user_schedules(token, [schedule["id"]])),
+            ("exclusões", lambda: database.delete_user_task(token, task["id"])),
+            ("tokens", lambda: database.purge_expired_tokens()),
+            ("tokens", lambda: database.revoke_token(token)),
+        ]
+        queries = {}
+        for request, call in calls:
+            statements.clear()
+            call()
+            # Instruções internas do FTS5 ('main'.'..._fts_*') não são da camada de dados
+            found = {sql for sql in statements
+                     if re.match(r"\s*(SELECT|UPDATE|DELETE)\b", sql, re.I) and "'main'." not in sql}
+            self.assertTrue(found, f"Nenhuma consulta rastreada em: {request}")
+            for sql in found:
+                queries.setdefault(sql, request)
+
+        # Todas as consultas devem ter passado pela única conexão rastreada
+        self.assertEqual(pool.stats()["created"], 1)
+
+        with database.get_connection() as conn:
+            conn.set_trace_callback(None)
+            for sql, request in queries.items():
+                if sql.strip() == "SELECT 1":
+                    continue
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+                full_scans = [detail for detail in plan
+                              if detail.startswith("SCAN ") and "INDEX" not in detail]
+                self.assertEqual(full_scans, [], f"Varredura completa ({request}) em: {sql}")
+                # Na busca, o índice FTS5 é percorrido apenas no intervalo de rowid do usuário (">" e "<")
+                for detail in plan:
+                    if "VIRTUAL TABLE" in detail:
+                        constraints = detail.rsplit(":", 1)[-1]
+                        self.assertTrue(">" in constraints and "<" in constraints,
+                                        f"Busca fora do intervalo do usuário ({request}) em: {sql}")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file